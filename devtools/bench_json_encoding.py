@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for the JSON fallback encoder on large metadata records.
+
+Compares `to_json_string()`, which uses a cached per-type dispatch for non-native
+types, against a plain chain of `isinstance` checks with `asdict()`, as used previously.
+
+Usage: uv run python devtools/bench_json_encoding.py
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+from dataclasses import asdict, dataclass, is_dataclass
+from datetime import date, datetime, time, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any, cast
+
+from strif import format_iso_timestamp
+
+from sidematter_format.json_conventions import AsDictProtocol, to_json_string
+
+
+class Status(Enum):
+    PENDING = "pending"
+    DONE = "done"
+
+
+@dataclass
+class Step:
+    name: str
+    status: Status
+    started_at: datetime
+    finished_at: datetime
+
+
+@dataclass
+class Annotation:
+    start: int
+    end: int
+    label: str
+    created: date
+
+
+def _isinstance_chain_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return format_iso_timestamp(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, time):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    if isinstance(obj, AsDictProtocol):
+        return obj.as_dict()
+    if isinstance(obj, Path):
+        return str(obj)
+    if isinstance(obj, set):
+        return list(cast(set[Any], obj))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def make_record(n: int) -> dict[str, Any]:
+    now = datetime(2024, 1, 15, 10, 30, tzinfo=timezone.utc)
+    return {
+        "title": "Benchmark",
+        "history": [Step(f"step{i}", Status.DONE, now, now) for i in range(n)],
+        "annotations": [Annotation(i, i + 10, "label", now.date()) for i in range(n)],
+        "timestamps": [now] * n,
+        "statuses": [Status.PENDING] * n,
+    }
+
+
+def encode_isinstance_chain(record: dict[str, Any]) -> str:
+    return json.dumps(record, default=_isinstance_chain_default, ensure_ascii=False)
+
+
+def encode_type_dispatch(record: dict[str, Any]) -> str:
+    return to_json_string(record, indent=None)
+
+
+def main() -> None:
+    for n in (1_000, 10_000):
+        record = make_record(n)
+        assert encode_type_dispatch(record) == encode_isinstance_chain(record)
+
+        for label, encode in (
+            ("isinstance chain", encode_isinstance_chain),
+            ("type dispatch", encode_type_dispatch),
+        ):
+            secs = min(timeit.repeat(lambda: encode(record), number=1, repeat=5))  # noqa: B023
+            print(f"n={n:>6} {label:>18}: {secs * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark for reading metadata through the shared metadata cache compared to reading
+it directly, for YAML sidecars.
+
+Usage: uv run python devtools/bench_meta_cache.py [num_docs]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sidematter_format import MetaCacheServer, Sidematter, use_shared_meta_cache
+
+
+def make_corpus(root: Path, num_docs: int) -> list[Path]:
+    paths: list[Path] = []
+    old = time.time() - 60
+    for i in range(num_docs):
+        sm = Sidematter(root / f"doc{i}.md")
+        meta = {"title": f"Document {i}", "n": i, "tags": ["a", "b", "c"], "author": "x"}
+        sm.write_meta(meta, formats="yaml")
+        os.utime(sm.meta_yaml_path, (old, old))
+        paths.append(sm.primary)
+    return paths
+
+
+def read_all(paths: list[Path]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        Sidematter(path).read_meta()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = make_corpus(Path(tmpdir), num_docs)
+        direct_secs = read_all(paths)
+
+        with MetaCacheServer(Path(tmpdir) / "cache.sock").start() as server:
+            use_shared_meta_cache(server.socket_path)
+            read_all(paths)  # Fill the cache.
+            cached_secs = read_all(paths)
+            use_shared_meta_cache(None)
+
+        print(f"direct: {num_docs / direct_secs:9.0f} docs/s")
+        print(
+            f"cached: {num_docs / cached_secs:9.0f} docs/s  "
+            f"speedup {direct_secs / cached_secs:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for reading metadata from a pack (`PackFS`) compared to the tree it was
+built from.
+
+Usage: uv run python devtools/bench_pack.py [num_docs]
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sidematter_format import PackFS, Sidematter, build_pack
+
+DOCS_PER_DIR = 500
+
+
+def make_corpus(root: Path, num_docs: int) -> list[Path]:
+    paths: list[Path] = []
+    for i in range(num_docs):
+        rel = Path(f"dir{i // DOCS_PER_DIR:04d}") / f"doc{i}.md"
+        Sidematter(root / rel).write_meta({"title": f"Document {i}", "n": i}, formats="json")
+        paths.append(rel)
+    return paths
+
+
+def main() -> None:
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "tree"
+        paths = make_corpus(root, num_docs)
+        pack_path = Path(tmpdir) / "tree.smpack"
+
+        start = time.perf_counter()
+        build_pack(root, pack_path)
+        print(f"build_pack: {time.perf_counter() - start:.2f} s for {num_docs} documents")
+
+        start = time.perf_counter()
+        for rel in paths:
+            Sidematter(root / rel).read_meta()
+        tree_secs = time.perf_counter() - start
+
+        with PackFS(pack_path) as pack:
+            start = time.perf_counter()
+            for rel in paths:
+                Sidematter(rel, fs=pack).read_meta()
+            pack_secs = time.perf_counter() - start
+
+        print(f"tree: {num_docs / tree_secs:9.0f} docs/s")
+        print(f"pack: {num_docs / pack_secs:9.0f} docs/s  speedup {tree_secs / pack_secs:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for `read_meta_many()`: throughput of parsing YAML sidecars on 1 up to all
+CPU cores.
+
+Writes a corpus of documents with YAML metadata to a temporary directory, then reads
+them all with each worker count. Speedup is relative to reading in-process.
+
+Usage: uv run python devtools/bench_read_meta_many.py [num_docs]
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from sidematter_format import Sidematter, read_meta_many
+from sidematter_format.bulk_read import default_workers
+
+DOCS_PER_DIR = 500
+
+
+def make_meta(i: int) -> dict[str, Any]:
+    return {
+        "title": f"Document {i}",
+        "tags": ["alpha", "beta", "gamma"],
+        "history": [{"version": v, "author": f"user{v}", "note": "edit " * 5} for v in range(20)],
+    }
+
+
+def make_corpus(root: Path, num_docs: int) -> list[Path]:
+    paths: list[Path] = []
+    for i in range(num_docs):
+        sm = Sidematter(root / f"dir{i // DOCS_PER_DIR:04d}" / f"doc{i}.md")
+        sm.write_meta(make_meta(i), fast_yaml=True)
+        paths.append(sm.primary)
+    return paths
+
+
+def main() -> None:
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_workers = default_workers()
+    worker_counts = sorted({1, *(w for w in (2, 4, 8, 16, 32, 64) if w < max_workers), max_workers})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = make_corpus(Path(tmpdir), num_docs)
+        print(f"{num_docs} documents, {max_workers} CPUs")
+
+        base_secs = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            results = read_meta_many(paths, workers=workers, min_parallel=0)
+            secs = time.perf_counter() - start
+            assert all(r.error is None for r in results)
+            base_secs = base_secs or secs
+            print(
+                f"workers={workers:>3}: {secs:7.2f} s  {num_docs / secs:9.0f} docs/s  "
+                f"speedup {base_secs / secs:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
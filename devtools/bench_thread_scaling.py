@@ -0,0 +1,87 @@
+"""
+Benchmark for `resolve()` and `read_meta()` throughput from 1 to N threads.
+
+On a standard (GIL) build, YAML parsing doesn't scale with threads; on a free-threaded
+build (e.g. `python3.14t`) it should scale with cores. Run under both to compare.
+
+Usage: uv run python devtools/bench_thread_scaling.py [num_docs]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import sysconfig
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from sidematter_format import Sidematter
+
+DOCS_PER_DIR = 500
+
+
+def make_corpus(root: Path, num_docs: int) -> list[Path]:
+    paths: list[Path] = []
+    for i in range(num_docs):
+        sm = Sidematter(root / f"dir{i // DOCS_PER_DIR:04d}" / f"doc{i}.md")
+        sm.primary.parent.mkdir(exist_ok=True)
+        sm.primary.write_text(f"# Doc {i}\n")
+        sm.write_meta(
+            {"title": f"Document {i}", "tags": ["a", "b"], "history": list(range(20))},
+            fast_yaml=True,
+        )
+        paths.append(sm.primary)
+    return paths
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled: Callable[[], bool] | None = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def run(paths: list[Path], threads: int, op: Callable[[Path], Any]) -> float:
+    chunks = [paths[i::threads] for i in range(threads)]
+
+    def work(chunk: list[Path]) -> None:
+        for p in chunk:
+            op(p)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, chunks))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    max_threads = os.cpu_count() or 1
+    thread_counts = sorted({1, *(t for t in (2, 4, 8, 16, 32) if t < max_threads), max_threads})
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    print(
+        f"Python {sys.version.split()[0]}, free-threaded build: {free_threaded}, "
+        f"GIL enabled: {gil_enabled()}, {max_threads} CPUs, {num_docs} documents"
+    )
+
+    ops: dict[str, Callable[[Path], Any]] = {
+        "resolve (no parse)": lambda p: Sidematter(p).resolve(parse_meta=False),
+        "read_meta": lambda p: Sidematter(p).read_meta(),
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = make_corpus(Path(tmpdir), num_docs)
+        for label, op in ops.items():
+            base_secs = None
+            for threads in thread_counts:
+                secs = run(paths, threads, op)
+                base_secs = base_secs or secs
+                print(
+                    f"{label:>18} threads={threads:>3}: {num_docs / secs:9.0f} docs/s  "
+                    f"speedup {base_secs / secs:5.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
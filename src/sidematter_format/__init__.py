@@ -1,24 +1,95 @@
-from .json_conventions import to_json_string, write_json_file
+from .asset_import import ImportReport
+from .asset_layout import FLAT_LAYOUT, SHARDED_LAYOUT, AssetLayout
+from .asset_listing import AssetEntry
+from .asset_store import AssetStore, DedupeReport, dedupe_assets
+from .bulk_read import MetaResult, read_meta_many
+from .bulk_rename import RenamePlan, apply_plan, plan_renames
+from .compile_meta import compile_meta, read_compiled_meta
+from .cross_device_move import recover_moves
+from .http_app import SidematterApp
+from .json_conventions import (
+    register_json_encoder,
+    to_json_string,
+    unregister_json_encoder,
+    write_json_file,
+)
+from .memory_fs import MemoryFS
+from .meta_cache_client import MetaCacheClient, use_shared_meta_cache
+from .meta_cache_server import MetaCacheServer
+from .meta_formats import MetaFormat, meta_formats, register_meta_format
+from .orphans import Orphan, OrphanReport, collect_orphans, find_orphans
+from .packed import PackFS, build_pack
+from .sidecar_cache import SidecarCache
+from .sidematter_dir import SidematterDir
 from .sidematter_format import (
     ResolvedSidematter,
     Sidematter,
     SidematterError,
 )
+from .sidematter_fs import LocalFS, SidematterFS, TarFS, WritableFS, ZipFS, archive_fs
 from .sidematter_utils import (
     copy_sidematter,
     move_sidematter,
     remove_sidematter,
 )
+from .tree_sync import SyncReport, sync_tree
+from .typed_meta import MetaValidationError, register_model_type
+from .write_behind import WriteBehind
 from .yaml_conventions import register_default_yaml_representers
 
 __all__ = [
     "SidematterError",
+    "MetaValidationError",
     "Sidematter",
     "ResolvedSidematter",
+    "SidematterDir",
+    "SidematterApp",
+    "SidematterFS",
+    "WritableFS",
+    "LocalFS",
+    "SidecarCache",
+    "WriteBehind",
+    "MetaCacheServer",
+    "MetaCacheClient",
+    "use_shared_meta_cache",
+    "ZipFS",
+    "TarFS",
+    "MemoryFS",
+    "PackFS",
+    "build_pack",
+    "archive_fs",
+    "AssetEntry",
+    "AssetLayout",
+    "FLAT_LAYOUT",
+    "SHARDED_LAYOUT",
+    "AssetStore",
+    "dedupe_assets",
+    "DedupeReport",
+    "ImportReport",
+    "MetaFormat",
+    "meta_formats",
+    "register_meta_format",
+    "register_model_type",
     "copy_sidematter",
     "move_sidematter",
     "remove_sidematter",
+    "plan_renames",
+    "apply_plan",
+    "RenamePlan",
+    "find_orphans",
+    "collect_orphans",
+    "Orphan",
+    "OrphanReport",
+    "sync_tree",
+    "SyncReport",
+    "read_meta_many",
+    "MetaResult",
+    "recover_moves",
+    "compile_meta",
+    "read_compiled_meta",
     "to_json_string",
+    "register_json_encoder",
+    "unregister_json_encoder",
     "write_json_file",
     "register_default_yaml_representers",
 ]
@@ -0,0 +1,79 @@
+"""
+Reading assets without copying whole files into memory: memory-mapped views and
+range reads.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def map_file(path: str | Path) -> Generator[memoryview]:
+    """
+    Memory-map a file read-only and yield a `memoryview` of its contents, so slices
+    are zero-copy. The mapping is closed on exit. Slices kept after exit keep the
+    mapping alive until they are released.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # Empty files can't be mapped.
+            yield memoryview(b"")
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    try:
+        yield view
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            pass  # Slices still exist; the mapping is closed when they are released.
+
+
+def _check_range(start: int, end: int | None) -> None:
+    if start < 0 or (end is not None and end < start):
+        raise ValueError(f"Invalid byte range: start={start}, end={end}")
+
+
+def read_range(path: str | Path, start: int, end: int | None = None) -> bytes:
+    """
+    Read bytes `start` up to (not including) `end` of a file, or to the end of the file
+    if `end` is None, without reading the rest of the file. Like slicing, the range is
+    clipped to the file's size.
+    """
+    _check_range(start, end)
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        stop = size if end is None else min(end, size)
+        if start >= stop:
+            return b""
+        if hasattr(os, "pread"):
+            chunks: list[bytes] = []
+            pos = start
+            while pos < stop:
+                chunk = os.pread(fd, stop - pos, pos)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                pos += len(chunk)
+            return b"".join(chunks)
+        os.lseek(fd, start, os.SEEK_SET)
+        return os.read(fd, stop - start)
+    finally:
+        os.close(fd)
+
+
+def slice_range(data: bytes, start: int, end: int | None = None) -> bytes:
+    """
+    The same range as `read_range()`, from data already in memory.
+    """
+    _check_range(start, end)
+    return data[start:end]
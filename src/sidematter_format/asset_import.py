@@ -0,0 +1,105 @@
+"""
+Bulk import of a directory tree into an assets directory.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from strif import new_uid
+
+from sidematter_format.asset_listing import AssetEntry, iter_assets
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS, copy_file_fast
+
+_ALL_FILES_GLOB = "**/*"
+
+
+@dataclass
+class ImportReport:
+    """
+    Result of `import_assets()`, listing destination paths by outcome.
+    """
+
+    copied: list[Path] = field(default_factory=list)
+    unchanged: list[Path] = field(default_factory=list)
+    errors: dict[Path, str] = field(default_factory=dict)
+
+
+def _is_unchanged(entry: AssetEntry, dest: Path) -> bool:
+    try:
+        st = dest.stat()
+    except FileNotFoundError:
+        return False
+    return st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns
+
+
+def _import_one(src: Path, dest: Path, entry: AssetEntry, skip_unchanged: bool) -> bool:
+    """
+    Copy one file atomically. Returns False if it was skipped as unchanged.
+    """
+    if skip_unchanged and _is_unchanged(entry, dest):
+        return False
+    tmp = dest.with_name(f"{dest.name}.{new_uid()}.partial")
+    try:
+        copy_file_fast(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def import_assets(
+    src_dir: str | Path,
+    assets_dir: str | Path,
+    *,
+    glob: str = _ALL_FILES_GLOB,
+    workers: int = DEFAULT_COPY_WORKERS,
+    skip_unchanged: bool = True,
+) -> ImportReport:
+    """
+    Copy every file under `src_dir` (or those matching `glob`) into `assets_dir`,
+    keeping relative paths. Directories are created once up front and files are
+    copied atomically on a pool of `workers` threads, keeping modification times. With
+    `skip_unchanged`, files whose destination already has the same size and
+    modification time are not copied again. Errors are reported per file.
+    """
+    src_dir = Path(src_dir)
+    assets_dir = Path(assets_dir)
+    if not src_dir.is_dir():
+        raise ValueError(f"Asset source is not a directory: {src_dir!r}")
+
+    entries = list(iter_assets(src_dir))
+    if glob != _ALL_FILES_GLOB:
+        matched = {p.relative_to(src_dir).as_posix() for p in src_dir.glob(glob)}
+        entries = [e for e in entries if e.name in matched]
+
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    for rel_dir in sorted({os.path.dirname(e.name) for e in entries} - {""}):
+        (assets_dir / rel_dir).mkdir(parents=True, exist_ok=True)
+
+    def run(entry: AssetEntry) -> bool | Exception:
+        try:
+            return _import_one(src_dir / entry.name, assets_dir / entry.name, entry, skip_unchanged)
+        except Exception as e:
+            return e
+
+    if workers <= 1 or len(entries) <= 1:
+        outcomes = [run(e) for e in entries]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(run, entries))
+
+    report = ImportReport()
+    for entry, outcome in zip(entries, outcomes, strict=True):
+        dest = assets_dir / entry.name
+        if isinstance(outcome, Exception):
+            report.errors[dest] = str(outcome)
+        elif outcome:
+            report.copied.append(dest)
+        else:
+            report.unchanged.append(dest)
+    return report
@@ -0,0 +1,249 @@
+"""
+Sharded layouts of assets directories, for documents with very many assets.
+
+In a sharded layout, each asset is kept under subdirectories named by a prefix of the
+hash of its name, so `chart.png` is at `7e/chart.png` (with one level of two hex
+digits, 256 subdirectories), and no directory holds more than a fraction of the assets.
+The layout is recorded in a `.sidematter-layout.json` file in the assets directory, so
+it goes wherever the directory is copied, moved, or synced, and readers can detect it.
+Directories without the file have the default flat layout.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.sidematter_fs import LocalFS, SidematterFS, WritableFS
+
+LAYOUT_FILE_NAME = ".sidematter-layout.json"
+"""Name of the file recording the layout, kept at the top of the assets directory."""
+
+_LAYOUT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class AssetLayout:
+    """
+    How assets are arranged in an assets directory.
+    """
+
+    levels: int = 0
+    """Levels of hash-prefix subdirectories, or 0 for the flat layout."""
+
+    width: int = 2
+    """Hex digits of the hash used for the name of each level."""
+
+    def __post_init__(self):
+        if self.levels < 0 or self.width < 1 or self.levels * self.width > 40:
+            raise ValueError(f"Invalid asset layout: {self}")
+
+    @property
+    def sharded(self) -> bool:
+        return self.levels > 0
+
+    def shard_path(self, name: str) -> str:
+        """
+        Path of the asset `name` (with "/" separators), relative to the assets directory.
+        """
+        if not self.sharded:
+            return name
+        digest = hashlib.sha1(name.encode("utf-8"), usedforsecurity=False).hexdigest()
+        w = self.width
+        return "/".join([*(digest[i * w : (i + 1) * w] for i in range(self.levels)), name])
+
+    def asset_name(self, rel: str) -> str | None:
+        """
+        The name of the asset stored at `rel`, relative to the assets directory, or
+        None if `rel` isn't where this layout would store it.
+        """
+        if not self.sharded:
+            return rel
+        parts = rel.split("/", self.levels)
+        if len(parts) <= self.levels:
+            return None
+        name = parts[-1]
+        return name if self.shard_path(name) == rel else None
+
+    def to_dict(self) -> dict[str, int]:
+        return {"levels": self.levels, "width": self.width}
+
+
+FLAT_LAYOUT = AssetLayout()
+
+SHARDED_LAYOUT = AssetLayout(levels=1)
+
+
+@dataclass(frozen=True)
+class LayoutState:
+    """
+    The layout of an assets directory, and the one it is being converted from, if a
+    conversion was started and not finished.
+    """
+
+    layout: AssetLayout
+    converting_from: AssetLayout | None = None
+
+
+_FLAT_STATE = LayoutState(FLAT_LAYOUT)
+
+# Layouts read from local layout files, validated by the file's stat.
+_local_cache: dict[str, tuple[tuple[int, int, int], LayoutState]] = {}
+_local_cache_lock = threading.Lock()
+
+
+def _parse_state(data: bytes) -> LayoutState:
+    try:
+        values: dict[str, Any] = json.loads(data)
+        if values.get("version") != _LAYOUT_VERSION:
+            raise ValueError(f"Unsupported version: {values.get('version')!r}")
+        layout = AssetLayout(values["levels"], values["width"])
+        previous = values.get("converting_from")
+        converting_from = AssetLayout(previous["levels"], previous["width"]) if previous else None
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid asset layout file: {e}") from e
+    return LayoutState(layout, converting_from)
+
+
+def read_layout_state(fs: SidematterFS, assets_dir: Path) -> LayoutState:
+    """
+    The layout of `assets_dir`. On the local filesystem, this is one `stat()` unless
+    the layout file changed.
+    """
+    layout_path = assets_dir / LAYOUT_FILE_NAME
+    if not isinstance(fs, LocalFS):
+        if not fs.exists(layout_path):
+            return _FLAT_STATE
+        return _parse_state(fs.read_bytes(layout_path))
+
+    key = str(layout_path.absolute())
+    try:
+        st = os.stat(key)
+    except (FileNotFoundError, NotADirectoryError):
+        return _FLAT_STATE
+    sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+    cached = _local_cache.get(key)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    state = _parse_state(Path(key).read_bytes())
+    with _local_cache_lock:
+        _local_cache[key] = (sig, state)
+    return state
+
+
+def _write_layout_state(fs: WritableFS, assets_dir: Path, state: LayoutState) -> None:
+    layout_path = assets_dir / LAYOUT_FILE_NAME
+    if state == _FLAT_STATE:
+        fs.unlink(layout_path)
+        return
+    values: dict[str, Any] = {"version": _LAYOUT_VERSION, **state.layout.to_dict()}
+    if state.converting_from is not None:
+        values["converting_from"] = state.converting_from.to_dict()
+    fs.write_bytes(layout_path, json.dumps(values).encode("utf-8"))
+
+
+def _is_layout_file(rel: str) -> bool:
+    return rel == LAYOUT_FILE_NAME
+
+
+def asset_rel_path(
+    state: LayoutState, name: str | Path, exists: Callable[[str], bool] | None = None
+) -> str:
+    """
+    Path of an asset relative to the assets directory. While a conversion is
+    unfinished, an asset may still be where the old layout put it, so if `exists` (a
+    function checking a relative path) is given, the old path is returned if only it
+    exists.
+    """
+    name = PurePosixPath(name).as_posix()
+    rel = state.layout.shard_path(name)
+    if state.converting_from is not None and exists is not None and not exists(rel):
+        old_rel = state.converting_from.shard_path(name)
+        if exists(old_rel):
+            return old_rel
+    return rel
+
+
+def _stored_name(rel: str, current: AssetLayout, previous: AssetLayout | None) -> str | None:
+    """
+    Name of the asset stored at `rel`, or None if it isn't where either layout would
+    store it. During a conversion, a path valid in both layouts is taken as sharded,
+    since a flat layout accepts any path.
+    """
+    if previous is None:
+        return current.asset_name(rel)
+    first, second = (previous, current) if not current.sharded else (current, previous)
+    name = first.asset_name(rel)
+    return second.asset_name(rel) if name is None else name
+
+
+def asset_names(state: LayoutState, rels: Iterable[str]) -> dict[str, str]:
+    """
+    Map the paths of files in an assets directory (relative to it) to asset names,
+    skipping the layout file and files out of place.
+    """
+    names: dict[str, str] = {}
+    for rel in rels:
+        if _is_layout_file(rel):
+            continue
+        name = _stored_name(rel, state.layout, state.converting_from)
+        if name is not None:
+            names[rel] = name
+    return names
+
+
+def convert_layout(
+    fs: WritableFS,
+    assets_dir: Path,
+    layout: AssetLayout,
+    *,
+    workers: int = DEFAULT_COPY_WORKERS,
+) -> int:
+    """
+    Convert `assets_dir` to `layout`, moving each asset with a rename, on a pool of
+    `workers` threads. The target layout is recorded first, marked as converting, so
+    readers find assets in either place until it is done, and running it again after
+    an interruption finishes it. Returns the number of assets moved.
+    """
+    state = read_layout_state(fs, assets_dir)
+    if state.converting_from is None and state.layout == layout:
+        return 0
+    previous = state.converting_from or state.layout
+    if not fs.is_dir(assets_dir):
+        fs.mkdir(assets_dir)
+    _write_layout_state(fs, assets_dir, LayoutState(layout, previous))
+
+    moves: list[tuple[str, str]] = []
+    for entry in fs.iter_files(assets_dir):
+        if _is_layout_file(entry.name):
+            continue
+        name = _stored_name(entry.name, layout, previous)
+        dest = layout.shard_path(entry.name if name is None else name)
+        if dest != entry.name:
+            moves.append((entry.name, dest))
+
+    def move(item: tuple[str, str]) -> None:
+        src, dest = item
+        fs.mkdir((assets_dir / dest).parent)
+        fs.rename(assets_dir / src, assets_dir / dest)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(move, moves))
+
+    # Remove the shard directories the moves emptied, deepest first.
+    emptied = {(assets_dir / src).parent for src, _dest in moves}
+    for dir_path in sorted(emptied, key=lambda p: len(p.parts), reverse=True):
+        while dir_path != assets_dir and next(iter(fs.iter_files(dir_path)), None) is None:
+            fs.rmtree(dir_path)
+            dir_path = dir_path.parent
+
+    _write_layout_state(fs, assets_dir, LayoutState(layout))
+    return len(moves)
@@ -0,0 +1,157 @@
+"""
+Recursive listing of asset directories, with an optional persisted listing cache.
+
+A directory's modification time changes whenever an entry is added, removed, or
+renamed in it, so a listing saved along with the modification time of every directory
+it covers stays valid as long as none of those times change. Checking the cache is then
+one `stat()` per directory instead of a `stat()` per file.
+
+The cache is kept beside the assets directory, as `basename.assets.listing.json`, so
+it isn't one of the assets. It records the device and inode of the assets directory
+too, so a copy of it (with the document, or by a tool that keeps modification times)
+doesn't validate against another directory.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from strif import atomic_output_file
+
+LISTING_CACHE_SUFFIX = ".listing.json"
+"""Suffix added to the name of an assets directory for its listing cache."""
+
+_CACHE_VERSION = 2
+
+# Directories modified this close to the time of a scan may change again within the
+# same timestamp tick (2s on the coarsest filesystems), so we don't trust their
+# recorded times to validate a cached listing.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass(frozen=True)
+class AssetEntry:
+    """
+    A file in an assets directory.
+    """
+
+    name: str
+    """Path relative to the assets directory, with "/" separators."""
+
+    size: int
+    mtime_ns: int
+
+
+def _scan(assets_dir: Path, dir_mtimes: dict[str, int] | None) -> Iterator[AssetEntry]:
+    """
+    Walk `assets_dir` with `scandir`, yielding files (including symlinks to files) but
+    not following symlinked directories. If `dir_mtimes` is given, it is filled in with
+    the modification time of each directory walked.
+    """
+    stack: list[tuple[str, str]] = [(str(assets_dir), "")]
+    while stack:
+        dir_path, prefix = stack.pop()
+        with os.scandir(dir_path) as it:
+            if dir_mtimes is not None:
+                dir_mtimes[prefix] = os.stat(dir_path).st_mtime_ns
+            subdirs: list[tuple[str, str]] = []
+            for entry in it:
+                rel = f"{prefix}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, f"{rel}/"))
+                elif entry.is_file():
+                    st = entry.stat()
+                    yield AssetEntry(rel, st.st_size, st.st_mtime_ns)
+            stack.extend(reversed(subdirs))
+
+
+def iter_assets(assets_dir: str | Path) -> Iterator[AssetEntry]:
+    """
+    Yield every file under `assets_dir`, in directory order. Yields nothing if the
+    directory doesn't exist.
+    """
+    assets_dir = Path(assets_dir)
+    if not assets_dir.is_dir():
+        return
+    yield from _scan(assets_dir, None)
+
+
+def listing_cache_path(assets_dir: Path) -> Path:
+    """
+    The listing cache of `assets_dir`, beside it.
+    """
+    return assets_dir.with_name(assets_dir.name + LISTING_CACHE_SUFFIX)
+
+
+def _load_cache(assets_dir: Path) -> list[AssetEntry] | None:
+    """
+    Read the listing cache of `assets_dir`, returning None if it is missing,
+    unreadable, or stale.
+    """
+    try:
+        data: dict[str, Any] = json.loads(listing_cache_path(assets_dir).read_bytes())
+        if data.get("version") != _CACHE_VERSION:
+            return None
+        st = os.stat(assets_dir)
+        if data["dir_id"] != [st.st_dev, st.st_ino]:
+            return None
+        racy_after: int = data["scanned_ns"] - _RACY_WINDOW_NS
+        for rel_dir, mtime_ns in data["dirs"].items():
+            if mtime_ns >= racy_after:
+                return None
+            if os.stat(assets_dir / rel_dir).st_mtime_ns != mtime_ns:
+                return None
+        return [AssetEntry(name, size, mtime_ns) for name, size, mtime_ns in data["entries"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_cache(
+    assets_dir: Path, scanned_ns: int, dirs: dict[str, int], entries: list[AssetEntry]
+) -> None:
+    try:
+        st = os.stat(assets_dir)
+        data = {
+            "version": _CACHE_VERSION,
+            "dir_id": [st.st_dev, st.st_ino],
+            "scanned_ns": scanned_ns,
+            "dirs": dirs,
+            "entries": [[e.name, e.size, e.mtime_ns] for e in entries],
+        }
+        with atomic_output_file(listing_cache_path(assets_dir)) as tmp_path:
+            tmp_path.write_bytes(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    except OSError:
+        pass  # The listing is still returned, just not cached.
+
+
+def list_assets(assets_dir: str | Path, *, cache: bool = False) -> list[AssetEntry]:
+    """
+    List every file under `assets_dir`, sorted by name. Returns an empty list if the
+    directory doesn't exist.
+
+    With `cache`, the listing is saved in a listing cache beside the assets directory
+    (see `listing_cache_path()`) and reused while no directory in the tree has changed.
+    Files added, removed, or renamed (including atomic replacements, which are renames)
+    are detected, but sizes and times of files rewritten in place may be out of date.
+    """
+    assets_dir = Path(assets_dir)
+    if not assets_dir.is_dir():
+        return []
+    if not cache:
+        return sorted(_scan(assets_dir, None), key=lambda e: e.name)
+
+    cached = _load_cache(assets_dir)
+    if cached is not None:
+        return cached
+
+    scanned_ns = time.time_ns()
+    dirs: dict[str, int] = {}
+    entries = sorted(_scan(assets_dir, dirs), key=lambda e: e.name)
+    _save_cache(assets_dir, scanned_ns, dirs, entries)
+    return entries
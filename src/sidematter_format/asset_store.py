@@ -0,0 +1,249 @@
+"""
+A content-addressed store of asset files, shared by hardlinks from assets directories.
+
+Each distinct file is kept once in the store, as a blob named by the SHA-256 of its
+contents, and assets directories hold hardlinks to the blobs. A blob's link count is
+then its reference count: a blob with a link count of 1 is referenced only by the
+store and can be collected. Where a hardlink isn't possible (the store is on another
+device, or the file has too many links), the blob is copied with `copy_file_range`,
+which clones the data on filesystems that support reflinks.
+
+Blobs are made read-only, since changing one in place would change every asset linked
+to it. Writing an asset through `Sidematter` replaces the file atomically, which only
+unlinks it from the blob.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from strif import new_uid
+
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS, copy_file_fast
+from sidematter_format.sidecar_cache import ASSETS_DIR_SUFFIX
+
+_HASH_CHUNK = 1 << 20
+
+_BLOB_MODE = 0o444
+
+_COPY_MODE = 0o644
+
+# Errors from `os.link()` that mean we should copy instead.
+_NO_LINK_ERRNOS = {errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+_LINK_ATTEMPTS = 3
+
+
+def hash_file(path: str | Path) -> str:
+    """
+    SHA-256 of a file's contents, as hex.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_hex(name: str) -> bool:
+    return all(c in "0123456789abcdef" for c in name)
+
+
+def _same_file(a: os.stat_result, b: os.stat_result) -> bool:
+    return (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+
+
+class AssetStore:
+    """
+    A directory of blobs named by content hash, at `root/<2 hex digits>/<rest>`.
+    Nothing is kept besides the blobs, so any number of processes can share a store.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root: Path = Path(root)
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def add(self, src: str | Path) -> Path:
+        """
+        Add a file to the store, if its contents aren't there already, and return the
+        path of its blob.
+        """
+        blob = self.blob_path(hash_file(src))
+        if blob.exists():
+            return blob
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_name(f"{blob.name}.{new_uid()}.tmp")
+        try:
+            copy_file_fast(src, tmp)
+            os.chmod(tmp, _BLOB_MODE)
+            try:
+                os.link(tmp, blob)
+            except FileExistsError:
+                pass  # Added by someone else meanwhile, with the same contents.
+        finally:
+            tmp.unlink(missing_ok=True)
+        return blob
+
+    def link(self, src: str | Path, dest: str | Path) -> Path:
+        """
+        Add a file to the store and put a link to its blob at `dest`, replacing any
+        file there atomically. Returns the blob path.
+        """
+        attempts = 0
+        while True:
+            blob = self.add(src)
+            try:
+                self.link_blob(blob, dest)
+                return blob
+            except FileNotFoundError:
+                # The blob was collected between adding and linking it.
+                attempts += 1
+                if attempts >= _LINK_ATTEMPTS:
+                    raise
+
+    def link_blob(self, blob: Path, dest: str | Path) -> None:
+        """
+        Put a hardlink to `blob` at `dest` (or a copy, if it can't be linked),
+        replacing any file there atomically.
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{new_uid()}.tmp")
+        try:
+            try:
+                os.link(blob, tmp)
+            except OSError as e:
+                if e.errno not in _NO_LINK_ERRNOS:
+                    raise
+                copy_file_fast(blob, tmp)
+                os.chmod(tmp, _COPY_MODE)
+            os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def is_linked(self, path: str | Path) -> bool:
+        """
+        Whether a file is a link to a blob in the store.
+        """
+        try:
+            st = os.lstat(path)
+            return _same_file(st, os.stat(self.blob_path(hash_file(path))))
+        except FileNotFoundError:
+            return False
+
+    def gc(self, *, dry_run: bool = False) -> list[Path]:
+        """
+        Remove blobs no longer linked from anywhere (a link count of 1) and return
+        their paths. With `dry_run`, only return them.
+        """
+        collected: list[Path] = []
+        try:
+            with os.scandir(self.root) as it:
+                prefixes = [e for e in it if e.is_dir() and _is_hex(e.name)]
+        except FileNotFoundError:
+            return collected
+        for prefix in prefixes:
+            with os.scandir(prefix.path) as it:
+                for entry in it:
+                    if not _is_hex(entry.name):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISREG(st.st_mode) and st.st_nlink == 1:
+                        path = Path(entry.path)
+                        if not dry_run:
+                            path.unlink(missing_ok=True)
+                        collected.append(path)
+        return collected
+
+
+@dataclass
+class DedupeReport:
+    """
+    What `dedupe_assets()` did.
+    """
+
+    linked: list[Path] = field(default_factory=list)
+    """Asset files now linked to the store."""
+
+    unchanged: int = 0
+    """Asset files already linked to the store, or not regular files."""
+
+    bytes_saved: int = 0
+    """Size of the copies freed by linking to the store."""
+
+    errors: dict[Path, str] = field(default_factory=dict)
+
+
+def _asset_files(root: Path, skip: Path) -> list[Path]:
+    """
+    All files in assets directories under `root`, not following symlinks.
+    """
+    files: list[Path] = []
+    skip_str = str(skip)
+    for dir_path, dirnames, _filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if os.path.join(dir_path, d) != skip_str]
+        for name in [d for d in dirnames if d.endswith(ASSETS_DIR_SUFFIX)]:
+            dirnames.remove(name)
+            for assets_path, _subdirs, filenames in os.walk(os.path.join(dir_path, name)):
+                files += [Path(assets_path, f) for f in filenames]
+    return files
+
+
+def dedupe_assets(
+    root: str | Path, store: AssetStore, *, workers: int = DEFAULT_COPY_WORKERS
+) -> DedupeReport:
+    """
+    Convert the assets directories under `root` in place to links to `store`, hashing
+    files on a pool of `workers` threads. The first copy of each file found becomes
+    the blob (by linking, without copying), and later copies are replaced by links
+    to it.
+    """
+    report = DedupeReport()
+
+    def dedupe(path: Path) -> tuple[bool, int]:
+        st = os.lstat(path)
+        if not stat.S_ISREG(st.st_mode):
+            return False, 0
+        blob = store.blob_path(hash_file(path))
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(path, _BLOB_MODE)
+            try:
+                os.link(path, blob)
+                return True, 0
+            except OSError as e:
+                os.chmod(path, stat.S_IMODE(st.st_mode))
+                if isinstance(e, FileExistsError):
+                    pass  # Added by another thread meanwhile.
+                elif e.errno in _NO_LINK_ERRNOS:
+                    store.add(path)
+                else:
+                    raise
+        if _same_file(st, os.stat(blob)):
+            return False, 0
+        store.link_blob(blob, path)
+        return True, st.st_size if st.st_nlink == 1 else 0
+
+    paths = _asset_files(Path(root), store.root)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {path: pool.submit(dedupe, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                linked, saved = future.result()
+            except OSError as e:
+                report.errors[path] = str(e)
+                continue
+            if linked:
+                report.linked.append(path)
+                report.bytes_saved += saved
+            else:
+                report.unchanged += 1
+    return report
@@ -0,0 +1,93 @@
+"""
+Reading the metadata of many documents on a pool of processes.
+
+Parsing YAML is CPU-bound and holds the GIL, so threads don't speed it up. Instead,
+paths are grouped by directory (so each worker reads files that are near each other
+on disk), split into batches, and the batches are read in worker processes. Small
+inputs are read in-process, since starting workers would cost more than it saves.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from sidematter_format.sidematter_format import Sidematter
+
+DEFAULT_CHUNKSIZE = 256
+"""Documents read by a worker process per batch."""
+
+MIN_PARALLEL_PATHS = 1024
+"""Inputs smaller than this are read in-process."""
+
+
+@dataclass(frozen=True)
+class MetaResult:
+    """
+    The metadata of one document read by `read_meta_many()`, or the error reading it.
+    """
+
+    path: Path
+    meta: dict[str, Any] | None
+    error: str | None = None
+
+
+def default_workers() -> int:
+    cpu_count = getattr(os, "process_cpu_count", os.cpu_count)()
+    return cpu_count or 1
+
+
+def _read_one(path: Path, use_frontmatter: bool) -> MetaResult:
+    try:
+        return MetaResult(path, Sidematter(path).read_meta(use_frontmatter=use_frontmatter))
+    except Exception as e:
+        return MetaResult(path, None, str(e))
+
+
+def _read_batch(paths: list[Path], use_frontmatter: bool) -> list[MetaResult]:
+    return [_read_one(path, use_frontmatter) for path in paths]
+
+
+def read_meta_many(
+    paths: Iterable[str | Path],
+    *,
+    workers: int | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    use_frontmatter: bool = True,
+    min_parallel: int = MIN_PARALLEL_PATHS,
+) -> list[MetaResult]:
+    """
+    Read the metadata of many documents (as with `Sidematter.read_meta()`) on a pool
+    of `workers` processes, by default one per CPU. Paths are read in batches of up to
+    `chunksize` documents from the same directory. Returns one result per path, in
+    the order given, with errors reported per document rather than raised.
+
+    With fewer than `min_parallel` paths, or a single worker, everything is read in
+    this process. Worker processes see metadata formats registered at import time,
+    and with the "fork" start method, those registered before the call too.
+    """
+    path_list = [Path(p) for p in paths]
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive: {chunksize}")
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(path_list) < max(min_parallel, 2):
+        return _read_batch(path_list, use_frontmatter)
+
+    # Group by directory, keeping the original position of each path.
+    order = sorted(range(len(path_list)), key=lambda i: (path_list[i].parent, path_list[i].name))
+    batches = [order[i : i + chunksize] for i in range(0, len(order), chunksize)]
+
+    results: list[MetaResult | None] = [None] * len(path_list)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (batch, pool.submit(_read_batch, [path_list[i] for i in batch], use_frontmatter))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for i, result in zip(batch, future.result(), strict=True):
+                results[i] = result
+    return [r for r in results if r is not None]
@@ -0,0 +1,253 @@
+"""
+Renaming many documents, with their sidecars, as one planned operation.
+
+Planning works in memory: every source and destination sidecar path is computed, and
+each directory involved is listed once, so collisions, and renames that must wait for
+another (chains) or go through a temporary name (cycles, such as swapping two
+documents), are found with set lookups before anything on disk is changed. Applying a
+plan runs the renames in stages, in parallel within each stage.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+
+from strif import new_uid
+
+from sidematter_format.asset_listing import listing_cache_path
+from sidematter_format.compiled_marker import compiled_marker_path
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.meta_formats import meta_formats
+from sidematter_format.sidematter_format import ResolvedSidematter, Sidematter, SidematterError
+from sidematter_format.sidematter_fs import LOCAL_FS, LocalFS, SidematterFS, WritableFS
+
+Move = tuple[Path, Path]
+
+
+@dataclass
+class RenamePlan:
+    """
+    Renames planned by `plan_renames()`. `stages` are lists of moves of single files or
+    directories, where every move in a stage can run at the same time once the
+    previous stages are done. If there are `conflicts`, the plan can't be applied.
+    """
+
+    documents: dict[Path, ResolvedSidematter] = field(default_factory=dict)
+    """The renamed sidematter of each source document."""
+
+    stages: list[list[Move]] = field(default_factory=list)
+    conflicts: dict[Path, str] = field(default_factory=dict)
+    make_dirs: list[Path] = field(default_factory=list)
+    """Directories to create before renaming."""
+
+    @property
+    def moves(self) -> list[Move]:
+        return [move for stage in self.stages for move in stage]
+
+
+class _Listings:
+    """
+    Names in each directory, listed once, so existence checks are set lookups.
+    """
+
+    def __init__(self, fs: SidematterFS | None):
+        self.fs: SidematterFS | None = None if isinstance(fs, LocalFS) else fs
+        self._dirs: dict[Path, dict[str, bool]] = {}
+
+    def _names(self, dir_path: Path) -> dict[str, bool]:
+        names = self._dirs.get(dir_path)
+        if names is None:
+            names = {}
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        names[entry.name] = entry.is_dir()
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+            self._dirs[dir_path] = names
+        return names
+
+    def exists(self, path: Path) -> bool:
+        if self.fs is not None:
+            return self.fs.exists(path)
+        return path.name in self._names(path.parent)
+
+    def is_dir(self, path: Path) -> bool:
+        if self.fs is not None:
+            return self.fs.is_dir(path)
+        return self._names(path.parent).get(path.name, False)
+
+
+def _sidecars(sm: Sidematter) -> list[Path]:
+    """
+    Every path that could hold sidematter for a document.
+    """
+    return [
+        *(sm.meta_path_for(fmt) for fmt in meta_formats()),
+        sm.meta_log_path,
+        compiled_marker_path(sm.meta_json_path),
+        listing_cache_path(sm.assets_dir),
+        sm.assets_dir,
+    ]
+
+
+def _stages(moves: list[Move]) -> list[list[Move]]:
+    """
+    Order moves so none overwrites a path that is yet to be moved away. Each cycle is
+    broken by first moving one of its items to a temporary name.
+    """
+    by_src = {src: dest for src, dest in moves}
+    depth: dict[Path, int] = {}
+
+    for start in list(by_src):
+        # Follow the chain of moves that must happen first (the move out of each
+        # destination), then assign depths back along it.
+        chain: list[Path] = []
+        seen: set[Path] = set()
+        src = start
+        while src in by_src and src not in depth and src not in seen:
+            seen.add(src)
+            chain.append(src)
+            src = by_src[src]
+        if src in seen:
+            # A cycle: move the item that was to be overwritten to a temporary name
+            # first, then from there to its destination once the cycle is done.
+            tmp = src.with_name(f"{src.name}.{new_uid()}.renaming")
+            final_dest = by_src[src]
+            by_src[src] = tmp
+            by_src[tmp] = final_dest
+            depth[src] = 0
+            cycle = chain[chain.index(src) + 1 :]
+            for i, s in enumerate(reversed(cycle)):
+                depth[s] = i + 1
+            depth[tmp] = len(cycle) + 1
+            chain = chain[: chain.index(src)]
+            base = depth[src]
+        else:
+            base = depth.get(src, -1)
+        for s in reversed(chain):
+            base += 1
+            depth[s] = base
+
+    stages: list[list[Move]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+    for src, dest in by_src.items():
+        stages[depth[src]].append((src, dest))
+    return stages
+
+
+def plan_renames(
+    mapping: Mapping[str | Path, str | Path] | Iterable[tuple[str | Path, str | Path]],
+    *,
+    fs: WritableFS | None = None,
+) -> RenamePlan:
+    """
+    Plan renaming each source document to its destination, with its metadata (every
+    format present, and any metadata log) and assets. Nothing on disk is changed, other
+    than writing any pending write-behind metadata of the sources, so it is planned too.
+
+    Conflicts are recorded in the plan rather than raised: missing sources, two
+    documents renamed to the same place, and destination paths (including sidecars
+    that would be found for the renamed document) that exist and aren't themselves
+    being renamed away.
+    """
+    pairs = list(
+        cast(Mapping[str | Path, str | Path], mapping).items()
+        if isinstance(mapping, Mapping)
+        else mapping
+    )
+    for src_path, _dest_path in pairs:
+        Sidematter(Path(src_path), fs=fs).flush_pending_meta()
+    listings = _Listings(fs)
+    plan = RenamePlan()
+
+    moves: dict[Path, Path] = {}
+    sources: set[Path] = set()
+    for src_path, dest_path in pairs:
+        src = Path(src_path)
+        dest = Path(dest_path)
+        if src in sources:
+            plan.conflicts[src] = "Renamed more than once"
+            continue
+        sources.add(src)
+        if not listings.exists(src) or listings.is_dir(src):
+            plan.conflicts[src] = "Source document does not exist"
+            continue
+
+        src_sm = Sidematter(src, fs=fs)
+        dest_sm = Sidematter(dest, fs=fs)
+        present = {p for p in _sidecars(src_sm) if listings.exists(p)}
+        meta_path = next(
+            (src_sm.meta_path_for(f) for f in meta_formats() if src_sm.meta_path_for(f) in present),
+            None,
+        )
+        resolved = ResolvedSidematter(
+            primary=src,
+            meta_path=meta_path,
+            assets_dir=src_sm.assets_dir if listings.is_dir(src_sm.assets_dir) else None,
+            meta=None,
+        )
+        plan.documents[src] = resolved.renamed_as(dest)
+        if src == dest:
+            continue
+        moves[src] = dest
+        for src_item, dest_item in zip(_sidecars(src_sm), _sidecars(dest_sm), strict=True):
+            if src_item in present:
+                moves[src_item] = dest_item
+
+    # Every destination must be free, or be moved away by the plan.
+    dests: dict[Path, Path] = {}
+    for src, dest in moves.items():
+        if dest in dests:
+            plan.conflicts[dest] = f"Both {dests[dest]} and {src} are renamed to it"
+        dests[dest] = src
+    for src, dest in list(moves.items()):
+        if src in sources:
+            for candidate in [dest, *_sidecars(Sidematter(dest, fs=fs))]:
+                if listings.exists(candidate) and candidate not in moves:
+                    plan.conflicts[candidate] = f"Already exists (renaming {src})"
+
+    if plan.conflicts:
+        return plan
+    # Sidecars can keep their names, e.g. when only the primary's extension changes.
+    plan.stages = _stages([(src, dest) for src, dest in moves.items() if src != dest])
+    plan.make_dirs = sorted(
+        {dest.parent for dest in moves.values() if not listings.is_dir(dest.parent)}
+    )
+    return plan
+
+
+def apply_plan(
+    plan: RenamePlan, *, workers: int = DEFAULT_COPY_WORKERS, fs: WritableFS | None = None
+) -> None:
+    """
+    Apply a plan from `plan_renames()`, running the renames of each stage on a pool of
+    `workers` threads. Raises `SidematterError` if the plan has conflicts, or if a
+    rename fails, in which case the renames of earlier stages have been done.
+    """
+    if plan.conflicts:
+        details = "; ".join(f"{path}: {reason}" for path, reason in plan.conflicts.items())
+        raise SidematterError(f"Cannot apply a rename plan with conflicts: {details}")
+    wfs = LOCAL_FS if fs is None else fs
+
+    # Pending write-behind metadata must not be written to the old paths afterwards.
+    for src, renamed in plan.documents.items():
+        Sidematter(src, fs=fs).flush_pending_meta()
+        Sidematter(renamed.primary, fs=fs).discard_pending_meta()
+
+    for dir_path in plan.make_dirs:
+        wfs.mkdir(dir_path)
+
+    def rename(move: Move) -> None:
+        wfs.rename(*move)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for stage in plan.stages:
+            try:
+                list(pool.map(rename, stage))
+            except Exception as e:
+                raise SidematterError(f"Error renaming: {e}") from e
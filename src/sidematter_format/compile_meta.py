@@ -0,0 +1,204 @@
+"""
+Compile YAML sidecar metadata to JSON, for fast reads of human-edited metadata.
+
+Since `.meta.json` takes precedence over `.meta.yml`, a compiled JSON sidecar next to
+each YAML sidecar means readers parse JSON instead of YAML. Each compiled JSON gets a
+marker (see `compiled_marker`) recording the YAML it was compiled from, so it is known
+to be stale whenever the YAML differs (including when an older YAML is restored, as by
+a checkout or backup restore). JSON that wasn't compiled, such as one written with
+`write_meta(formats="json")`, is newer metadata than the YAML and is never overwritten.
+
+Writing metadata to the YAML sidecar (with `write_meta()`) removes JSON compiled from
+it, so reads never see JSON compiled from an older YAML written that way. YAML edited
+by other means is seen once it is recompiled, or on `read_compiled_meta()`.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from strif import atomic_output_file
+
+from sidematter_format.compiled_marker import (
+    CompiledMarker,
+    FileSig,
+    compiled_marker_path,
+    json_digest,
+)
+from sidematter_format.meta_formats import JSON_SUFFIX, YAML_SUFFIX
+from sidematter_format.sidematter_format import (
+    Sidematter,
+    SidematterError,
+    decode_meta,
+    encode_meta,
+)
+
+DEFAULT_COMPILE_WORKERS = os.cpu_count() or 4
+
+
+@dataclass
+class CompileReport:
+    """
+    Result of `compile_meta()`, listing YAML sidecar paths by outcome.
+    """
+
+    compiled: list[Path] = field(default_factory=list)
+    up_to_date: list[Path] = field(default_factory=list)
+    skipped: list[Path] = field(default_factory=list)
+    """YAML sidecars with a JSON sidecar that wasn't compiled, which is left as is."""
+
+    errors: dict[Path, str] = field(default_factory=dict)
+
+
+def compiled_json_path(yaml_path: Path) -> Path:
+    """
+    The `.meta.json` path that corresponds to a `.meta.yml` path.
+    """
+    return yaml_path.with_name(yaml_path.name.removesuffix(YAML_SUFFIX) + JSON_SUFFIX)
+
+
+_JsonStatus = Literal["missing", "current", "stale", "not_compiled"]
+
+
+def _sig(st: os.stat_result) -> FileSig:
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _json_status(yaml_path: Path) -> _JsonStatus:
+    """
+    The state of the JSON beside `yaml_path`. Raises `FileNotFoundError` if the YAML
+    itself doesn't exist.
+    """
+    yaml_sig = _sig(yaml_path.stat())
+    json_path = compiled_json_path(yaml_path)
+    try:
+        json_sig = _sig(json_path.stat())
+    except FileNotFoundError:
+        return "missing"
+    try:
+        marker = CompiledMarker.decode(compiled_marker_path(json_path).read_bytes())
+    except FileNotFoundError:
+        marker = None
+    # Compiled if unchanged since, or else rewritten with the same content.
+    if marker is None or (
+        json_sig != marker.json and not marker.is_compiled(json_path.read_bytes())
+    ):
+        return "not_compiled"
+    return "current" if marker.source == yaml_sig else "stale"
+
+
+def is_stale(yaml_path: Path) -> bool:
+    """
+    True if the JSON compiled from `yaml_path` is missing, or was compiled from a YAML
+    with a different size or modification time. A JSON sidecar that wasn't compiled is
+    never stale, since compiling would overwrite newer metadata.
+    Raises `FileNotFoundError` if the YAML itself doesn't exist.
+    """
+    return _json_status(yaml_path) in ("missing", "stale")
+
+
+def compile_sidecar(yaml_path: Path) -> Path:
+    """
+    Compile one YAML sidecar to JSON atomically, and record it in the marker. Values
+    without a JSON equivalent, such as dates, are written following the usual JSON
+    conventions (e.g. ISO strings). Any existing JSON is replaced, so check
+    `is_stale()` first.
+
+    Raises:
+        SidematterError: If the YAML can't be read or parsed.
+    """
+    try:
+        yaml_stat = yaml_path.stat()
+        content = yaml_path.read_bytes()
+    except OSError as e:
+        raise SidematterError(f"Error loading metadata: {yaml_path}: {e}") from e
+    data: dict[str, Any] = decode_meta(content, yaml_path)
+
+    json_path = compiled_json_path(yaml_path)
+    json_content = encode_meta(data, "json")
+    with atomic_output_file(json_path) as tmp_path:
+        tmp_path.write_bytes(json_content)
+    marker = CompiledMarker(_sig(yaml_stat), _sig(json_path.stat()), json_digest(json_content))
+    with atomic_output_file(compiled_marker_path(json_path)) as tmp_path:
+        tmp_path.write_bytes(marker.encode())
+    return json_path
+
+
+def _compile_or_error(yaml_path: Path) -> str | None:
+    try:
+        compile_sidecar(yaml_path)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def iter_yaml_sidecars(root: str | Path) -> Iterator[Path]:
+    """
+    Yield every `.meta.yml` file under `root`.
+    """
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(YAML_SUFFIX):
+                yield Path(dirpath) / name
+
+
+def compile_meta(
+    root: str | Path,
+    *,
+    workers: int = DEFAULT_COMPILE_WORKERS,
+    force: bool = False,
+) -> CompileReport:
+    """
+    Write a `.meta.json` next to each `.meta.yml` under `root` whose JSON is missing
+    or stale (or all compiled JSON, with `force`). JSON that wasn't compiled is never
+    overwritten, and is reported as skipped. YAML parsing is CPU-bound, so sidecars
+    are compiled on a pool of `workers` processes. Errors are reported per file.
+    """
+    report = CompileReport()
+    pending: list[Path] = []
+    for yaml_path in iter_yaml_sidecars(root):
+        try:
+            status = _json_status(yaml_path)
+        except FileNotFoundError:
+            continue  # Removed since listing
+        if status == "not_compiled":
+            report.skipped.append(yaml_path)
+        elif status == "current" and not force:
+            report.up_to_date.append(yaml_path)
+        else:
+            pending.append(yaml_path)
+
+    if workers <= 1 or len(pending) <= 1:
+        errors = [_compile_or_error(p) for p in pending]
+    else:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(_compile_or_error, pending, chunksize=chunksize))
+
+    for yaml_path, error in zip(pending, errors, strict=True):
+        if error is None:
+            report.compiled.append(yaml_path)
+        else:
+            report.errors[yaml_path] = error
+    return report
+
+
+def read_compiled_meta(primary: str | Path, *, use_frontmatter: bool = True) -> dict[str, Any]:
+    """
+    Read metadata like `Sidematter.read_meta()`, but if the document has a YAML
+    sidecar whose compiled JSON is missing or stale (see `is_stale()`), recompile it
+    first, so stale JSON is never served.
+    """
+    sm = Sidematter(Path(primary))
+    try:
+        stale = is_stale(sm.meta_yaml_path)
+    except FileNotFoundError:
+        stale = False
+    if stale:
+        compile_sidecar(sm.meta_yaml_path)
+    return sm.read_meta(use_frontmatter=use_frontmatter)
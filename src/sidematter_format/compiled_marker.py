@@ -0,0 +1,83 @@
+"""
+Markers recording that a `.meta.json` sidecar was compiled from the `.meta.yml` beside it
+(see `compile_meta`), kept as `basename.meta.json.compiled`.
+
+A marker holds the size and modification time of the YAML the JSON was compiled from,
+and the size, modification time, and SHA-256 of the JSON written. So JSON that was
+written any other way (such as by `write_meta(formats="json")`) is known not to be
+compiled and is never overwritten by compiling, and compiled JSON is known to be stale
+whenever the YAML differs from the one it was compiled from, even if an older YAML is
+restored.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+from sidematter_format.meta_formats import JSON_SUFFIX
+
+_MARKER_EXTENSION = ".compiled"
+
+COMPILED_MARKER_SUFFIX = f"{JSON_SUFFIX}{_MARKER_EXTENSION}"
+
+FileSig = tuple[int, int]
+"""Size and modification time (in nanoseconds) of a file."""
+
+
+def compiled_marker_path(json_path: Path) -> Path:
+    """
+    The marker path for a `.meta.json` path.
+    """
+    return json_path.with_name(json_path.name + _MARKER_EXTENSION)
+
+
+def json_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledMarker:
+    """
+    What compiling a YAML sidecar to JSON read and wrote.
+    """
+
+    source: FileSig
+    """Signature of the YAML compiled from."""
+
+    json: FileSig
+    """Signature of the JSON as written."""
+
+    sha256: str
+    """Digest of the JSON as written."""
+
+    def encode(self) -> bytes:
+        values = {"source": list(self.source), "json": list(self.json), "sha256": self.sha256}
+        return json.dumps(values).encode("utf-8")
+
+    @classmethod
+    def decode(cls, data: bytes) -> CompiledMarker | None:
+        """
+        Decode a marker, or return None if it is invalid, so the JSON is not trusted
+        to be compiled.
+        """
+        try:
+            values = cast(dict[str, Any], json.loads(data))
+            source = cast(list[Any], values["source"])
+            json_sig = cast(list[Any], values["json"])
+            return cls(
+                (int(source[0]), int(source[1])),
+                (int(json_sig[0]), int(json_sig[1])),
+                str(values["sha256"]),
+            )
+        except (ValueError, KeyError, TypeError, IndexError):
+            return None
+
+    def is_compiled(self, content: bytes) -> bool:
+        """
+        Whether JSON with `content` is the JSON this marker records as compiled.
+        """
+        return json_digest(content) == self.sha256
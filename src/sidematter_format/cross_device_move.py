@@ -0,0 +1,189 @@
+"""
+Journaled moves of sidematter files across filesystems.
+
+A move across devices can't be a rename, so it is a copy followed by a delete. To
+avoid ever leaving a half-moved document, we record a small journal in the destination
+directory, copy everything to temporary names, flush it to disk, and only then rename
+into place and delete the sources. An interrupted move can be finished or undone with
+`recover_moves()`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Literal
+
+from strif import atomic_output_file, new_uid
+
+from sidematter_format.file_copy import (
+    DEFAULT_COPY_WORKERS,
+    copy_files_parallel,
+    copy_tree_parallel,
+    fsync_dir,
+)
+
+JOURNAL_SUFFIX = ".sidematter-move.json"
+
+JournalState = Literal["copying", "copied"]
+
+
+def _device_of(path: Path) -> int:
+    """
+    Device id of `path`, or of its nearest existing ancestor.
+    """
+    for p in (path, *path.parents):
+        try:
+            return p.stat().st_dev
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(f"No existing ancestor: {path}")
+
+
+def is_cross_device(src: str | Path, dest: str | Path) -> bool:
+    """
+    True if `src` and the destination `dest` are on different filesystems, so moving
+    between them can't be done with a rename.
+    """
+    return _device_of(Path(src).absolute()) != _device_of(Path(dest).absolute().parent)
+
+
+@dataclass
+class MoveItem:
+    src: str
+    dest: str
+    tmp: str
+    is_dir: bool
+
+
+@dataclass
+class MoveJournal:
+    """
+    Record of an in-progress cross-device move. While `state` is "copying", the
+    destinations are incomplete and the move is rolled back on recovery. Once "copied",
+    all destination data is durable and the move is rolled forward.
+    """
+
+    path: Path
+    state: JournalState
+    items: list[MoveItem]
+
+    def save(self) -> None:
+        data = {"state": self.state, "items": [asdict(item) for item in self.items]}
+        with atomic_output_file(self.path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+        fsync_dir(self.path.parent)
+
+    @classmethod
+    def load(cls, path: Path) -> MoveJournal:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            path=path,
+            state=data["state"],
+            items=[MoveItem(**item) for item in data["items"]],
+        )
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+        fsync_dir(self.path.parent)
+
+
+def _remove_path(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _roll_back(journal: MoveJournal) -> None:
+    for item in journal.items:
+        _remove_path(Path(item.tmp))
+    journal.remove()
+
+
+def _roll_forward(journal: MoveJournal) -> None:
+    parents: set[Path] = set()
+    for item in journal.items:
+        tmp, dest = Path(item.tmp), Path(item.dest)
+        if tmp.exists() or tmp.is_symlink():
+            os.replace(tmp, dest)
+        parents.add(dest.parent)
+    for parent in parents:
+        fsync_dir(parent)
+
+    # Only now that every destination is in place is it safe to delete the sources.
+    for item in journal.items:
+        _remove_path(Path(item.src))
+    journal.remove()
+
+
+def move_across_devices(
+    pairs: list[tuple[Path, Path]],
+    *,
+    journal_dir: Path,
+    workers: int = DEFAULT_COPY_WORKERS,
+) -> None:
+    """
+    Move (source, destination) pairs of files or directories to another filesystem.
+    Data is copied in parallel to temporary names, flushed to disk, then renamed into
+    place, and sources are deleted last. A journal in `journal_dir` records progress
+    so an interrupted move can be recovered with `recover_moves()`.
+    """
+    uid = new_uid()
+    items: list[MoveItem] = []
+    for src, dest in pairs:
+        src, dest = src.absolute(), dest.absolute()
+        is_dir = src.is_dir() and not src.is_symlink()
+        if is_dir and dest.exists():
+            raise FileExistsError(f"Destination directory already exists: {dest}")
+        tmp = dest.with_name(f"{dest.name}.{uid}.partial")
+        items.append(MoveItem(src=str(src), dest=str(dest), tmp=str(tmp), is_dir=is_dir))
+
+    journal = MoveJournal(
+        path=journal_dir.absolute() / f".{uid}{JOURNAL_SUFFIX}", state="copying", items=items
+    )
+    journal.save()
+
+    try:
+        copy_files_parallel(
+            [(Path(item.src), Path(item.tmp)) for item in items if not item.is_dir],
+            workers=workers,
+            fsync=True,
+        )
+        for item in items:
+            if item.is_dir:
+                copy_tree_parallel(item.src, item.tmp, workers=workers, fsync=True)
+        for parent in {Path(item.tmp).parent for item in items}:
+            fsync_dir(parent)
+    except BaseException:
+        _roll_back(journal)
+        raise
+
+    journal.state = "copied"
+    journal.save()
+    _roll_forward(journal)
+
+
+def recover_moves(directory: str | Path) -> list[Path]:
+    """
+    Finish or undo any interrupted cross-device moves whose journals are in `directory`
+    (the destination directory of the move). Moves that had not finished copying are
+    rolled back, leaving the sources untouched; moves whose copies were complete are
+    rolled forward. Returns the journal paths that were processed.
+    """
+    processed: list[Path] = []
+    for journal_path in sorted(Path(directory).glob(f".*{JOURNAL_SUFFIX}")):
+        journal = MoveJournal.load(journal_path)
+        if journal.state == "copied":
+            _roll_forward(journal)
+        else:
+            _roll_back(journal)
+        processed.append(journal_path)
+    return processed
@@ -0,0 +1,174 @@
+"""
+Fast file and tree copying with kernel-side copies and a thread pool.
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_COPY_WORKERS = 8
+
+_COPY_CHUNK = 1 << 30
+
+# Errors that mean a kernel-side copy isn't available for this pair of files, so we
+# should fall back to the next method rather than fail.
+_FALLBACK_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.ETXTBSY,
+}
+
+
+def _copy_fd_range(src_fd: int, dest_fd: int, size: int) -> bool:
+    """
+    Copy `size` bytes with `copy_file_range`, which lets the kernel (or an NFS server)
+    copy without passing data through userspace. Returns False if not supported.
+    """
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = copy_file_range(src_fd, dest_fd, min(_COPY_CHUNK, size - copied))
+            if n == 0:
+                break
+            copied += n
+    except OSError as e:
+        if copied == 0 and e.errno in _FALLBACK_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def _copy_fd_sendfile(src_fd: int, dest_fd: int, size: int) -> bool:
+    """
+    Copy `size` bytes with `sendfile`. Returns False if not supported.
+    """
+    if not hasattr(os, "sendfile"):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.sendfile(dest_fd, src_fd, copied, min(_COPY_CHUNK, size - copied))
+            if n == 0:
+                break
+            copied += n
+    except OSError as e:
+        if copied == 0 and e.errno in _FALLBACK_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def copy_file_fast(src: str | Path, dest: str | Path, *, fsync: bool = False) -> None:
+    """
+    Copy a file's contents and timestamps/permissions, using `copy_file_range` or
+    `sendfile` when available and falling back to a buffered copy. With `fsync`, the
+    destination file is flushed to disk before returning.
+    """
+    src = Path(src)
+    dest = Path(dest)
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        size = os.fstat(fsrc.fileno()).st_size
+        if not (
+            _copy_fd_range(fsrc.fileno(), fdest.fileno(), size)
+            or _copy_fd_sendfile(fsrc.fileno(), fdest.fileno(), size)
+        ):
+            shutil.copyfileobj(fsrc, fdest)
+        if fsync:
+            fdest.flush()
+            os.fsync(fdest.fileno())
+    shutil.copystat(src, dest)
+
+
+def fsync_dir(path: str | Path) -> None:
+    """
+    Flush a directory's entries to disk, so newly created or renamed files in it are
+    durable. Does nothing on platforms that can't open directories.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def copy_files_parallel(
+    pairs: Iterable[tuple[Path, Path]],
+    *,
+    workers: int = DEFAULT_COPY_WORKERS,
+    fsync: bool = False,
+) -> None:
+    """
+    Copy (source, destination) file pairs on a thread pool. Destination parent
+    directories must already exist. Raises the first error encountered.
+    """
+    pairs = list(pairs)
+    if workers <= 1 or len(pairs) <= 1:
+        for src, dest in pairs:
+            copy_file_fast(src, dest, fsync=fsync)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(copy_file_fast, src, dest, fsync=fsync) for src, dest in pairs]
+        for future in futures:
+            future.result()
+
+
+def copy_tree_parallel(
+    src_dir: str | Path,
+    dest_dir: str | Path,
+    *,
+    workers: int = DEFAULT_COPY_WORKERS,
+    fsync: bool = False,
+) -> None:
+    """
+    Copy a directory tree, creating all directories first and then copying files in
+    parallel. Symlinks are copied as symlinks. With `fsync`, files and directories are
+    flushed to disk before returning.
+    """
+    src_dir = Path(src_dir)
+    dest_dir = Path(dest_dir)
+    dirs: list[Path] = [dest_dir]
+    file_pairs: list[tuple[Path, Path]] = []
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for root, dirnames, filenames in os.walk(src_dir):
+        rel = Path(root).relative_to(src_dir)
+        for name in dirnames:
+            src_sub = Path(root) / name
+            dest_sub = dest_dir / rel / name
+            if src_sub.is_symlink():
+                os.symlink(os.readlink(src_sub), dest_sub)
+            else:
+                dest_sub.mkdir(exist_ok=True)
+                dirs.append(dest_sub)
+        for name in filenames:
+            src_file = Path(root) / name
+            dest_file = dest_dir / rel / name
+            if src_file.is_symlink():
+                os.symlink(os.readlink(src_file), dest_file)
+            else:
+                file_pairs.append((src_file, dest_file))
+
+    copy_files_parallel(file_pairs, workers=workers, fsync=fsync)
+
+    # Directory timestamps are set last since creating files updates them.
+    for d in reversed(dirs):
+        shutil.copystat(src_dir / d.relative_to(dest_dir), d)
+        if fsync:
+            fsync_dir(d)
@@ -0,0 +1,366 @@
+"""
+A WSGI application serving documents, their metadata, and their assets over HTTP.
+
+Only the standard library is used, so the app runs under any WSGI server (or
+`wsgiref` for local use). Validators come from file stat signatures, so conditional
+and range requests need no reads of file contents, and files are passed to the
+server's `wsgi.file_wrapper`, which lets servers that support it send them with
+`sendfile`.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+import stat
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from sidematter_format.json_conventions import to_json_string
+from sidematter_format.meta_log import log_old_path
+from sidematter_format.sidematter_format import Sidematter, SidematterError
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIEnvironment
+
+META_PREFIX = "/meta/"
+DEFAULT_META_CACHE_SIZE = 4096
+
+_BLOCK_SIZE = 64 * 1024
+
+Headers = list[tuple[str, str]]
+
+
+@dataclass(frozen=True)
+class StatSignature:
+    """
+    The parts of a file's stat that change when its contents change.
+    """
+
+    ino: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, st: os.stat_result) -> StatSignature:
+        return cls(st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def etag(self, tag: str = "") -> str:
+        return _combined_etag((self,), tag)
+
+    def last_modified(self) -> str:
+        return formatdate(self.mtime_ns / 1e9, usegmt=True)
+
+
+def _combined_etag(sigs: Iterable[StatSignature], tag: str = "") -> str:
+    """
+    An ETag for content read from several files, which changes when any of them do.
+    """
+    parts = ".".join(f"{sig.ino:x}-{sig.size:x}-{sig.mtime_ns:x}" for sig in sigs)
+    return f'"{tag}{parts}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match.
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def _not_modified(environ: WSGIEnvironment, sig: StatSignature, etag: str) -> bool:
+    if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+    if if_modified_since:
+        since = _parse_http_date(if_modified_since)
+        if since is not None:
+            return sig.mtime_ns // 1_000_000_000 <= int(since.timestamp())
+    return False
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single-range `Range` header into a (start, end) byte range, end exclusive.
+    Returns None if the header should be ignored (malformed, or multiple ranges), and
+    raises `ValueError` if the range can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last):
+        return None
+    if not all(n.isascii() and n.isdigit() for n in (first, last) if n):
+        return None
+
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(f"Range not satisfiable: {header}")
+        return max(0, size - suffix), size
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range not satisfiable: {header}")
+    return start, size if not last else min(int(last) + 1, size)
+
+
+class _FileRange:
+    """
+    A file positioned at the start of a byte range, for `wsgi.file_wrapper`. Reads stop
+    at the end of the range, and `fileno()` lets servers use `sendfile` (which is
+    bounded by the Content-Length header).
+    """
+
+    def __init__(self, f: IO[bytes], start: int, end: int):
+        self._f: IO[bytes] = f
+        self._remaining: int = end - start
+        f.seek(start)
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def _iter_file(f: _FileRange) -> Iterator[bytes]:
+    try:
+        while chunk := f.read(_BLOCK_SIZE):
+            yield chunk
+    finally:
+        f.close()
+
+
+class SidematterApp:
+    """
+    WSGI app serving files under `root`:
+
+    - `GET /path/to/doc.md` serves the file itself. Asset files are served the same way,
+      e.g. `/path/to/doc.assets/chart.png`.
+    - `GET /meta/path/to/doc.md` serves the document's metadata as JSON, from whichever
+      sidecar (or frontmatter) it is in.
+
+    Responses have an ETag and Last-Modified from the file's stat, conditional requests
+    get 304 Not Modified, and single byte ranges are supported. Metadata is cached in
+    memory and revalidated against the sidecar's stat on each request.
+    """
+
+    def __init__(self, root: str | Path, *, meta_cache_size: int = DEFAULT_META_CACHE_SIZE):
+        self.root: Path = Path(root).resolve()
+        self.meta_cache_size: int = meta_cache_size
+        self._meta_cache: OrderedDict[Path, tuple[Path, tuple[StatSignature, ...], bytes]] = (
+            OrderedDict()
+        )
+        self._lock: threading.Lock = threading.Lock()
+
+    def __call__(self, environ: WSGIEnvironment, start_response: StartResponse) -> Iterable[bytes]:
+        method = environ.get("REQUEST_METHOD", "GET")
+        if method not in ("GET", "HEAD"):
+            return self._error(start_response, "405 Method Not Allowed", [("Allow", "GET, HEAD")])
+
+        # PEP 3333 paths are bytes decoded as latin-1.
+        path_info: str = environ.get("PATH_INFO", "") or "/"
+        try:
+            path_info = path_info.encode("latin-1").decode("utf-8")
+        except UnicodeError:
+            return self._error(start_response, "400 Bad Request")
+
+        if path_info.startswith(META_PREFIX):
+            target = self._local_path(path_info[len(META_PREFIX) :])
+            if target is None:
+                return self._error(start_response, "404 Not Found")
+            return self._serve_meta(environ, start_response, target, method == "HEAD")
+
+        target = self._local_path(path_info)
+        if target is None:
+            return self._error(start_response, "404 Not Found")
+        return self._serve_file(environ, start_response, target, method == "HEAD")
+
+    def _local_path(self, url_path: str) -> Path | None:
+        """
+        Map a URL path to a path under the root, or None if it would be outside it.
+        """
+        parts = [p for p in url_path.split("/") if p]
+        if not parts or any(p in (".", "..") or "\\" in p or "\0" in p for p in parts):
+            return None
+        path = self.root.joinpath(*parts)
+        try:
+            if not path.resolve().is_relative_to(self.root):
+                return None
+        except OSError:
+            return None
+        return path
+
+    def _error(
+        self, start_response: StartResponse, status: str, headers: Headers | None = None
+    ) -> Iterable[bytes]:
+        body = status.encode("utf-8") + b"\n"
+        start_response(
+            status,
+            [
+                ("Content-Type", "text/plain; charset=utf-8"),
+                ("Content-Length", str(len(body))),
+                *(headers or []),
+            ],
+        )
+        return [body]
+
+    def _not_modified(self, start_response: StartResponse, headers: Headers) -> Iterable[bytes]:
+        start_response("304 Not Modified", headers)
+        return []
+
+    def _serve_file(
+        self, environ: WSGIEnvironment, start_response: StartResponse, path: Path, head: bool
+    ) -> Iterable[bytes]:
+        try:
+            f = open(path, "rb")
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError):
+            return self._error(start_response, "404 Not Found")
+        try:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                f.close()
+                return self._error(start_response, "404 Not Found")
+            sig = StatSignature.of(st)
+            etag = sig.etag()
+            headers: Headers = [
+                ("ETag", etag),
+                ("Last-Modified", sig.last_modified()),
+                ("Accept-Ranges", "bytes"),
+            ]
+            if _not_modified(environ, sig, etag):
+                f.close()
+                return self._not_modified(start_response, headers)
+
+            content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            headers.append(("Content-Type", content_type))
+
+            status = "200 OK"
+            start, end = 0, sig.size
+            range_header = environ.get("HTTP_RANGE")
+            if range_header and self._if_range_matches(environ, sig, etag):
+                try:
+                    byte_range = parse_range(range_header, sig.size)
+                except ValueError:
+                    f.close()
+                    return self._error(
+                        start_response,
+                        "416 Range Not Satisfiable",
+                        [("Content-Range", f"bytes */{sig.size}")],
+                    )
+                if byte_range is not None:
+                    start, end = byte_range
+                    status = "206 Partial Content"
+                    headers.append(("Content-Range", f"bytes {start}-{end - 1}/{sig.size}"))
+            headers.append(("Content-Length", str(end - start)))
+        except BaseException:
+            f.close()
+            raise
+
+        start_response(status, headers)
+        if head:
+            f.close()
+            return []
+        body = _FileRange(f, start, end)
+        file_wrapper: Any = environ.get("wsgi.file_wrapper")
+        if file_wrapper is not None:
+            return file_wrapper(body, _BLOCK_SIZE)
+        return _iter_file(body)
+
+    def _if_range_matches(self, environ: WSGIEnvironment, sig: StatSignature, etag: str) -> bool:
+        if_range: str | None = environ.get("HTTP_IF_RANGE")
+        if not if_range:
+            return True
+        if if_range.startswith(('"', "W/")):
+            return if_range.strip() == etag
+        since = _parse_http_date(if_range)
+        return since is not None and sig.mtime_ns // 1_000_000_000 == int(since.timestamp())
+
+    def _meta_json(self, primary: Path) -> tuple[tuple[StatSignature, ...], bytes] | None:
+        """
+        Metadata JSON for a document and the stat signatures of the files it came from
+        (the sidecar or document, then the metadata log and its compaction copy, if
+        present), from the cache if the files are unchanged. None if the document has
+        no metadata and doesn't exist.
+        """
+        sm = Sidematter(primary)
+        source = sm.resolve_meta() or primary
+        try:
+            sigs = [StatSignature.of(source.stat())]
+        except FileNotFoundError:
+            return None
+        log = sm.meta_log_path
+        for path in (log, log_old_path(log)):
+            try:
+                sigs.append(StatSignature.of(path.stat()))
+            except FileNotFoundError:
+                # The copy of the log is only used while the log exists.
+                break
+        key = tuple(sigs)
+
+        with self._lock:
+            cached = self._meta_cache.get(primary)
+            if cached is not None and cached[0] == source and cached[1] == key:
+                self._meta_cache.move_to_end(primary)
+                return key, cached[2]
+
+        body = (to_json_string(sm.read_meta()) + "\n").encode("utf-8")
+        with self._lock:
+            self._meta_cache[primary] = (source, key, body)
+            self._meta_cache.move_to_end(primary)
+            while len(self._meta_cache) > self.meta_cache_size:
+                self._meta_cache.popitem(last=False)
+        return key, body
+
+    def _serve_meta(
+        self, environ: WSGIEnvironment, start_response: StartResponse, primary: Path, head: bool
+    ) -> Iterable[bytes]:
+        try:
+            result = self._meta_json(primary)
+        except SidematterError:
+            return self._error(start_response, "500 Internal Server Error")
+        if result is None:
+            return self._error(start_response, "404 Not Found")
+        sigs, body = result
+
+        etag = _combined_etag(sigs, "meta-")
+        # The most recently modified file gives the date for If-Modified-Since.
+        sig = max(sigs, key=lambda s: s.mtime_ns)
+        headers: Headers = [("ETag", etag), ("Last-Modified", sig.last_modified())]
+        if _not_modified(environ, sig, etag):
+            return self._not_modified(start_response, headers)
+        headers += [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+        ]
+        start_response("200 OK", headers)
+        return [] if head else [body]
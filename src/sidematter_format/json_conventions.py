@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 import json
-from collections.abc import Iterable
-from dataclasses import asdict, is_dataclass
+import threading
+from collections.abc import Callable, Iterable
+from dataclasses import fields, is_dataclass
 from datetime import date, datetime, time
 from enum import Enum
 from pathlib import Path
-from typing import Any, Protocol, cast, runtime_checkable
+from typing import Any, Protocol, TypeVar, cast, runtime_checkable
 
 from strif import atomic_output_file, format_iso_timestamp
 
@@ -18,7 +19,93 @@ class AsDictProtocol(Protocol):
     def as_dict(self) -> dict[str, Any]: ...
 
 
-def _default(obj: Any) -> Any:
+T = TypeVar("T")
+
+JsonEncoder = Callable[[Any], Any]
+"""Converts an object of some type to a JSON-serializable value."""
+
+_registered_encoders: dict[type[Any], JsonEncoder] = {}
+
+_encoder_cache: dict[type[Any], JsonEncoder | None] = {}
+"""Encoder for each concrete type seen so far, or None if it's not serializable."""
+
+# Guards registration and filling the cache, so an encoder resolved before a
+# registration is never cached after it. Cache hits don't lock.
+_encoder_lock = threading.Lock()
+
+
+def register_json_encoder(cls: type[T], encoder: Callable[[T], Any]) -> None:
+    """
+    Register a JSON encoder for `cls` and its subclasses. Registered encoders take
+    precedence over the default policy.
+    """
+    with _encoder_lock:
+        _registered_encoders[cls] = encoder
+        _encoder_cache.clear()
+
+
+def unregister_json_encoder(cls: type[Any]) -> None:
+    """
+    Remove the JSON encoder registered for `cls`, if any.
+    """
+    with _encoder_lock:
+        _registered_encoders.pop(cls, None)
+        _encoder_cache.clear()
+
+
+def _isoformat(obj: date | time) -> str:
+    return obj.isoformat()
+
+
+def _enum_value(obj: Enum) -> Any:
+    return obj.value
+
+
+def _as_dict(obj: AsDictProtocol) -> dict[str, Any]:
+    return obj.as_dict()
+
+
+def _set_to_list(obj: set[Any]) -> list[Any]:
+    return list(cast(Iterable[Any], obj))
+
+
+def _dataclass_encoder(cls: type[Any]) -> JsonEncoder:
+    """
+    Encode a dataclass as a shallow dict of its fields. Unlike `asdict()` this does not
+    recursively copy values; nested dataclasses and other values are encoded as the
+    JSON encoder reaches them, with the same result.
+    """
+    names = tuple(f.name for f in fields(cls))
+
+    def encode(obj: Any) -> dict[str, Any]:
+        return {name: getattr(obj, name) for name in names}
+
+    return encode
+
+
+def _resolve_encoder(cls: type[Any]) -> JsonEncoder | None:
+    for base in cls.__mro__:
+        encoder = _registered_encoders.get(base)
+        if encoder is not None:
+            return encoder
+    if issubclass(cls, datetime):
+        return format_iso_timestamp
+    if issubclass(cls, (date, time)):
+        return _isoformat
+    if issubclass(cls, Enum):
+        return _enum_value
+    if is_dataclass(cls):
+        return _dataclass_encoder(cls)
+    if callable(getattr(cls, "as_dict", None)):
+        return _as_dict
+    if issubclass(cls, Path):
+        return str
+    if issubclass(cls, set):
+        return _set_to_list
+    return None
+
+
+def json_default(obj: Any) -> Any:
     """
     Reasonable JSON fallback encoder for unsupported types.
     Keeps behavior centralized and aligned with YAML representers.
@@ -27,28 +114,31 @@ def _default(obj: Any) -> Any:
     - datetime: ISO-8601 with trailing Z (via `strif.format_iso_timestamp`).
     - date/time: `.isoformat()`.
     - Enum: `.value`.
-    - Dataclasses: `asdict()`.
-    - Objects with `as_dict()`: use that mapping.
+    - Dataclasses: a dict of their fields (same output as `asdict()`).
+    - Objects with `as_dict()`: use that mapping. This is usually resolved from the
+      class, but an `as_dict` set only on the instance is still used.
     - Path: string path.
     - set: convert to list.
+    - Types registered with `register_json_encoder()`, ahead of all of the above.
+
+    The encoder is resolved once per concrete type and cached, so repeated objects of
+    the same type cost a single dict lookup.
     """
-    if isinstance(obj, datetime):
-        return format_iso_timestamp(obj)
-    if isinstance(obj, date):
-        return obj.isoformat()
-    if isinstance(obj, time):
-        return obj.isoformat()
-    if isinstance(obj, Enum):
-        return obj.value
-    if is_dataclass(obj) and not isinstance(obj, type):
-        return asdict(obj)
-    if isinstance(obj, AsDictProtocol):
-        return obj.as_dict()
-    if isinstance(obj, Path):
-        return str(obj)
-    if isinstance(obj, set):
-        return list(cast(Iterable[Any], obj))
-    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    cls = cast(type[Any], type(obj))
+    try:
+        encoder = _encoder_cache[cls]
+    except KeyError:
+        with _encoder_lock:
+            encoder = _encoder_cache[cls] = _resolve_encoder(cls)
+    if encoder is None:
+        # As with `isinstance(obj, AsDictProtocol)`, which also sees instance attributes.
+        if isinstance(obj, AsDictProtocol):
+            return obj.as_dict()
+        raise TypeError(f"Object of type {cls.__name__} is not JSON serializable")
+    return encoder(obj)
+
+
+_default = json_default
 
 
 def to_json_string(value: Any, *, indent: int | None = 2) -> str:
@@ -56,7 +146,7 @@ def to_json_string(value: Any, *, indent: int | None = 2) -> str:
     Serialize any value to a JSON string using the sensible defaults
     for enums and dates/times.
     """
-    return json.dumps(value, default=_default, indent=indent, ensure_ascii=False)
+    return json.dumps(value, default=json_default, indent=indent, ensure_ascii=False)
 
 
 def write_json_file(value: Any, path: str | Path, *, indent: int | None = 2) -> None:
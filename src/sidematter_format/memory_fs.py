@@ -0,0 +1,212 @@
+"""
+An in-memory filesystem for staging sidematter before writing it to disk, and for
+fast tests.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO
+
+from strif import atomic_output_file
+
+from sidematter_format.asset_listing import AssetEntry
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.sidematter_fs import member_name
+
+
+def _parent(name: str) -> str:
+    return name.rpartition("/")[0]
+
+
+def _is_under(name: str, dir_name: str) -> bool:
+    return not dir_name or name.startswith(f"{dir_name}/")
+
+
+def _moved(name: str, src: str, dest: str) -> str:
+    return dest + name[len(src) :]
+
+
+class MemoryFS:
+    """
+    A filesystem held in memory, implementing the same operations as the local
+    filesystem so it can be used with `Sidematter(..., fs=...)`, `copy_sidematter()`,
+    `move_sidematter()`, and `remove_sidematter()`. Paths are relative to the root of
+    the filesystem. Staged files are written to disk with `commit_to()`.
+
+    Operations are atomic with respect to each other, so a `MemoryFS` can be shared
+    between threads.
+    """
+
+    def __init__(self) -> None:
+        self._files: dict[str, tuple[bytes, int]] = {}
+        self._dirs: set[str] = {""}
+        self._lock: threading.Lock = threading.Lock()
+
+    # Reading
+
+    def exists(self, path: Path) -> bool:
+        name = member_name(path)
+        return name in self._files or name in self._dirs
+
+    def is_dir(self, path: Path) -> bool:
+        return member_name(path) in self._dirs
+
+    def read_bytes(self, path: Path) -> bytes:
+        name = member_name(path)
+        try:
+            return self._files[name][0]
+        except KeyError:
+            if name in self._dirs:
+                raise IsADirectoryError(f"Is a directory: {name}") from None
+            raise FileNotFoundError(f"No such file: {name}") from None
+
+    def open_read(self, path: Path) -> IO[bytes]:
+        return io.BytesIO(self.read_bytes(path))
+
+    def iter_files(self, path: Path) -> Iterator[AssetEntry]:
+        dir_name = member_name(path)
+        if dir_name not in self._dirs:
+            return
+        prefix = f"{dir_name}/" if dir_name else ""
+        with self._lock:
+            items = [(n, f) for n, f in self._files.items() if n.startswith(prefix)]
+        for name, (data, mtime_ns) in items:
+            yield AssetEntry(name[len(prefix) :], len(data), mtime_ns)
+
+    # Writing
+
+    def _add_dirs(self, name: str) -> None:
+        while name not in self._dirs:
+            if name in self._files:
+                raise FileExistsError(f"Not a directory: {name}")
+            self._dirs.add(name)
+            name = _parent(name)
+
+    def _check_parent(self, name: str, make_parents: bool) -> None:
+        parent = _parent(name)
+        if make_parents:
+            self._add_dirs(parent)
+        elif parent not in self._dirs:
+            raise FileNotFoundError(f"No such directory: {parent}")
+
+    def write_bytes(self, path: Path, data: bytes, *, make_parents: bool = True) -> None:
+        name = member_name(path)
+        with self._lock:
+            if name in self._dirs:
+                raise IsADirectoryError(f"Is a directory: {name}")
+            self._check_parent(name, make_parents)
+            self._files[name] = (bytes(data), time.time_ns())
+
+    def append_bytes(self, path: Path, data: bytes) -> int:
+        name = member_name(path)
+        with self._lock:
+            if name in self._dirs:
+                raise IsADirectoryError(f"Is a directory: {name}")
+            self._check_parent(name, make_parents=False)
+            content = self._files.get(name, (b"", 0))[0] + data
+            self._files[name] = (content, time.time_ns())
+            return len(content)
+
+    def mkdir(self, path: Path) -> None:
+        with self._lock:
+            self._add_dirs(member_name(path))
+
+    def unlink(self, path: Path) -> None:
+        name = member_name(path)
+        with self._lock:
+            if name in self._dirs:
+                raise IsADirectoryError(f"Is a directory: {name}")
+            self._files.pop(name, None)
+
+    def rmtree(self, path: Path) -> None:
+        name = member_name(path)
+        if not name:
+            raise ValueError("Cannot remove the root directory")
+        with self._lock:
+            self._files = {n: f for n, f in self._files.items() if not _is_under(n, name)}
+            self._dirs = {d for d in self._dirs if d != name and not _is_under(d, name)}
+
+    def rename(self, src: Path, dest: Path) -> None:
+        src_name = member_name(src)
+        dest_name = member_name(dest)
+        with self._lock:
+            if src_name in self._files:
+                if dest_name in self._dirs:
+                    raise IsADirectoryError(f"Is a directory: {dest_name}")
+                self._check_parent(dest_name, make_parents=False)
+                self._files[dest_name] = self._files.pop(src_name)
+            elif src_name in self._dirs and src_name:
+                if dest_name in self._dirs or dest_name in self._files:
+                    raise FileExistsError(f"Destination exists: {dest_name}")
+                if _is_under(dest_name, src_name):
+                    raise ValueError(f"Cannot move a directory into itself: {dest_name}")
+                self._check_parent(dest_name, make_parents=False)
+                self._files = {
+                    (_moved(n, src_name, dest_name) if _is_under(n, src_name) else n): f
+                    for n, f in self._files.items()
+                }
+                self._dirs = {
+                    _moved(d, src_name, dest_name) if d == src_name or _is_under(d, src_name) else d
+                    for d in self._dirs
+                }
+            else:
+                raise FileNotFoundError(f"No such file or directory: {src_name}")
+
+    def copy_file(self, src: Path, dest: Path, *, make_parents: bool = True) -> None:
+        src_name = member_name(src)
+        dest_name = member_name(dest)
+        with self._lock:
+            if src_name not in self._files:
+                raise FileNotFoundError(f"No such file: {src_name}")
+            if dest_name in self._dirs:
+                raise IsADirectoryError(f"Is a directory: {dest_name}")
+            self._check_parent(dest_name, make_parents)
+            self._files[dest_name] = self._files[src_name]
+
+    def copy_tree(self, src: Path, dest: Path) -> None:
+        src_name = member_name(src)
+        dest_name = member_name(dest)
+        with self._lock:
+            if src_name not in self._dirs:
+                raise FileNotFoundError(f"No such directory: {src_name}")
+            self._add_dirs(dest_name)
+            for d in [d for d in self._dirs if _is_under(d, src_name)]:
+                self._add_dirs(_moved(d, src_name, dest_name))
+            for n, f in [(n, f) for n, f in self._files.items() if _is_under(n, src_name)]:
+                self._files[_moved(n, src_name, dest_name)] = f
+
+    # Committing to disk
+
+    def commit_to(self, root: str | Path, *, workers: int = DEFAULT_COPY_WORKERS) -> list[Path]:
+        """
+        Write every staged directory and file to disk under `root`. Directories are
+        created first, then files are written atomically on a pool of `workers`
+        threads, keeping their staged modification times. Returns the paths written.
+        """
+        root = Path(root)
+        with self._lock:
+            dirs = sorted(self._dirs)
+            files = sorted(self._files.items())
+
+        for d in dirs:
+            (root / d).mkdir(parents=True, exist_ok=True)
+
+        def write(item: tuple[str, tuple[bytes, int]]) -> Path:
+            name, (data, mtime_ns) = item
+            target = root / name
+            with atomic_output_file(target) as tmp_path:
+                tmp_path.write_bytes(data)
+                os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+            return target
+
+        if workers <= 1 or len(files) <= 1:
+            return [write(item) for item in files]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(write, files))
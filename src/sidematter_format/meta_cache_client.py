@@ -0,0 +1,218 @@
+"""
+Client of a metadata cache shared by the processes of one machine.
+
+Each process that reads metadata otherwise parses every sidecar itself and keeps its own
+copies. With a shared cache, a `MetaCacheServer` (see `meta_cache_server`) owns one
+cache of parsed metadata, validated by `stat()` of the sidecars on every lookup, and
+processes ask it over a unix socket. Once a process calls `use_shared_meta_cache()` (or
+has the `SIDEMATTER_META_CACHE` environment variable set to the socket path),
+`Sidematter.read_meta()` on the local filesystem asks the server first, and reads
+directly if the server is unavailable or can't answer, backing off for a while after a
+failure so a missing server costs little.
+
+The protocol is frames of a 4-byte little-endian length and a payload. A request is a
+JSON object with the absolute path of the primary, whether to use frontmatter, and the
+names of the metadata formats registered in the client, which must match the server's.
+A response is `+` and the pickled metadata, or `-` and a reason to read directly.
+Metadata is unpickled only from a server running as the same user, as checked with the
+peer credentials of the connected socket.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from sidematter_format.meta_formats import meta_formats
+
+SOCKET_ENV_VAR = "SIDEMATTER_META_CACHE"
+
+DEFAULT_TIMEOUT = 1.0
+
+DEFAULT_RETRY_INTERVAL = 5.0
+
+FRAME = struct.Struct("<I")
+
+FOUND = b"+"
+
+NOT_FOUND = b"-"
+
+_UCRED = struct.Struct("iII")
+
+_SOL_LOCAL = 0
+
+_XUCRED_HEAD = struct.Struct("II")
+
+_XUCRED_SIZE = 76
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(FRAME.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> bytes | None:
+    """A payload, or None if the other end closed the connection."""
+    header = _recv_exact(sock, FRAME.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, FRAME.unpack(header)[0])
+
+
+def _peer_uid(sock: socket.socket) -> int | None:
+    """
+    The user id of the process at the other end of a connected unix socket, or None if
+    the platform doesn't tell us.
+    """
+    if hasattr(socket, "SO_PEERCRED"):  # Linux: struct ucred {pid, uid, gid}.
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _UCRED.size)
+        return _UCRED.unpack(creds)[1]
+    if hasattr(socket, "LOCAL_PEERCRED"):  # macOS and BSDs: struct xucred {version, uid, ...}.
+        creds = sock.getsockopt(_SOL_LOCAL, socket.LOCAL_PEERCRED, _XUCRED_SIZE)
+        return _XUCRED_HEAD.unpack_from(creds)[1]
+    return None
+
+
+class MetaCacheClient:
+    """
+    Connections (one per thread and process) to a `MetaCacheServer` at `socket_path`.
+    A lookup that fails to connect or times out after `timeout` seconds returns None,
+    and no lookups are tried for `retry_interval` seconds after that.
+    """
+
+    def __init__(
+        self,
+        socket_path: str | Path,
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL,
+    ):
+        self.socket_path: Path = Path(socket_path)
+        self.timeout: float = timeout
+        self.retry_interval: float = retry_interval
+        self._local: threading.local = threading.local()
+        self._retry_at: float = 0.0
+
+    def _connect(self) -> socket.socket:
+        # Connections aren't shared with forked children, which would mix up replies.
+        sock: socket.socket | None = getattr(self._local, "sock", None)
+        if sock is not None and getattr(self._local, "pid", None) == os.getpid():
+            return sock
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(str(self.socket_path))
+            # Checked on the connection itself, since the socket file could be replaced
+            # between any check of its owner and connecting.
+            if _peer_uid(sock) != os.getuid():
+                raise PermissionError(
+                    f"Metadata cache is served by another user, or can't be checked: "
+                    f"{self.socket_path}"
+                )
+        except BaseException:
+            sock.close()
+            raise
+        self._local.sock = sock
+        self._local.pid = os.getpid()
+        return sock
+
+    def _disconnect(self) -> None:
+        sock: socket.socket | None = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None and getattr(self._local, "pid", None) == os.getpid():
+            sock.close()
+
+    def read_meta(self, primary: Path, use_frontmatter: bool = True) -> dict[str, Any] | None:
+        """
+        The metadata of the local document `primary`, as `Sidematter.read_meta()`
+        returns it, or None if the server doesn't answer or can't, so the caller
+        should read it directly.
+        """
+        if time.monotonic() < self._retry_at:
+            return None
+        request = {
+            "path": str(primary.absolute()),
+            "frontmatter": use_frontmatter,
+            "formats": [fmt.name for fmt in meta_formats()],
+        }
+        try:
+            sock = self._connect()
+            send_frame(sock, json.dumps(request).encode("utf-8"))
+            response = recv_frame(sock)
+            if response is None:
+                raise ConnectionResetError("Metadata cache closed the connection")
+        except OSError:
+            self._disconnect()
+            self._retry_at = time.monotonic() + self.retry_interval
+            return None
+        if response[:1] != FOUND:
+            return None
+        return pickle.loads(response[1:])
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        self._disconnect()
+
+
+_client: MetaCacheClient | None = None
+_client_checked = False
+_client_lock = threading.Lock()
+
+# Set in threads of a server, which must read metadata directly.
+_serving = threading.local()
+
+
+def use_shared_meta_cache(socket_path: str | Path | None, **kwargs: Any) -> None:
+    """
+    Have `Sidematter.read_meta()` in this process use the shared metadata cache served
+    at `socket_path` (with options as for `MetaCacheClient`), or stop using one, if
+    None. Without a call, the `SIDEMATTER_META_CACHE` environment variable is used.
+    """
+    global _client, _client_checked
+    if socket_path is not None and not hasattr(socket, "AF_UNIX"):
+        raise ValueError("A shared metadata cache needs unix sockets")
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None if socket_path is None else MetaCacheClient(socket_path, **kwargs)
+        _client_checked = True
+
+
+def shared_meta_cache() -> MetaCacheClient | None:
+    """
+    The shared metadata cache this process uses, or None.
+    """
+    global _client, _client_checked
+    if not _client_checked:
+        with _client_lock:
+            if not _client_checked:
+                socket_path = os.environ.get(SOCKET_ENV_VAR)
+                if socket_path and hasattr(socket, "AF_UNIX"):
+                    _client = MetaCacheClient(socket_path)
+                _client_checked = True
+    if getattr(_serving, "active", False):
+        return None
+    return _client
+
+
+def mark_serving() -> None:
+    """
+    Mark the current thread as serving the cache, so its reads don't use one.
+    """
+    _serving.active = True
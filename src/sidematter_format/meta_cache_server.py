@@ -0,0 +1,252 @@
+"""
+Server of a metadata cache shared by the processes of one machine (see
+`meta_cache_client` for how processes use it).
+
+The server keeps the metadata of recently read documents, already pickled for
+sending, and checks on every lookup that the sidecars it was read from are unchanged,
+by `stat()` of each (inode, size, and modification time), so a lookup is a few
+`stat()` calls and no parsing. Files modified too recently to be told apart from a
+change within the same timestamp tick are read but not cached. Run it as a daemon with
+`sidematter-meta-cache SOCKET_PATH`, or in a thread of an existing process with
+`MetaCacheServer(...).start()`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import socket
+import stat
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from sidematter_format.meta_cache_client import (
+    FOUND,
+    NOT_FOUND,
+    mark_serving,
+    recv_frame,
+    send_frame,
+)
+from sidematter_format.meta_formats import meta_formats
+from sidematter_format.meta_log import compact_tmp_path, log_old_path
+from sidematter_format.sidematter_format import Sidematter
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Files modified this close to the time they were read may change again within the same
+# timestamp tick without their stat changing, so what was read from them isn't cached.
+_RACY_WINDOW_NS = 2_000_000_000
+
+_FileSig = tuple[int, int, int] | None
+
+_Key = tuple[str, bool]
+
+
+def _stat(path: Path) -> _FileSig:
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _signature(sm: Sidematter, use_frontmatter: bool) -> tuple[_FileSig, ...]:
+    """
+    Stats of every file that `read_meta()` of `sm` depends on.
+    """
+    meta_paths = [sm.meta_path_for(fmt) for fmt in meta_formats()]
+    log = sm.meta_log_path
+    sigs = [_stat(path) for path in [*meta_paths, log, log_old_path(log)]]
+    if sigs[-1] is not None:
+        # A compaction was interrupted, so its temporary sidecars may be read.
+        sigs += [_stat(compact_tmp_path(path)) for path in meta_paths]
+    if use_frontmatter and not any(sigs[: len(meta_paths)]):
+        sigs.append(_stat(sm.primary))
+    return tuple(sigs)
+
+
+class MetaCacheServer:
+    """
+    A cache of parsed metadata served on the unix socket `socket_path`, keeping up to
+    `max_entries` documents, least recently used first out. Only the user running it
+    can connect. Call `start()` to serve in a background thread or `serve_forever()`
+    to serve in this one, and `close()` (or use it as a context manager) to stop.
+    """
+
+    def __init__(self, socket_path: str | Path, *, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.socket_path: Path = Path(socket_path)
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[_Key, tuple[tuple[_FileSig, ...], bytes]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._closed: threading.Event = threading.Event()
+        self._conns: set[socket.socket] = set()
+        self._thread: threading.Thread | None = None
+        self._listener: socket.socket = self._listen()
+
+    def _listen(self) -> socket.socket:
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            mode = None
+        if mode is not None:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"Not a socket, so not replacing: {self.socket_path}")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.socket_path))
+            except OSError:
+                self.socket_path.unlink()  # Left behind by a server that exited.
+            else:
+                raise FileExistsError(f"Metadata cache already served at: {self.socket_path}")
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(str(self.socket_path))
+            # No one can connect until it listens, so there is no window for others.
+            os.chmod(self.socket_path, 0o600)
+            listener.listen()
+        except BaseException:
+            listener.close()
+            raise
+        return listener
+
+    def __enter__(self) -> MetaCacheServer:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def start(self) -> MetaCacheServer:
+        """Serve in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="sidematter-meta-cache", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Accept connections, each served on its own thread, until closed."""
+        while not self._closed.is_set():
+            try:
+                conn, _addr = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    break
+                raise
+            if self._closed.is_set():
+                conn.close()
+                break
+            with self._lock:
+                self._conns.add(conn)
+            threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+
+    def close(self) -> None:
+        """Stop serving, closing all connections, and remove the socket."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # Wake the thread blocked in `accept()`.
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as wake:
+                wake.connect(str(self.socket_path))
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join()
+        self._listener.close()
+        with self._lock:
+            conns = list(self._conns)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.socket_path.unlink(missing_ok=True)
+
+    def _serve_conn(self, conn: socket.socket) -> None:
+        mark_serving()
+        try:
+            while True:
+                request = recv_frame(conn)
+                if request is None:
+                    return
+                send_frame(conn, self._respond(request))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._conns.discard(conn)
+            conn.close()
+
+    def _respond(self, request: bytes) -> bytes:
+        try:
+            values: dict[str, Any] = json.loads(request)
+            path = Path(values["path"])
+            use_frontmatter = bool(values["frontmatter"])
+            formats: list[str] = values["formats"]
+        except (ValueError, KeyError, TypeError) as e:
+            return NOT_FOUND + f"Invalid request: {e}".encode()
+        if not path.is_absolute():
+            return NOT_FOUND + b"Path is not absolute"
+        if formats != [fmt.name for fmt in meta_formats()]:
+            return NOT_FOUND + b"Metadata formats differ from the server's"
+        try:
+            return self.lookup(path, use_frontmatter)
+        except Exception as e:
+            # The client reads directly, raising the error itself.
+            return NOT_FOUND + str(e).encode("utf-8", "replace")
+
+    def lookup(self, path: Path, use_frontmatter: bool = True) -> bytes:
+        """
+        The response to a request for the metadata of `path`: `+` and the pickled
+        metadata, from the cache if its sidecars are unchanged.
+        """
+        key = (str(path), use_frontmatter)
+        sm = Sidematter(path)
+        sig = _signature(sm, use_frontmatter)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        response = FOUND + pickle.dumps(
+            sm.read_meta(use_frontmatter=use_frontmatter), protocol=pickle.HIGHEST_PROTOCOL
+        )
+        # The signature is from before reading, so a change during the read is seen
+        # as a change next time.
+        racy_after = time.time_ns() - _RACY_WINDOW_NS
+        if all(s is None or s[2] < racy_after for s in sig):
+            with self._lock:
+                self._entries[key] = (sig, response)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return response
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a shared sidematter metadata cache.")
+    parser.add_argument("socket_path", help="path of the unix socket to serve on")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    args = parser.parse_args()
+    server = MetaCacheServer(args.socket_path, max_entries=args.max_entries)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
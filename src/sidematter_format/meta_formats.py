@@ -0,0 +1,169 @@
+"""
+Registry of sidecar metadata formats.
+
+Each format has a name, a sidecar suffix, a precedence (lower is checked first when
+resolving metadata), and an encoder and decoder. JSON, YAML, and a compact binary
+MessagePack format are built in, and more can be registered.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from sidematter_format.json_conventions import to_json_string
+from sidematter_format.msgpack_codec import msgpack_dumps, msgpack_loads
+from sidematter_format.yaml_conventions import yaml_dumps, yaml_loads
+
+META_NAME = "meta"
+JSON_SUFFIX = f".{META_NAME}.json"
+YAML_SUFFIX = f".{META_NAME}.yml"
+MSGPACK_SUFFIX = f".{META_NAME}.msgpack"
+
+
+@dataclass(frozen=True)
+class MetaEncodeOptions:
+    """
+    Options for encoding metadata. Formats ignore options that don't apply to them.
+    """
+
+    key_sort: Callable[[str], Any] | None = None
+    fast_yaml: bool = False
+
+
+MetaEncoder = Callable[[Any, MetaEncodeOptions], bytes]
+MetaDecoder = Callable[[bytes], Any]
+
+
+@dataclass(frozen=True)
+class MetaFormat:
+    """
+    A sidecar metadata format.
+    """
+
+    name: str
+    """Short name used to select the format, e.g. "json"."""
+
+    suffix: str
+    """Sidecar suffix replacing the primary's extension, e.g. ".meta.json"."""
+
+    precedence: int
+    """Formats with lower precedence values are checked first when resolving metadata."""
+
+    encode: MetaEncoder
+    decode: MetaDecoder
+
+    binary: bool = False
+    """True if the format is not text, so raw string data can't be written to it."""
+
+
+def _encode_json(data: Any, _options: MetaEncodeOptions) -> bytes:
+    return (to_json_string(data) + "\n").encode("utf-8")
+
+
+def _decode_json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _encode_yaml(data: Any, options: MetaEncodeOptions) -> bytes:
+    return yaml_dumps(data, key_sort=options.key_sort, fast=options.fast_yaml).encode("utf-8")
+
+
+def _decode_yaml(data: bytes) -> Any:
+    return yaml_loads(data.decode("utf-8")) or {}
+
+
+def _encode_msgpack(data: Any, _options: MetaEncodeOptions) -> bytes:
+    return msgpack_dumps(data)
+
+
+JSON_FORMAT = MetaFormat("json", JSON_SUFFIX, 10, _encode_json, _decode_json)
+YAML_FORMAT = MetaFormat("yaml", YAML_SUFFIX, 20, _encode_yaml, _decode_yaml)
+# Checked last, so documents with a JSON or YAML sidecar resolve as before, but a document
+# with no sidecar at all takes one more failed check (unless a `SidecarCache` is used).
+MSGPACK_FORMAT = MetaFormat(
+    "msgpack", MSGPACK_SUFFIX, 30, _encode_msgpack, msgpack_loads, binary=True
+)
+
+ALL_FORMATS = "all"
+"""
+Selects both text formats ("yaml" and "json") when writing, and every registered format
+when deleting.
+"""
+
+# Updated only under the lock. Readers use `_by_precedence`, which is replaced as a whole,
+# so they always see a consistent set of formats without locking.
+_registry: dict[str, MetaFormat] = {}
+_by_precedence: tuple[MetaFormat, ...] = ()
+_registry_lock = threading.Lock()
+
+
+def register_meta_format(fmt: MetaFormat) -> None:
+    """
+    Register a metadata format, replacing any format with the same name.
+    """
+    global _by_precedence
+    if fmt.name == ALL_FORMATS:
+        raise ValueError(f"Format name is reserved: {fmt.name!r}")
+    with _registry_lock:
+        _registry[fmt.name] = fmt
+        _by_precedence = tuple(sorted(_registry.values(), key=lambda f: f.precedence))
+
+
+def unregister_meta_format(name: str) -> None:
+    global _by_precedence
+    with _registry_lock:
+        _registry.pop(name, None)
+        _by_precedence = tuple(sorted(_registry.values(), key=lambda f: f.precedence))
+
+
+def meta_formats() -> tuple[MetaFormat, ...]:
+    """
+    All registered formats, in precedence order.
+    """
+    return _by_precedence
+
+
+def get_meta_format(name: str) -> MetaFormat:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown metadata format: {name!r} "
+            f"(expected one of: {', '.join(f.name for f in _by_precedence)})"
+        ) from None
+
+
+def meta_format_for_path(path: Path) -> MetaFormat | None:
+    """
+    The registered format whose suffix matches the end of the filename of `path`.
+    """
+    name = path.name
+    matches = [fmt for fmt in _by_precedence if name.endswith(fmt.suffix)]
+    return max(matches, key=lambda fmt: len(fmt.suffix)) if matches else None
+
+
+def select_meta_formats(formats: str | Sequence[str], *, all_formats: bool) -> list[MetaFormat]:
+    """
+    Resolve a format name, sequence of names, or "all" to formats in precedence order.
+    With `all_formats`, "all" means every registered format; otherwise it means the
+    text formats "yaml" and "json".
+    """
+    if formats == ALL_FORMATS:
+        if all_formats:
+            return list(_by_precedence)
+        names: Sequence[str] = ["yaml", "json"]
+    elif isinstance(formats, str):
+        names = [formats]
+    else:
+        names = formats
+    selected = {name: get_meta_format(name) for name in names}
+    return sorted(selected.values(), key=lambda fmt: fmt.precedence)
+
+
+for _fmt in (JSON_FORMAT, YAML_FORMAT, MSGPACK_FORMAT):
+    register_meta_format(_fmt)
@@ -0,0 +1,131 @@
+"""
+An append-only log of metadata changes, kept beside the document as
+`basename.meta.log.jsonl`. Each line is one JSON object recording a change:
+
+- `{"patch": {...}}`: a JSON merge patch (RFC 7386). Keys are set to the patch's
+  values, merged recursively into dicts, and removed where the patch value is `null`.
+- `{"append": {"key": value, ...}}`: append each value to the list at its key,
+  creating the list if needed.
+
+Appending a change writes one line, however large the metadata is. The full metadata
+is the base sidecar (or frontmatter) with every change in the log applied in order.
+Once the log grows past a size threshold it is compacted: the changes are merged into
+the base sidecar and the log is removed.
+
+Compaction writes the merged metadata to `<sidecar>.compact.tmp`, copies the log to
+`<log>.old` (which commits it), renames the temporary files over the sidecars, then
+deletes the log and then its copy. A compaction interrupted at any point is completed
+(or undone) by the next one, and reads in the meantime see the same metadata as before.
+Since the copy never outlives the log while it matters, reads only look for it when
+there is a log, so documents that were never patched cost one extra check.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, cast
+
+from sidematter_format.json_conventions import to_json_string
+
+META_LOG_SUFFIX = ".meta.log.jsonl"
+LOG_OLD_SUFFIX = ".old"
+COMPACT_TMP_SUFFIX = ".compact.tmp"
+
+DEFAULT_COMPACT_BYTES = 256 * 1024
+"""Log size after which an append compacts the log into the base sidecar."""
+
+PATCH_OP = "patch"
+APPEND_OP = "append"
+
+
+def log_old_path(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + LOG_OLD_SUFFIX)
+
+
+def compact_tmp_path(meta_path: Path) -> Path:
+    return meta_path.with_name(meta_path.name + COMPACT_TMP_SUFFIX)
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """
+    Apply a JSON merge patch (RFC 7386) to `target`, returning the result. Neither
+    argument is modified.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    patch_dict = cast(dict[str, Any], patch)
+    result: dict[str, Any] = dict(cast(dict[str, Any], target)) if isinstance(target, dict) else {}
+    for key, value in patch_dict.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def encode_log_entry(op: str, value: dict[str, Any]) -> bytes:
+    """
+    Encode one change as a line of the log.
+    """
+    if op not in (PATCH_OP, APPEND_OP):
+        raise ValueError(f"Unknown metadata log operation: {op!r}")
+    return (to_json_string({op: value}, indent=None) + "\n").encode("utf-8")
+
+
+def parse_log(data: bytes) -> list[dict[str, Any]]:
+    """
+    Parse the entries of a log. A final line with no newline is the remains of an
+    interrupted append and is ignored.
+
+    Raises:
+        ValueError: If an entry is not valid.
+    """
+    lines = data.split(b"\n")
+    entries: list[dict[str, Any]] = []
+    for lineno, line in enumerate(lines[:-1], 1):
+        if not line.strip():
+            continue
+        try:
+            entry: Any = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid log entry on line {lineno}: {e}") from e
+        if not isinstance(entry, dict) or len(cast(dict[str, Any], entry)) != 1:
+            raise ValueError(f"Invalid log entry on line {lineno}: {line[:80]!r}")
+        entries.append(cast(dict[str, Any], entry))
+    return entries
+
+
+def apply_log(meta: dict[str, Any], entries: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Apply log entries in order to metadata, returning the result. `meta` is not
+    modified.
+    """
+    result = dict(meta)
+    # Lists already copied from `meta`, which can be appended to in place.
+    owned: set[str] = set()
+    for entry in entries:
+        ((op, value),) = entry.items()
+        if not isinstance(value, dict):
+            raise ValueError(f"Invalid log entry: {entry!r}")
+        value = cast(dict[str, Any], value)
+        if op == PATCH_OP:
+            result = cast(dict[str, Any], merge_patch(result, value))
+            owned.difference_update(value)
+        elif op == APPEND_OP:
+            for key, item in value.items():
+                existing = result.get(key)
+                if existing is None:
+                    result[key] = [item]
+                    owned.add(key)
+                elif isinstance(existing, list):
+                    if key not in owned:
+                        existing = result[key] = list(cast(list[Any], existing))
+                        owned.add(key)
+                    cast(list[Any], existing).append(item)
+                else:
+                    raise ValueError(f"Cannot append to non-list metadata key: {key!r}")
+        else:
+            raise ValueError(f"Unknown metadata log operation: {op!r}")
+    return result
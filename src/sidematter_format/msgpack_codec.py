@@ -0,0 +1,256 @@
+"""
+Compact binary encoding of metadata in the MessagePack format.
+
+Uses the `msgpack` package (with its C extension) if it is installed, as with the
+`sidematter-format[msgpack]` extra, and otherwise a small pure-Python codec for the same
+wire format, so binary sidecars can always be read and written. The pure-Python codec
+is several times slower than `json.loads()`, so install the extra where speed matters.
+Non-native values (dates, enums, dataclasses, etc.) are converted following the same
+conventions as JSON.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable
+from typing import Any, cast
+
+from sidematter_format.json_conventions import json_default
+
+msgpack: Any
+try:
+    import msgpack  # pyright: ignore[reportMissingImports]
+except ImportError:  # pragma: no cover - depends on optional dependency
+    msgpack = None
+
+
+class MsgpackError(ValueError):
+    """Raised for values that can't be encoded or data that can't be decoded."""
+
+
+## Pure-Python encoder
+
+_MAX_DEFAULT_DEPTH = 32
+
+
+def _pack(out: bytearray, obj: Any, default: Callable[[Any], Any], depth: int = 0) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is False:
+        out.append(0xC2)
+    elif obj is True:
+        out.append(0xC3)
+    elif isinstance(obj, int):
+        _pack_int(out, int(obj))
+    elif isinstance(obj, float):
+        out.append(0xCB)
+        out += struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n < 0x100:
+            out += struct.pack(">BB", 0xD9, n)
+        elif n < 0x10000:
+            out += struct.pack(">BH", 0xDA, n)
+        else:
+            out += struct.pack(">BI", 0xDB, n)
+        out += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(cast(bytes, obj))
+        n = len(data)
+        if n < 0x100:
+            out += struct.pack(">BB", 0xC4, n)
+        elif n < 0x10000:
+            out += struct.pack(">BH", 0xC5, n)
+        else:
+            out += struct.pack(">BI", 0xC6, n)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        items = cast(list[Any] | tuple[Any, ...], obj)
+        n = len(items)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out += struct.pack(">BH", 0xDC, n)
+        else:
+            out += struct.pack(">BI", 0xDD, n)
+        for item in items:
+            _pack(out, item, default)
+    elif isinstance(obj, dict):
+        mapping = cast(dict[Any, Any], obj)
+        n = len(mapping)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out += struct.pack(">BH", 0xDE, n)
+        else:
+            out += struct.pack(">BI", 0xDF, n)
+        for key, value in mapping.items():
+            _pack(out, key, default)
+            _pack(out, value, default)
+    else:
+        if depth >= _MAX_DEFAULT_DEPTH:
+            raise MsgpackError(
+                f"Cannot serialize {type(obj).__name__}: default() recursion too deep"
+            )
+        _pack(out, default(obj), default, depth + 1)
+
+
+def _pack_int(out: bytearray, n: int) -> None:
+    if 0 <= n < 0x80:
+        out.append(n)
+    elif -32 <= n < 0:
+        out.append(n & 0xFF)
+    elif 0 <= n < 0x100:
+        out += struct.pack(">BB", 0xCC, n)
+    elif 0 <= n < 0x10000:
+        out += struct.pack(">BH", 0xCD, n)
+    elif 0 <= n < 0x100000000:
+        out += struct.pack(">BI", 0xCE, n)
+    elif 0 <= n < 0x10000000000000000:
+        out += struct.pack(">BQ", 0xCF, n)
+    elif -0x80 <= n < 0:
+        out += struct.pack(">Bb", 0xD0, n)
+    elif -0x8000 <= n < 0:
+        out += struct.pack(">Bh", 0xD1, n)
+    elif -0x80000000 <= n < 0:
+        out += struct.pack(">Bi", 0xD2, n)
+    elif -0x8000000000000000 <= n < 0:
+        out += struct.pack(">Bq", 0xD3, n)
+    else:
+        raise MsgpackError(f"Integer out of range for MessagePack: {n}")
+
+
+## Pure-Python decoder
+
+_FIXED = {
+    0xCA: ">f",
+    0xCB: ">d",
+    0xCC: ">B",
+    0xCD: ">H",
+    0xCE: ">I",
+    0xCF: ">Q",
+    0xD0: ">b",
+    0xD1: ">h",
+    0xD2: ">i",
+    0xD3: ">q",
+}
+_LENGTHS = {
+    0xC4: ">B",
+    0xC5: ">H",
+    0xC6: ">I",
+    0xD9: ">B",
+    0xDA: ">H",
+    0xDB: ">I",
+    0xDC: ">H",
+    0xDD: ">I",
+    0xDE: ">H",
+    0xDF: ">I",
+}
+
+
+def _take(data: bytes, pos: int, n: int) -> bytes:
+    if pos + n > len(data):
+        raise MsgpackError(f"Truncated MessagePack data at offset {pos}")
+    return data[pos : pos + n]
+
+
+def _unpack(data: bytes, pos: int) -> tuple[Any, int]:
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0xA0 <= b <= 0xBF:
+        n = b & 0x1F
+        return _take(data, pos, n).decode("utf-8"), pos + n
+    if 0x90 <= b <= 0x9F:
+        return _unpack_array(data, pos, b & 0x0F)
+    if 0x80 <= b <= 0x8F:
+        return _unpack_map(data, pos, b & 0x0F)
+    if b == 0xC0:
+        return None, pos
+    if b == 0xC2:
+        return False, pos
+    if b == 0xC3:
+        return True, pos
+    fmt = _FIXED.get(b)
+    if fmt is not None:
+        (value,) = struct.unpack_from(fmt, data, pos)
+        return value, pos + struct.calcsize(fmt)
+    fmt = _LENGTHS.get(b)
+    if fmt is not None:
+        (n,) = struct.unpack_from(fmt, data, pos)
+        pos += struct.calcsize(fmt)
+        if b in (0xC4, 0xC5, 0xC6):
+            return bytes(_take(data, pos, n)), pos + n
+        if b in (0xD9, 0xDA, 0xDB):
+            return _take(data, pos, n).decode("utf-8"), pos + n
+        if b in (0xDC, 0xDD):
+            return _unpack_array(data, pos, n)
+        return _unpack_map(data, pos, n)
+    raise MsgpackError(f"Unsupported MessagePack type byte: 0x{b:02x}")
+
+
+def _unpack_array(data: bytes, pos: int, n: int) -> tuple[list[Any], int]:
+    items: list[Any] = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data: bytes, pos: int, n: int) -> tuple[dict[Any, Any], int]:
+    mapping: dict[Any, Any] = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        value, pos = _unpack(data, pos)
+        mapping[key] = value
+    return mapping, pos
+
+
+## Public API
+
+
+def py_msgpack_dumps(value: Any) -> bytes:
+    """
+    Pure-Python MessagePack encoding.
+    """
+    out = bytearray()
+    _pack(out, value, json_default)
+    return bytes(out)
+
+
+def py_msgpack_loads(data: bytes) -> Any:
+    """
+    Pure-Python MessagePack decoding of a single value.
+    """
+    try:
+        value, pos = _unpack(data, 0)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise MsgpackError(f"Truncated or invalid MessagePack data: {e}") from e
+    if pos != len(data):
+        raise MsgpackError(f"Extra data after MessagePack value at offset {pos}")
+    return value
+
+
+def msgpack_dumps(value: Any) -> bytes:
+    """
+    Encode a value as MessagePack, converting non-native types with the JSON
+    conventions.
+    """
+    if msgpack is not None:
+        return cast(bytes, msgpack.packb(value, default=json_default, use_bin_type=True))
+    return py_msgpack_dumps(value)
+
+
+def msgpack_loads(data: bytes) -> Any:
+    """
+    Decode a single MessagePack value.
+    """
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return py_msgpack_loads(data)
@@ -0,0 +1,180 @@
+"""
+Finding and removing orphaned sidecars: metadata files, metadata logs, and assets
+directories left behind when a primary document was deleted by other tools.
+
+Each directory is listed once with `scandir`. A sidecar belongs to any entry in the
+same directory with the same stem (the name without its last suffix), which is the rule
+`Sidematter` uses to name sidecars, so `report.meta.yml` and `report.assets/` belong to
+`report.md`, `report.txt`, or `report`. Sidecars with no such entry are orphans.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sidematter_format.asset_listing import LISTING_CACHE_SUFFIX
+from sidematter_format.compiled_marker import COMPILED_MARKER_SUFFIX
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.meta_formats import meta_formats
+from sidematter_format.meta_log import COMPACT_TMP_SUFFIX, LOG_OLD_SUFFIX, META_LOG_SUFFIX
+from sidematter_format.sidematter_format import ASSETS_SUFFIX
+from sidematter_format.sidematter_fs import LOCAL_FS
+
+
+@dataclass(frozen=True)
+class Orphan:
+    """
+    A sidecar file or assets directory with no primary document.
+    """
+
+    path: Path
+    is_dir: bool
+
+
+@dataclass
+class OrphanReport:
+    """
+    What `collect_orphans()` found and removed.
+    """
+
+    orphans: list[Orphan] = field(default_factory=list)
+    removed: list[Path] = field(default_factory=list)
+    """Orphans removed. Empty for a dry run."""
+
+    errors: dict[Path, str] = field(default_factory=dict)
+    total_bytes: int = 0
+    """Total size of files in the orphans removed (or, for a dry run, found)."""
+
+
+def sidecar_suffixes() -> list[str]:
+    """
+    Suffixes of sidecar files, longest first so e.g. a log's `.old` copy matches
+    before the log itself.
+    """
+    suffixes: list[str] = [
+        META_LOG_SUFFIX,
+        META_LOG_SUFFIX + LOG_OLD_SUFFIX,
+        COMPILED_MARKER_SUFFIX,
+        f".{ASSETS_SUFFIX}{LISTING_CACHE_SUFFIX}",
+    ]
+    for fmt in meta_formats():
+        suffixes += [fmt.suffix, fmt.suffix + COMPACT_TMP_SUFFIX]
+    return sorted(suffixes, key=len, reverse=True)
+
+
+def sidecar_stem(name: str, is_dir: bool, file_suffixes: list[str]) -> str | None:
+    """
+    The stem of the primary a sidecar belongs to, or None if `name` isn't a sidecar.
+    """
+    if is_dir:
+        assets_suffix = f".{ASSETS_SUFFIX}"
+        return name[: -len(assets_suffix)] if name.endswith(assets_suffix) else None
+    for suffix in file_suffixes:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return None
+
+
+def _scan_dir(dir_path: Path, file_suffixes: list[str]) -> tuple[list[Orphan], list[Path]]:
+    """
+    List a directory once, returning its orphans and the subdirectories to walk.
+    Assets directories aren't walked, since what is in them is assets, not documents.
+    """
+    stems: set[str] = set()
+    sidecars: list[tuple[str, Orphan]] = []
+    subdirs: list[Path] = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stem = sidecar_stem(entry.name, is_dir, file_suffixes)
+                if stem is not None:
+                    sidecars.append((stem, Orphan(dir_path / entry.name, is_dir)))
+                    continue
+                stems.add(Path(entry.name).stem)
+                if is_dir:
+                    subdirs.append(dir_path / entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return [], []
+    orphans = [orphan for stem, orphan in sidecars if stem not in stems]
+    return orphans, subdirs
+
+
+def iter_orphans(root: str | Path) -> Iterator[Orphan]:
+    """
+    Walk the local directory tree under `root` (not following symlinks), yielding
+    orphaned sidecars as each directory is listed.
+    """
+    file_suffixes = sidecar_suffixes()
+    stack = [Path(root)]
+    while stack:
+        orphans, subdirs = _scan_dir(stack.pop(), file_suffixes)
+        yield from orphans
+        stack.extend(reversed(subdirs))
+
+
+def find_orphans(root: str | Path) -> list[Orphan]:
+    """
+    Find orphaned sidecars (metadata files, metadata logs, and assets directories with
+    no primary document) in the local directory tree under `root`.
+    """
+    return list(iter_orphans(root))
+
+
+def _size(orphan: Orphan) -> int:
+    if not orphan.is_dir:
+        return orphan.path.lstat().st_size
+    total = 0
+    for dir_path, _dirnames, filenames in os.walk(orphan.path):
+        for name in filenames:
+            total += os.lstat(os.path.join(dir_path, name)).st_size
+    return total
+
+
+def collect_orphans(
+    root: str | Path, *, dry_run: bool = False, workers: int = DEFAULT_COPY_WORKERS
+) -> OrphanReport:
+    """
+    Find and remove orphaned sidecars under `root`, one directory per task on a pool of
+    `workers` threads. Each directory is listed again just before removing its orphans,
+    so a sidecar whose primary was created in the meantime is kept. With `dry_run`,
+    nothing is removed. Errors are recorded per orphan in the report.
+    """
+    report = OrphanReport(orphans=find_orphans(root))
+    by_dir: dict[Path, list[Orphan]] = {}
+    for orphan in report.orphans:
+        by_dir.setdefault(orphan.path.parent, []).append(orphan)
+    file_suffixes = sidecar_suffixes()
+
+    def collect_dir(item: tuple[Path, list[Orphan]]) -> tuple[list[Path], dict[Path, str], int]:
+        dir_path, orphans = item
+        removed: list[Path] = []
+        errors: dict[Path, str] = {}
+        total = 0
+        if not dry_run:
+            current = set(_scan_dir(dir_path, file_suffixes)[0])
+            orphans = [orphan for orphan in orphans if orphan in current]
+        for orphan in orphans:
+            try:
+                size = _size(orphan)
+                if not dry_run:
+                    if orphan.is_dir:
+                        LOCAL_FS.rmtree(orphan.path)
+                    else:
+                        LOCAL_FS.unlink(orphan.path)
+                    removed.append(orphan.path)
+                total += size
+            except OSError as e:
+                errors[orphan.path] = str(e)
+        return removed, errors, total
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for removed, errors, total in pool.map(collect_dir, by_dir.items()):
+            report.removed += removed
+            report.errors.update(errors)
+            report.total_bytes += total
+    return report
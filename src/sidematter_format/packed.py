@@ -0,0 +1,273 @@
+"""
+Packed, read-only snapshots of the sidematter of a whole tree, in one file.
+
+A pack holds the metadata files (and metadata logs) of every document under a
+directory, and optionally its small assets, concatenated, followed by an index of
+fixed-size records sorted by path and a hash table of every file and directory path.
+`PackFS` memory-maps the pack and finds paths in the hash table, with a lookup costing
+one CRC-32 and typically one probe, and lists directories from the sorted index. Once
+it is open, reading metadata costs no system calls and no file is opened per document.
+Use it as the filesystem of a `Sidematter`:
+
+    with PackFS("docs.smpack") as pack:
+        Sidematter(Path("guides/intro.md"), fs=pack).read_meta()
+
+Layout (little-endian):
+
+    header   magic, version, count, index offset, names offset, table offset, slots
+    data     file contents, in index order
+    index    count records of (name offset, data offset, size, name length, mtime_ns)
+    names    UTF-8 paths relative to the root, in sorted (bytewise) order
+    table    slots (a power of two) of (CRC-32 of a path, reference), probed linearly
+
+A reference is 0 for an empty slot, `i + 1` for the file at index `i`, or `-(i + 1)` for
+a directory whose first file (in sorted order) is at index `i`.
+"""
+
+from __future__ import annotations
+
+import io
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO
+
+from strif import atomic_output_file
+
+from sidematter_format.asset_layout import LAYOUT_FILE_NAME
+from sidematter_format.asset_listing import AssetEntry
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.orphans import sidecar_stem, sidecar_suffixes
+from sidematter_format.sidematter_fs import member_name
+
+PACK_MAGIC = b"SMPACK\r\n"
+
+_PACK_VERSION = 1
+
+_HEADER = struct.Struct("<8sIQQQQQ")
+
+_RECORD = struct.Struct("<QQQIq")
+
+_SLOT = struct.Struct("<Iq")
+
+_READ_BATCH = 1024
+
+
+class PackFS:
+    """
+    Read-only view of a pack built by `build_pack()`, memory-mapped. Paths are relative
+    to the root of the packed tree. Close it (or use it as a context manager) when done.
+    """
+
+    def __init__(self, pack_path: str | Path):
+        self.pack_path: Path = Path(pack_path)
+        with open(self.pack_path, "rb") as f:
+            try:
+                self._mmap: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Not a sidematter pack (empty file): {pack_path}") from None
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"Not a sidematter pack: {pack_path}")
+        magic, version, count, index_offset, names_offset, table_offset, slots = (
+            _HEADER.unpack_from(self._mmap)
+        )
+        if magic != PACK_MAGIC:
+            raise ValueError(f"Not a sidematter pack: {pack_path}")
+        if version != _PACK_VERSION:
+            raise ValueError(f"Unsupported pack version {version}: {pack_path}")
+        self.count: int = count
+        self._index_offset: int = index_offset
+        self._names_offset: int = names_offset
+        self._table_offset: int = table_offset
+        self._mask: int = slots - 1
+
+    def __enter__(self) -> PackFS:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def _record(self, i: int) -> tuple[int, int, int, int, int]:
+        return _RECORD.unpack_from(self._mmap, self._index_offset + i * _RECORD.size)
+
+    def name_at(self, i: int) -> bytes:
+        """The path of the `i`th file, in sorted order."""
+        name_offset, _data_offset, _size, name_len, _mtime_ns = self._record(i)
+        start = self._names_offset + name_offset
+        return self._mmap[start : start + name_len]
+
+    def _lookup(self, name: str) -> int:
+        """The reference to a path in the hash table, or 0 if it isn't in the pack."""
+        key = name.encode("utf-8")
+        h = zlib.crc32(key)
+        i = h & self._mask
+        while True:
+            slot_hash, ref = _SLOT.unpack_from(self._mmap, self._table_offset + i * _SLOT.size)
+            if ref == 0:
+                return 0
+            if slot_hash == h:
+                if ref > 0 and self.name_at(ref - 1) == key:
+                    return ref
+                if ref < 0 and self.name_at(-ref - 1).startswith(key + b"/"):
+                    return ref
+            i = (i + 1) & self._mask
+
+    def exists(self, path: Path) -> bool:
+        name = member_name(path)
+        return not name or self._lookup(name) != 0
+
+    def is_dir(self, path: Path) -> bool:
+        name = member_name(path)
+        return not name or self._lookup(name) < 0
+
+    def read_bytes(self, path: Path) -> bytes:
+        name = member_name(path)
+        ref = self._lookup(name) if name else -1
+        if ref <= 0:
+            if ref < 0:
+                raise IsADirectoryError(f"Is a directory: {name}")
+            raise FileNotFoundError(f"No such file in pack: {name}")
+        _name_offset, data_offset, size, _name_len, _mtime_ns = self._record(ref - 1)
+        return self._mmap[data_offset : data_offset + size]
+
+    def open_read(self, path: Path) -> IO[bytes]:
+        return io.BytesIO(self.read_bytes(path))
+
+    def iter_files(self, path: Path) -> Iterator[AssetEntry]:
+        name = member_name(path)
+        ref = self._lookup(name) if name else -1
+        if ref >= 0:
+            return
+        prefix = f"{name}/".encode() if name else b""
+        for i in range(-ref - 1, self.count):
+            full_name = self.name_at(i)
+            if not full_name.startswith(prefix):
+                return
+            _name_offset, _data_offset, size, _name_len, mtime_ns = self._record(i)
+            yield AssetEntry(full_name[len(prefix) :].decode("utf-8"), size, mtime_ns)
+
+
+def _pack_paths(root: Path, max_asset_size: int) -> list[tuple[str, int]]:
+    """
+    Paths (relative to `root`) and modification times of the files to pack: sidecar
+    metadata files and logs, and with `max_asset_size`, assets up to that size.
+    """
+    file_suffixes = sidecar_suffixes()
+    found: list[tuple[str, int]] = []
+    for dir_path, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dir_path).relative_to(root).as_posix()
+        prefix = "" if rel_dir == "." else f"{rel_dir}/"
+        for name in filenames:
+            if sidecar_stem(name, False, file_suffixes) is not None:
+                found.append((prefix + name, os.stat(os.path.join(dir_path, name)).st_mtime_ns))
+        for name in [d for d in dirnames if sidecar_stem(d, True, file_suffixes) is not None]:
+            dirnames.remove(name)
+            if max_asset_size <= 0:
+                continue
+            assets_dir = os.path.join(dir_path, name)
+            for assets_path, _subdirs, asset_files in os.walk(assets_dir):
+                rel_assets = Path(assets_path).relative_to(root).as_posix()
+                for asset in asset_files:
+                    st = os.stat(os.path.join(assets_path, asset))
+                    if st.st_size <= max_asset_size or asset == LAYOUT_FILE_NAME:
+                        found.append((f"{rel_assets}/{asset}", st.st_mtime_ns))
+    return found
+
+
+def _hash_table(names: list[str]) -> bytes:
+    """
+    The hash table of the sorted file `names` and of every directory above them.
+    """
+    refs: dict[bytes, int] = {}
+    for i, name in enumerate(names):
+        refs[name.encode("utf-8")] = i + 1
+        parent = name.rpartition("/")[0]
+        while parent:
+            key = parent.encode("utf-8")
+            if key in refs:
+                break
+            refs[key] = -(i + 1)
+            parent = parent.rpartition("/")[0]
+
+    # At most half full, so probes are short.
+    slots = 1
+    while slots < 2 * len(refs) or slots < 2:
+        slots *= 2
+    mask = slots - 1
+    table = bytearray(slots * _SLOT.size)
+    for key, ref in refs.items():
+        h = zlib.crc32(key)
+        i = h & mask
+        while _SLOT.unpack_from(table, i * _SLOT.size)[1] != 0:
+            i = (i + 1) & mask
+        _SLOT.pack_into(table, i * _SLOT.size, h, ref)
+    return bytes(table)
+
+
+def build_pack(
+    root: str | Path,
+    pack_path: str | Path,
+    *,
+    max_asset_size: int = 0,
+    workers: int = DEFAULT_COPY_WORKERS,
+) -> int:
+    """
+    Pack the metadata of every document under the local directory `root` (and, if
+    `max_asset_size` is set, every asset up to that many bytes) into `pack_path`,
+    reading files on a pool of `workers` threads. The pack is written atomically.
+    Returns the number of files packed.
+    """
+    root = Path(root)
+    if not root.is_dir():
+        raise ValueError(f"Pack source is not a directory: {root!r}")
+    paths = sorted(_pack_paths(root, max_asset_size), key=lambda p: p[0].encode("utf-8"))
+
+    records: list[tuple[int, int, int, int, int]] = []
+    names = bytearray()
+
+    def read(item: tuple[str, int]) -> bytes:
+        return (root / item[0]).read_bytes()
+
+    with (
+        atomic_output_file(pack_path) as tmp_path,
+        open(tmp_path, "wb") as out,
+        ThreadPoolExecutor(max_workers=max(1, workers)) as pool,
+    ):
+        out.write(b"\0" * _HEADER.size)
+        offset = _HEADER.size
+        for start in range(0, len(paths), _READ_BATCH):
+            batch = paths[start : start + _READ_BATCH]
+            for (name, mtime_ns), data in zip(batch, pool.map(read, batch), strict=True):
+                encoded = name.encode("utf-8")
+                records.append((len(names), offset, len(data), len(encoded), mtime_ns))
+                names += encoded
+                out.write(data)
+                offset += len(data)
+        index_offset = offset
+        for record in records:
+            out.write(_RECORD.pack(*record))
+        names_offset = index_offset + len(records) * _RECORD.size
+        out.write(names)
+        table_offset = names_offset + len(names)
+        table = _hash_table([name for name, _mtime_ns in paths])
+        out.write(table)
+        out.seek(0)
+        out.write(
+            _HEADER.pack(
+                PACK_MAGIC,
+                _PACK_VERSION,
+                len(records),
+                index_offset,
+                names_offset,
+                table_offset,
+                len(table) // _SLOT.size,
+            )
+        )
+    return len(records)
@@ -0,0 +1,172 @@
+"""
+A cache of which sidecars exist in each directory, so lookups of documents without
+metadata or assets don't need a failed `stat()` per possible sidecar.
+
+Each directory is listed once with `scandir`, keeping only the names of sidecars
+(metadata files and logs, and assets directories). The listing stays valid until the
+directory's modification time changes, which happens whenever an entry is added,
+removed, or renamed, so checking it is one `stat()` of the directory. With a `ttl`, even that is
+skipped for lookups soon after the last check.
+
+A directory changed within the last couple of seconds can't be listed reliably, since
+another change in the same timestamp tick wouldn't change its modification time. Until
+it settles, lookups in it fall back to a `stat()` of the one path, and it is listed
+again once it has settled, so a directory being actively written isn't rescanned on
+every lookup.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from sidematter_format.asset_listing import LISTING_CACHE_SUFFIX
+from sidematter_format.compiled_marker import COMPILED_MARKER_SUFFIX
+from sidematter_format.meta_formats import MetaFormat, meta_formats
+from sidematter_format.meta_log import LOG_OLD_SUFFIX, META_LOG_SUFFIX
+
+ASSETS_DIR_SUFFIX = ".assets"
+
+DEFAULT_MAX_DIRS = 4096
+
+# Listings of directories modified this close to the time they were listed may miss a
+# change made within the same timestamp tick, so they are never trusted.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass(frozen=True)
+class _DirListing:
+    mtime_ns: int
+    racy: bool
+    formats: tuple[MetaFormat, ...]
+    sidecars: dict[str, bool]
+    """Names of sidecars present, mapped to whether each is a directory."""
+    checked_at: float
+
+
+_OTHER_SIDECAR_SUFFIXES = (
+    ASSETS_DIR_SUFFIX,
+    META_LOG_SUFFIX,
+    META_LOG_SUFFIX + LOG_OLD_SUFFIX,
+    COMPILED_MARKER_SUFFIX,
+    ASSETS_DIR_SUFFIX + LISTING_CACHE_SUFFIX,
+)
+
+
+def _is_sidecar_name(name: str, formats: tuple[MetaFormat, ...]) -> bool:
+    return name.endswith(_OTHER_SIDECAR_SUFFIXES) or any(name.endswith(f.suffix) for f in formats)
+
+
+class SidecarCache:
+    """
+    Per-directory sets of the sidecars present, validated by directory modification
+    time. Answers existence checks only for sidecar names; other paths return None so
+    the caller checks the filesystem.
+
+    With `ttl` (in seconds), a directory checked within the last `ttl` seconds isn't
+    checked again, so changes made by other processes may be missed for that long.
+    Changes made through a `LocalFS` using this cache are always seen.
+    """
+
+    def __init__(self, *, ttl: float = 0.0, max_dirs: int = DEFAULT_MAX_DIRS):
+        self.ttl: float = ttl
+        self.max_dirs: int = max_dirs
+        self._dirs: OrderedDict[str, _DirListing] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def _scan(self, dir_path: str, formats: tuple[MetaFormat, ...]) -> _DirListing | None:
+        listed_ns = time.time_ns()
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            sidecars: dict[str, bool] = {}
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if _is_sidecar_name(entry.name, formats):
+                        sidecars[entry.name] = entry.is_dir()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        racy = mtime_ns >= listed_ns - _RACY_WINDOW_NS
+        return _DirListing(mtime_ns, racy, formats, sidecars, time.monotonic())
+
+    def _listing(self, dir_path: str, formats: tuple[MetaFormat, ...]) -> _DirListing | None:
+        with self._lock:
+            listing = self._dirs.get(dir_path)
+        if listing is not None and listing.racy:
+            if time.time_ns() < listing.mtime_ns + _RACY_WINDOW_NS:
+                # Still changing, so callers check the filesystem instead of this
+                # listing, and it's listed again once it settles.
+                return listing
+        elif listing is not None and listing.formats == formats:
+            now = time.monotonic()
+            if self.ttl and now - listing.checked_at < self.ttl:
+                return listing
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except (FileNotFoundError, NotADirectoryError):
+                mtime_ns = None
+            if mtime_ns == listing.mtime_ns:
+                if self.ttl:
+                    listing = _DirListing(listing.mtime_ns, False, formats, listing.sidecars, now)
+                    with self._lock:
+                        self._dirs[dir_path] = listing
+                return listing
+
+        listing = self._scan(dir_path, formats)
+        with self._lock:
+            if listing is None:
+                self._dirs.pop(dir_path, None)
+            else:
+                self._dirs[dir_path] = listing
+                self._dirs.move_to_end(dir_path)
+                while len(self._dirs) > self.max_dirs:
+                    self._dirs.popitem(last=False)
+        return listing
+
+    def lookup(self, path: Path) -> bool | None:
+        """
+        Whether a sidecar exists, as a file or directory, or None if `path` isn't a
+        sidecar name or its directory changed too recently to tell.
+        """
+        formats = meta_formats()
+        if not _is_sidecar_name(path.name, formats):
+            return None
+        listing = self._listing(os.fspath(path.parent), formats)
+        if listing is not None and listing.racy:
+            return None
+        return listing is not None and path.name in listing.sidecars
+
+    def lookup_dir(self, path: Path) -> bool | None:
+        """
+        Whether a sidecar exists and is a directory, or None if `path` isn't a sidecar
+        name or its directory changed too recently to tell.
+        """
+        formats = meta_formats()
+        if not _is_sidecar_name(path.name, formats):
+            return None
+        listing = self._listing(os.fspath(path.parent), formats)
+        if listing is not None and listing.racy:
+            return None
+        return listing is not None and listing.sidecars.get(path.name, False)
+
+    def invalidate(self, dir_path: Path | None = None, *, recursive: bool = False) -> None:
+        """
+        Forget the listing of one directory (and with `recursive`, of directories
+        within it), or of all directories. A directory that was listed is treated as
+        just changed, so lookups check the filesystem until it settles.
+        """
+        with self._lock:
+            if dir_path is None:
+                self._dirs.clear()
+                return
+            key = os.fspath(dir_path)
+            keys = [key] if key in self._dirs else []
+            if recursive:
+                prefix = os.path.join(key, "")
+                keys += [k for k in self._dirs if k.startswith(prefix)]
+            changed = _DirListing(time.time_ns(), True, (), {}, time.monotonic())
+            for k in keys:
+                self._dirs[k] = changed
@@ -0,0 +1,390 @@
+"""
+Directory-relative sidematter access using an open directory file descriptor.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from frontmatter_format import fmf_read_frontmatter
+from strif import new_uid
+
+from sidematter_format.asset_listing import listing_cache_path
+from sidematter_format.compiled_marker import CompiledMarker, compiled_marker_path
+from sidematter_format.meta_formats import (
+    ALL_FORMATS,
+    JSON_FORMAT,
+    YAML_FORMAT,
+    MetaFormat,
+    meta_formats,
+    select_meta_formats,
+)
+from sidematter_format.meta_log import apply_log, compact_tmp_path, log_old_path, parse_log
+from sidematter_format.sidematter_format import (
+    ResolvedSidematter,
+    Sidematter,
+    SidematterError,
+    decode_meta,
+    encode_meta,
+)
+
+_DIR_FD_SUPPORTED = (
+    os.open in os.supports_dir_fd
+    and os.stat in os.supports_dir_fd
+    and os.rename in os.supports_dir_fd
+    and os.unlink in os.supports_dir_fd
+)
+
+_O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+_O_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+
+class SidematterDir:
+    """
+    An open directory of primary documents, for doing many sidematter operations in one
+    directory. While open, the directory is held as a file descriptor and every stat,
+    open, rename, and unlink is relative to it (`dir_fd`), so the directory path is only
+    looked up once and concurrent renames of parent directories can't redirect
+    operations to a different directory.
+
+    Names passed to the methods are plain filenames of primaries within the directory.
+    On platforms without `dir_fd` support, falls back to ordinary path operations.
+
+    ```
+    with SidematterDir("docs") as sd:
+        for name in names:
+            meta = sd.read_meta(name)
+    ```
+    """
+
+    def __init__(self, path: str | Path):
+        self.path: Path = Path(path)
+        self._fd: int | None = None
+
+    # Lifecycle
+
+    def open(self) -> SidematterDir:
+        """
+        Open the directory file descriptor. Does nothing if already open or if the
+        platform does not support `dir_fd` operations.
+        """
+        if self._fd is None and _DIR_FD_SUPPORTED:
+            self._fd = os.open(self.path, os.O_RDONLY | _O_DIRECTORY | _O_CLOEXEC)
+        return self
+
+    def close(self) -> None:
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            os.close(fd)
+
+    def __enter__(self) -> SidematterDir:
+        return self.open()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def dir_fd(self) -> int | None:
+        """The open directory file descriptor, or None if not open or not supported."""
+        return self._fd
+
+    # Low-level directory-relative operations
+
+    def _target(self, name: str) -> str | Path:
+        if not name or name in (".", "..") or "/" in name or os.sep in name:
+            raise ValueError(f"Expected a plain filename within {self.path}: {name!r}")
+        return name if self._fd is not None else self.path / name
+
+    def sidematter(self, name: str) -> Sidematter:
+        """
+        A path-based `Sidematter` for the primary `name` in this directory.
+        """
+        self._target(name)
+        return Sidematter(self.path / name)
+
+    def stat(self, name: str, *, follow_symlinks: bool = True) -> os.stat_result | None:
+        """
+        Stat `name` in this directory, returning None if it does not exist.
+        """
+        try:
+            return os.stat(self._target(name), dir_fd=self._fd, follow_symlinks=follow_symlinks)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def exists(self, name: str) -> bool:
+        return self.stat(name) is not None
+
+    def is_dir(self, name: str) -> bool:
+        st = self.stat(name)
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+    def read_bytes(self, name: str) -> bytes:
+        """
+        Read the full contents of the file `name` in this directory.
+        """
+        fd = os.open(self._target(name), os.O_RDONLY | _O_CLOEXEC, dir_fd=self._fd)
+        with os.fdopen(fd, "rb") as f:
+            return f.read()
+
+    def read_text(self, name: str) -> str:
+        return self.read_bytes(name).decode("utf-8")
+
+    def write_text(self, name: str, text: str) -> None:
+        self.write_bytes(name, text.encode("utf-8"))
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        """
+        Atomically write `data` to `name` in this directory, via a temporary file in
+        the same directory that is renamed into place.
+        """
+        target = self._target(name)
+        tmp_name = f"{name}{new_uid()}.partial"
+        tmp_target = self._target(tmp_name)
+        fd = os.open(
+            tmp_target,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | _O_CLOEXEC,
+            0o666,
+            dir_fd=self._fd,
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.rename(tmp_target, target, src_dir_fd=self._fd, dst_dir_fd=self._fd)
+        except BaseException:
+            self.unlink(tmp_name)
+            raise
+
+    def rename(self, src_name: str, dest_name: str) -> None:
+        """
+        Rename `src_name` to `dest_name` within this directory, replacing any existing
+        file at the destination.
+        """
+        os.replace(
+            self._target(src_name),
+            self._target(dest_name),
+            src_dir_fd=self._fd,
+            dst_dir_fd=self._fd,
+        )
+
+    def unlink(self, name: str, *, missing_ok: bool = True) -> None:
+        try:
+            os.unlink(self._target(name), dir_fd=self._fd)
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+
+    # Sidematter operations
+
+    def resolve_meta(self, name: str) -> Path | None:
+        """
+        Return the first existing metadata path for the primary `name`, following the
+        same precedence as `Sidematter.resolve_meta()`.
+        """
+        sm = self.sidematter(name)
+        for fmt in meta_formats():
+            p = sm.meta_path_for(fmt)
+            if self.exists(p.name):
+                return p
+        return None
+
+    def resolve_assets(self, name: str) -> Path | None:
+        assets_dir = self.sidematter(name).assets_dir
+        return assets_dir if self.is_dir(assets_dir.name) else None
+
+    def resolve(
+        self, name: str, *, parse_meta: bool = True, use_frontmatter: bool = True
+    ) -> ResolvedSidematter:
+        """
+        Directory-relative equivalent of `Sidematter.resolve()`.
+        """
+        meta = None
+        if parse_meta:
+            try:
+                meta = self.read_meta(name, use_frontmatter=use_frontmatter)
+            except SidematterError:
+                pass
+
+        return ResolvedSidematter(
+            primary=self.path / name,
+            meta_path=self.resolve_meta(name),
+            meta=meta,
+            assets_dir=self.resolve_assets(name),
+        )
+
+    def read_meta(self, name: str, *, use_frontmatter: bool = True) -> dict[str, Any]:
+        """
+        Directory-relative equivalent of `Sidematter.read_meta()`, including changes in
+        the metadata log. Sidecars are opened directly in precedence order rather than
+        checked first and then read, so a sidecar that is renamed or removed
+        concurrently is never half-resolved.
+        """
+        sm = self.sidematter(name)
+        log = sm.meta_log_path
+        if not self.exists(log.name):
+            return self._read_base_meta(sm, use_frontmatter)
+        if self.exists(log_old_path(log).name):
+            # A compaction was committed but not finished, so the log is already merged
+            # into the new sidecars.
+            return self._read_base_meta(sm, use_frontmatter, compacted=True)
+        meta = self._read_base_meta(sm, use_frontmatter)
+        try:
+            return apply_log(meta, parse_log(self.read_bytes(log.name)))
+        except Exception as e:
+            raise SidematterError(f"Error loading metadata log: {log}: {e}") from e
+
+    def _read_base_meta(
+        self, sm: Sidematter, use_frontmatter: bool, compacted: bool = False
+    ) -> dict[str, Any]:
+        name = sm.primary.name
+        for fmt in meta_formats():
+            p = sm.meta_path_for(fmt)
+            # Use any sidecar an unfinished compaction didn't replace yet.
+            sources = [compact_tmp_path(p), p] if compacted else [p]
+            for source in sources:
+                try:
+                    data = self.read_bytes(source.name)
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    raise SidematterError(f"Error loading metadata: {source}: {e}") from e
+                return decode_meta(data, p)
+
+        if use_frontmatter and self.exists(name):
+            try:
+                return fmf_read_frontmatter(sm.primary) or {}
+            except Exception:
+                return {}
+
+        return {}
+
+    def write_meta(
+        self,
+        name: str,
+        data: dict[str, Any] | str | bytes,
+        *,
+        formats: str | Sequence[str] = "yaml",
+        key_sort: Callable[[str], Any] | None = None,
+        fast_yaml: bool = False,
+    ) -> Path:
+        """
+        Directory-relative equivalent of `Sidematter.write_meta()`.
+        """
+        fmts = select_meta_formats(formats, all_formats=False)
+        if not fmts:
+            raise ValueError("No metadata formats selected")
+        if isinstance(data, (str, bytes)) and len(fmts) > 1:
+            raise ValueError(
+                "Cannot write raw string to multiple formats; provide a dict or choose one format"
+            )
+        if isinstance(data, str) and fmts[0].binary:
+            raise ValueError(f"Cannot write a raw string to binary format {fmts[0].name!r}")
+
+        sm = self.sidematter(name)
+        last_path: Path | None = None
+        try:
+            for fmt in reversed(fmts):
+                p = sm.meta_path_for(fmt)
+                last_path = p
+                content = encode_meta(data, fmt, key_sort=key_sort, fast_yaml=fast_yaml)
+                self.write_bytes(p.name, content)
+            self._clear_log(sm)
+            self._clear_compiled(sm, fmts)
+        except Exception as e:
+            raise SidematterError(f"Error writing metadata: {last_path or 'unknown path'}") from e
+
+        return sm.meta_path_for(fmts[0])
+
+    def delete_meta(self, name: str, *, formats: str | Sequence[str] = "all") -> None:
+        """
+        Directory-relative equivalent of `Sidematter.delete_meta()`.
+        """
+        sm = self.sidematter(name)
+        fmts = select_meta_formats(formats, all_formats=True)
+        for fmt in fmts:
+            self.unlink(sm.meta_path_for(fmt).name)
+        if JSON_FORMAT in fmts:
+            self.unlink(compiled_marker_path(sm.meta_json_path).name)
+        if formats == ALL_FORMATS:
+            self._clear_log(sm)
+
+    def _clear_log(self, sm: Sidematter) -> None:
+        """
+        Remove the metadata log, as `Sidematter.write_meta()` does: any unfinished
+        compaction is discarded, then the log is removed before its copy.
+        """
+        old = log_old_path(sm.meta_log_path)
+        if self.exists(old.name):
+            for fmt in meta_formats():
+                self.unlink(compact_tmp_path(sm.meta_path_for(fmt)).name)
+        self.unlink(sm.meta_log_path.name)
+        self.unlink(old.name)
+
+    def _clear_compiled(self, sm: Sidematter, written: Sequence[MetaFormat]) -> None:
+        """
+        Remove the marker (and out-of-date JSON) of JSON compiled from the YAML, as
+        `Sidematter.write_meta()` does.
+        """
+        if YAML_FORMAT not in written and JSON_FORMAT not in written:
+            return
+        marker_name = compiled_marker_path(sm.meta_json_path).name
+        try:
+            marker = CompiledMarker.decode(self.read_bytes(marker_name))
+        except FileNotFoundError:
+            return
+        if JSON_FORMAT not in written and marker is not None:
+            try:
+                content = self.read_bytes(sm.meta_json_path.name)
+            except FileNotFoundError:
+                content = None
+            if content is not None and marker.is_compiled(content):
+                self.unlink(sm.meta_json_path.name)
+        self.unlink(marker_name)
+
+    def rename_sidematter(self, src_name: str, dest_name: str) -> ResolvedSidematter:
+        """
+        Rename a primary along with its sidecar metadata (in every format present,
+        including any metadata log) and assets directory within this directory. Returns
+        the resolved destination sidematter.
+        """
+        self.sidematter(src_name).flush_pending_meta()
+        self.sidematter(dest_name).discard_pending_meta()
+        src = self.resolve(src_name, parse_meta=False)
+        dest = src.renamed_as(self.path / dest_name)
+
+        src_sm, dest_sm = self.sidematter(src_name), self.sidematter(dest_name)
+        meta_names = [
+            (src_sm.meta_path_for(fmt).name, dest_sm.meta_path_for(fmt).name)
+            for fmt in meta_formats()
+        ]
+        meta_names.append((src_sm.meta_log_path.name, dest_sm.meta_log_path.name))
+        meta_names.append(
+            (
+                compiled_marker_path(src_sm.meta_json_path).name,
+                compiled_marker_path(dest_sm.meta_json_path).name,
+            )
+        )
+        meta_names.append(
+            (
+                listing_cache_path(src_sm.assets_dir).name,
+                listing_cache_path(dest_sm.assets_dir).name,
+            )
+        )
+        for src_meta, dest_meta in meta_names:
+            if self.exists(src_meta):
+                self.rename(src_meta, dest_meta)
+        if src.assets_dir is not None and dest.assets_dir is not None:
+            self.rename(src.assets_dir.name, dest.assets_dir.name)
+        if self.exists(src_name):
+            self.rename(src_name, dest_name)
+
+        return self.resolve(dest_name, parse_meta=False)
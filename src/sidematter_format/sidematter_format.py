@@ -1,22 +1,68 @@
 from __future__ import annotations
 
-import json
-from collections.abc import Callable
-from dataclasses import dataclass
+import tempfile
+from collections.abc import Callable, Generator, Hashable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Literal, cast
-
-from frontmatter_format import fmf_read_frontmatter, from_yaml_string, to_yaml_string
-from strif import atomic_output_file, copyfile_atomic
-
-from sidematter_format.json_conventions import to_json_string
-
-META_NAME = "meta"
-JSON_SUFFIX = f".{META_NAME}.json"
-YAML_SUFFIX = f".{META_NAME}.yml"
+from typing import Any, Literal, TypeVar, cast
+
+from frontmatter_format import fmf_read_frontmatter
+
+from sidematter_format.asset_access import map_file, read_range, slice_range
+from sidematter_format.asset_import import ImportReport, import_assets
+from sidematter_format.asset_layout import (
+    AssetLayout,
+    LayoutState,
+    asset_names,
+    asset_rel_path,
+    convert_layout,
+    read_layout_state,
+)
+from sidematter_format.asset_listing import AssetEntry, iter_assets, list_assets
+from sidematter_format.asset_store import AssetStore
+from sidematter_format.compiled_marker import CompiledMarker, compiled_marker_path
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.meta_cache_client import shared_meta_cache
+from sidematter_format.meta_formats import (
+    ALL_FORMATS,
+    JSON_FORMAT,
+    JSON_SUFFIX,
+    YAML_FORMAT,
+    YAML_SUFFIX,
+    MetaEncodeOptions,
+    MetaFormat,
+    get_meta_format,
+    meta_format_for_path,
+    meta_formats,
+    select_meta_formats,
+)
+from sidematter_format.meta_formats import META_NAME as META_NAME
+from sidematter_format.meta_log import (
+    APPEND_OP,
+    DEFAULT_COMPACT_BYTES,
+    META_LOG_SUFFIX,
+    PATCH_OP,
+    apply_log,
+    compact_tmp_path,
+    encode_log_entry,
+    log_old_path,
+    parse_log,
+)
+from sidematter_format.sidematter_fs import LOCAL_FS, LocalFS, SidematterFS, WritableFS
+from sidematter_format.typed_meta import decode_model, encode_model, is_model
+from sidematter_format.write_behind import (
+    WriteBehind,
+    discard_pending,
+    flush_pending,
+    pending_meta,
+    write_behind_active,
+)
 
 ASSETS_SUFFIX = "assets"
 
+T = TypeVar("T")
+
 
 class SidematterError(RuntimeError):
     """
@@ -24,6 +70,49 @@ class SidematterError(RuntimeError):
     """
 
 
+def decode_meta(data: bytes, meta_path: Path) -> dict[str, Any]:
+    """
+    Decode the contents of a sidecar metadata file, using the registered format that
+    matches the suffix of `meta_path`.
+
+    Raises:
+        SidematterError: If the metadata cannot be parsed or is not a dict.
+    """
+    fmt = meta_format_for_path(meta_path)
+    if fmt is None:
+        raise SidematterError(f"Unknown metadata format: {meta_path}")
+    try:
+        parsed: Any = fmt.decode(data)
+        if not isinstance(parsed, dict):
+            raise SidematterError(f"Metadata is not a dict: got {type(parsed)}: {meta_path}")
+        return cast(dict[str, Any], parsed)
+    except Exception as e:
+        raise SidematterError(f"Error loading metadata: {meta_path}: {e}") from e
+
+
+def encode_meta(
+    data: dict[str, Any] | str | bytes,
+    fmt: MetaFormat | str,
+    *,
+    key_sort: Callable[[str], Any] | None = None,
+    fast_yaml: bool = False,
+) -> bytes:
+    """
+    Serialize metadata to the contents of a sidecar file in the given format. Raw
+    strings and bytes are written verbatim. With `fast_yaml`, plain data is written to
+    YAML by a fast emitter with identical output (see `yaml_conventions.yaml_dumps()`).
+    """
+    if isinstance(fmt, str):
+        fmt = get_meta_format(fmt)
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, str):  # Raw YAML/JSON already formatted
+        if fmt.binary:
+            raise ValueError(f"Cannot write a raw string to binary format {fmt.name!r}")
+        return data.encode("utf-8")
+    return fmt.encode(data, MetaEncodeOptions(key_sort=key_sort, fast_yaml=fast_yaml))
+
+
 @dataclass(slots=True, frozen=True)
 class Sidematter:
     """
@@ -33,11 +122,42 @@ class Sidematter:
 
     For simple reading, call `resolve()` immediately to get a `ResolvedSidematter`
     object with all the sidematter paths and metadata.
+
+    By default paths are on the local filesystem. With `fs`, sidematter is resolved
+    and read from that filesystem instead, such as a `ZipFS` or `TarFS` archive
+    (read-only) or a `MemoryFS` (which can also be written).
     """
 
     primary: Path
     """The primary document path."""
 
+    fs: SidematterFS | None = field(default=None, compare=False)
+    """Filesystem to use, if not the local filesystem."""
+
+    write_behind: WriteBehind | None = field(default=None, compare=False)
+    """If set, metadata writes are coalesced in memory and written later."""
+
+    def _read_fs(self) -> SidematterFS:
+        return LOCAL_FS if self.fs is None else self.fs
+
+    @property
+    def _is_local(self) -> bool:
+        return self.fs is None or isinstance(self.fs, LocalFS)
+
+    @property
+    def _pending_key(self) -> Hashable:
+        """Key of this document's pending writes, if written with write-behind."""
+        if self._is_local:
+            return (None, str(self.primary.absolute()))
+        return (self.fs, str(self.primary))
+
+    def _write_fs(self) -> WritableFS:
+        if self.fs is None:
+            return LOCAL_FS
+        if not isinstance(self.fs, WritableFS):
+            raise SidematterError(f"Cannot modify sidematter on a read-only filesystem: {self.fs}")
+        return self.fs
+
     # Path properties (may not exist on disk)
 
     @property
@@ -52,6 +172,18 @@ class Sidematter:
     def assets_dir(self) -> Path:
         return self.primary.with_name(f"{self.primary.stem}.{ASSETS_SUFFIX}")
 
+    @property
+    def meta_log_path(self) -> Path:
+        return self.primary.with_suffix(META_LOG_SUFFIX)
+
+    def meta_path_for(self, fmt: MetaFormat | str) -> Path:
+        """
+        Path of the metadata sidecar in a registered format, e.g. "json" or "msgpack".
+        """
+        if isinstance(fmt, str):
+            fmt = get_meta_format(fmt)
+        return self.primary.with_suffix(fmt.suffix)
+
     # Resolving and finding paths.
 
     def resolve(
@@ -87,17 +219,19 @@ class Sidematter:
 
     def resolve_meta(self) -> Path | None:
         """
-        Return the first existing metadata path following the precedence order
-        (`.meta.json` then `.meta.yml`) or None if neither exists.
+        Return the first existing metadata path following the precedence order of
+        registered formats (by default `.meta.json`, then `.meta.yml`, then
+        `.meta.msgpack`) or None if none exists.
         """
-        if self.meta_json_path.exists():
-            return self.meta_json_path
-        if self.meta_yaml_path.exists():
-            return self.meta_yaml_path
+        fs = self._read_fs()
+        for fmt in meta_formats():
+            p = self.meta_path_for(fmt)
+            if fs.exists(p):
+                return p
         return None
 
     def resolve_assets(self) -> Path | None:
-        return self.assets_dir if self.assets_dir.is_dir() else None
+        return self.assets_dir if self._read_fs().is_dir(self.assets_dir) else None
 
     # Reading and writing metadata.
 
@@ -106,7 +240,12 @@ class Sidematter:
         Load metadata following the precedence order:
         1. JSON sidecar (.meta.json)
         2. YAML sidecar (.meta.yml)
-        3. YAML frontmatter in the document itself (if use_frontmatter is True)
+        3. Any other registered formats, such as binary MessagePack (.meta.msgpack)
+        4. YAML frontmatter in the document itself (if use_frontmatter is True)
+
+        Changes recorded in the metadata log (see `patch_meta()`) are applied on top.
+        Local metadata is looked up in the shared metadata cache first, if this process
+        uses one (see `meta_cache_client`).
 
         Args:
             use_frontmatter: If True and no sidecar metadata file exists, attempt to read
@@ -118,124 +257,549 @@ class Sidematter:
         Raises:
             SidematterError: If metadata file exists but cannot be parsed.
         """
+        if write_behind_active():
+            pending = pending_meta(self._pending_key)
+            if pending is not None:
+                return pending
+        if self._is_local:
+            cache = shared_meta_cache()
+            if cache is not None:
+                meta = cache.read_meta(self.primary, use_frontmatter)
+                if meta is not None:
+                    return meta
+        fs = self._read_fs()
+        log = self.meta_log_path
+        if not fs.exists(log):
+            return self._read_base_meta(fs, use_frontmatter)
+        if fs.exists(log_old_path(log)):
+            # A compaction was committed but not finished, so the log is already merged
+            # into the new sidecars.
+            return self._read_base_meta(fs, use_frontmatter, compacted=True)
+        meta = self._read_base_meta(fs, use_frontmatter)
+        try:
+            return apply_log(meta, parse_log(fs.read_bytes(log)))
+        except Exception as e:
+            raise SidematterError(f"Error loading metadata log: {log}: {e}") from e
+
+    def read_meta_as(self, model_type: type[T], *, use_frontmatter: bool = True) -> T:
+        """
+        Read metadata (as with `read_meta()`) straight into a model type, such as a
+        (slotted) dataclass or a type registered with `register_model_type()`. Fields
+        are checked and converted by their type annotations, with a decoder compiled
+        once per type.
+
+        Raises:
+            SidematterError: If metadata exists but cannot be parsed.
+            MetaValidationError: If the metadata doesn't match the model, with the key
+                path of the failing value.
+        """
+        return decode_model(model_type, self.read_meta(use_frontmatter=use_frontmatter))
+
+    def _read_base_meta(
+        self, fs: SidematterFS, use_frontmatter: bool, compacted: bool = False
+    ) -> dict[str, Any]:
         p = self.resolve_meta()
-        if p is not None:
+        source = p
+        if compacted:
+            # Use any sidecar the compaction didn't finish replacing.
+            for fmt in meta_formats():
+                meta_path = self.meta_path_for(fmt)
+                tmp = compact_tmp_path(meta_path)
+                if fs.exists(tmp):
+                    p, source = meta_path, tmp
+                    break
+                if fs.exists(meta_path):
+                    break
+        if p is not None and source is not None:
             try:
-                if p.suffix == ".json":
-                    return json.loads(p.read_text(encoding="utf-8"))
-                parsed: Any = from_yaml_string(p.read_text(encoding="utf-8")) or {}
-                if not isinstance(parsed, dict):
-                    raise SidematterError(f"Metadata is not a dict: got {type(parsed)}: {p}")
-                return cast(dict[str, Any], parsed)
+                data = fs.read_bytes(source)
             except Exception as e:
-                raise SidematterError(f"Error loading metadata: {p}: {e}") from e
+                raise SidematterError(f"Error loading metadata: {source}: {e}") from e
+            return decode_meta(data, p)
 
         # Try frontmatter fallback if enabled and document exists
-        if use_frontmatter and self.primary.exists():
+        if use_frontmatter and fs.exists(self.primary):
             try:
-                return fmf_read_frontmatter(self.primary) or {}
+                return self._read_frontmatter() or {}
             except Exception:
                 # If frontmatter reading fails, just return empty metadata
                 return {}
 
         return {}
 
+    def _read_frontmatter(self) -> dict[str, Any] | None:
+        if self._is_local:
+            return fmf_read_frontmatter(self.primary)
+        # Frontmatter is parsed from a file, so copy the document out of the filesystem.
+        with tempfile.NamedTemporaryFile(suffix=self.primary.suffix) as f:
+            f.write(self._read_fs().read_bytes(self.primary))
+            f.flush()
+            return fmf_read_frontmatter(f.name)
+
     def write_meta(
         self,
-        data: dict[str, Any] | str,
+        data: dict[str, Any] | str | bytes | object,
         *,
-        formats: Literal["yaml", "json", "all"] = "yaml",
+        formats: str | Sequence[str] = "yaml",
         key_sort: Callable[[str], Any] | None = None,
         make_parents: bool = True,
+        fast_yaml: bool = False,
     ) -> Path:
         """
-        Serialize `data` to one or both sidecar files according to `formats`.
-
-        If `data` is a raw string, it is written verbatim for the selected single format.
-        When `formats == "all"`, both YAML and JSON are written and returns the JSON path.
+        Serialize `data` to one or more sidecar files according to `formats`, which is
+        a registered format name ("yaml", "json", "msgpack", ...), a sequence of names,
+        or "all" for both YAML and JSON.
+
+        `data` may also be a model, such as a dataclass or a type registered with
+        `register_model_type()`, which is written as a dict of its fields (like
+        `json_conventions.json_default()` does), so it can be read back with
+        `read_meta_as()`.
+
+        If `data` is a raw string (or bytes), it is written verbatim for the selected
+        single format. When several formats are written, returns the path of the one
+        that takes precedence when reading (so JSON for "all"). The metadata log, if
+        any, is removed, since `data` replaces the metadata.
+
+        With `fast_yaml`, plain metadata (dicts, lists, strings, numbers, bools) is
+        written to YAML by a fast emitter that produces the same output, falling back
+        to ruamel for anything else.
+
+        With `write_behind` set, metadata other than raw strings is only recorded in
+        memory, and written when the `WriteBehind` is flushed. Reads until then see it
+        as encoded in the first of `formats`, as they will once it is written.
         """
-        if formats not in ("yaml", "json", "all"):
-            raise ValueError("formats must be 'yaml', 'json', or 'all'")
-
-        fmts: list[str] = ["yaml", "json"] if formats == "all" else [formats]
+        fs = self._write_fs()
+        fmts = select_meta_formats(formats, all_formats=False)
+        if not fmts:
+            raise ValueError("No metadata formats selected")
+        if is_model(data):
+            data = encode_model(data)
+        elif not isinstance(data, (dict, str, bytes)):
+            raise TypeError(f"Cannot write metadata of type {type(data).__name__}")
+        data = cast(dict[str, Any] | str | bytes, data)
 
         # Require format for raw string data.
-        if isinstance(data, str) and len(fmts) > 1:
+        if isinstance(data, (str, bytes)) and len(fmts) > 1:
             raise ValueError(
                 "Cannot write raw string to multiple formats; provide a dict or choose one format"
             )
+        if isinstance(data, str) and fmts[0].binary:
+            raise ValueError(f"Cannot write a raw string to binary format {fmts[0].name!r}")
 
-        # Return-path rules
-        return_path: Path = (
-            self.meta_yaml_path if ("json" not in fmts and "yaml" in fmts) else self.meta_json_path
-        )
+        def write(data: dict[str, Any] | str | bytes) -> Path:
+            return self._write_meta(fs, data, fmts, key_sort, make_parents, fast_yaml)
+
+        def read(data: dict[str, Any]) -> dict[str, Any]:
+            # Round-trip through the sidecar that is read once written, so pending
+            # metadata reads the same as after the flush.
+            meta_path = self.meta_path_for(fmts[0])
+            try:
+                content = encode_meta(data, fmts[0], key_sort=key_sort, fast_yaml=fast_yaml)
+            except Exception as e:
+                raise SidematterError(f"Error encoding pending metadata: {meta_path}: {e}") from e
+            return decode_meta(content, meta_path)
 
+        if self.write_behind is not None and isinstance(data, dict):
+            self.write_behind.put(self._pending_key, data, write, read)
+            return self.meta_path_for(fmts[0])
+        self.discard_pending_meta()
+        return write(data)
+
+    def _write_meta(
+        self,
+        fs: WritableFS,
+        data: dict[str, Any] | str | bytes,
+        fmts: list[MetaFormat],
+        key_sort: Callable[[str], Any] | None,
+        make_parents: bool,
+        fast_yaml: bool,
+    ) -> Path:
         last_path: Path | None = None
         try:
-            for fmt in fmts:
-                p = self.meta_yaml_path if fmt == "yaml" else self.meta_json_path
+            # Write in reverse precedence order, so the preferred sidecar is newest.
+            for fmt in reversed(fmts):
+                p = self.meta_path_for(fmt)
                 last_path = p
+                content = encode_meta(data, fmt, key_sort=key_sort, fast_yaml=fast_yaml)
                 # Use atomic file writing to ensure integrity
-                with atomic_output_file(p, make_parents=make_parents) as temp_path:
-                    if isinstance(data, str):  # Raw YAML/JSON already formatted
-                        temp_path.write_text(data)
-                    elif fmt == "json":
-                        # Write JSON and trailing newline in a single call to avoid overwriting
-                        temp_path.write_text(to_json_string(data) + "\n")
-                    else:  # YAML from dict
-                        temp_path.write_text(to_yaml_string(data, key_sort=key_sort))
-            return return_path
+                fs.write_bytes(p, content, make_parents=make_parents)
+            self._clear_log(fs)
+            self._clear_compiled(fs, fmts)
+            return self.meta_path_for(fmts[0])
         except Exception as e:
             raise SidematterError(f"Error writing metadata: {last_path or 'unknown path'}") from e
 
-    def delete_meta(
-        self,
-        *,
-        formats: Literal["yaml", "json", "all"] = "all",
-    ) -> None:
+    def flush_pending_meta(self) -> None:
+        """
+        Write any metadata of this document that is pending in a `WriteBehind`, before
+        its sidecars are changed otherwise (such as copied, moved, or patched).
+        """
+        if write_behind_active():
+            flush_pending(self._pending_key)
+
+    def discard_pending_meta(self) -> None:
         """
-        Delete sidecar metadata files according to `formats`.
+        Drop any metadata of this document that is pending in a `WriteBehind`, before
+        its sidecars are replaced or removed.
         """
-        if formats not in ("yaml", "json", "all"):
-            raise ValueError("formats must be 'yaml', 'json', or 'all'")
-        fmts: list[str] = ["yaml", "json"] if formats == "all" else [formats]
+        if write_behind_active():
+            discard_pending(self._pending_key)
+
+    def delete_meta(self, *, formats: str | Sequence[str] = "all") -> None:
+        """
+        Delete sidecar metadata files according to `formats`, a format name, sequence
+        of names, or "all" for every registered format and the metadata log.
+        """
+        fs = self._write_fs()
+        self.flush_pending_meta()
+        fmts = select_meta_formats(formats, all_formats=True)
         for fmt in fmts:
-            p = self.meta_yaml_path if fmt == "yaml" else self.meta_json_path
-            p.unlink(missing_ok=True)
+            fs.unlink(self.meta_path_for(fmt))
+        if JSON_FORMAT in fmts:
+            fs.unlink(compiled_marker_path(self.meta_json_path))
+        if formats == ALL_FORMATS:
+            self._clear_log(fs)
+
+    # Metadata log
+
+    def patch_meta(
+        self, patch: dict[str, Any], *, compact_bytes: int | None = DEFAULT_COMPACT_BYTES
+    ) -> None:
+        """
+        Record a change to the metadata as a JSON merge patch: keys in `patch` are set
+        (merging into dicts), and keys set to None are removed. The change is appended
+        to the metadata log, so the sidecar isn't rewritten. Once the log is larger
+        than `compact_bytes`, it is compacted (see `compact_meta()`).
+        """
+        self._append_log(PATCH_OP, patch, compact_bytes)
+
+    def append_meta(
+        self, key: str, value: Any, *, compact_bytes: int | None = DEFAULT_COMPACT_BYTES
+    ) -> None:
+        """
+        Record appending `value` to the list at `key` in the metadata, such as an entry
+        in a document's version history, in the metadata log. Like `patch_meta()`, this
+        costs the same however long the list is.
+        """
+        self._append_log(APPEND_OP, {key: value}, compact_bytes)
+
+    def compact_meta(self) -> Path | None:
+        """
+        Merge the metadata log into the sidecars and remove it. Each existing sidecar
+        format is rewritten, or a YAML sidecar is written if there is none (including
+        any frontmatter metadata). Returns the path of the sidecar that takes
+        precedence, or None if there was no log.
+
+        Assumes a single writer: changes appended by another process during compaction
+        may be lost.
+        """
+        fs = self._write_fs()
+        log = self.meta_log_path
+        self.flush_pending_meta()
+        try:
+            self._recover_compaction(fs)
+            if not fs.exists(log):
+                return None
+            meta = self.read_meta()
+            fmts = [f for f in meta_formats() if fs.exists(self.meta_path_for(f))]
+            fmts = fmts or [get_meta_format("yaml")]
+            for fmt in fmts:
+                tmp = compact_tmp_path(self.meta_path_for(fmt))
+                fs.write_bytes(tmp, encode_meta(meta, fmt))
+            # Once the log is copied aside, the compaction is committed. The log itself
+            # stays until the new sidecars are in place, so readers only need to look
+            # for the copy when there is a log.
+            fs.copy_file(log, log_old_path(log))
+            self._recover_compaction(fs)
+        except SidematterError:
+            raise
+        except Exception as e:
+            raise SidematterError(f"Error compacting metadata log: {log}: {e}") from e
+        return self.meta_path_for(fmts[0])
+
+    def _append_log(self, op: str, value: dict[str, Any], compact_bytes: int | None) -> None:
+        fs = self._write_fs()
+        log = self.meta_log_path
+        self.flush_pending_meta()
+        try:
+            line = encode_log_entry(op, value)
+            if fs.exists(log_old_path(log)):
+                self._recover_compaction(fs)
+            size = fs.append_bytes(log, line)
+        except Exception as e:
+            raise SidematterError(f"Error appending to metadata log: {log}: {e}") from e
+        if compact_bytes is not None and size > compact_bytes:
+            self.compact_meta()
+
+    def _recover_compaction(self, fs: WritableFS) -> None:
+        """
+        Finish a compaction that was interrupted after the log was copied aside, or
+        remove the temporary files of one that was interrupted before.
+        """
+        old = log_old_path(self.meta_log_path)
+        committed = fs.exists(old)
+        for fmt in meta_formats():
+            meta_path = self.meta_path_for(fmt)
+            tmp = compact_tmp_path(meta_path)
+            if fs.exists(tmp):
+                if committed:
+                    fs.rename(tmp, meta_path)
+                else:
+                    fs.unlink(tmp)
+        if committed:
+            # The log goes before its copy, so a log is never left without the copy
+            # while it is already merged.
+            fs.unlink(self.meta_log_path)
+            fs.unlink(old)
+
+    def _clear_log(self, fs: WritableFS) -> None:
+        old = log_old_path(self.meta_log_path)
+        if not fs.exists(old):
+            fs.unlink(self.meta_log_path)
+            return
+        # Discard an unfinished compaction, then remove the log before its copy, as in
+        # `_recover_compaction()`.
+        for fmt in meta_formats():
+            fs.unlink(compact_tmp_path(self.meta_path_for(fmt)))
+        fs.unlink(self.meta_log_path)
+        fs.unlink(old)
+
+    def _clear_compiled(self, fs: WritableFS, written: Sequence[MetaFormat]) -> None:
+        """
+        After writing the `written` sidecars, remove the marker of JSON compiled from
+        the YAML (see `compile_meta`), since it no longer holds. If the YAML was written
+        but not the JSON, the compiled JSON is out of date, so remove it too, unless it
+        was since written some other way.
+        """
+        if YAML_FORMAT not in written and JSON_FORMAT not in written:
+            return
+        marker_path = compiled_marker_path(self.meta_json_path)
+        if not fs.exists(marker_path):
+            return
+        if JSON_FORMAT not in written:
+            marker = CompiledMarker.decode(fs.read_bytes(marker_path))
+            try:
+                content = fs.read_bytes(self.meta_json_path)
+            except FileNotFoundError:
+                content = None
+            if marker is not None and content is not None and marker.is_compiled(content):
+                fs.unlink(self.meta_json_path)
+        fs.unlink(marker_path)
 
     # Asset helpers
 
+    @property
+    def asset_layout(self) -> AssetLayout:
+        """
+        The layout of the assets directory: flat by default, or sharded by hash prefix
+        (see `set_asset_layout()`).
+        """
+        return self._read_layout_state().layout
+
+    def _read_layout_state(self) -> LayoutState:
+        try:
+            return read_layout_state(self._read_fs(), self.assets_dir)
+        except ValueError as e:
+            raise SidematterError(f"Error reading asset layout: {self.assets_dir}: {e}") from e
+
+    def _layout_state(self) -> LayoutState | None:
+        """The layout state of the assets directory, or None if it is plain flat."""
+        state = self._read_layout_state()
+        if not state.layout.sharded and state.converting_from is None:
+            return None
+        return state
+
+    def set_asset_layout(self, layout: AssetLayout, *, workers: int = DEFAULT_COPY_WORKERS) -> int:
+        """
+        Convert the assets directory to `layout`, such as `SHARDED_LAYOUT` for hash-prefix
+        subdirectories, or `FLAT_LAYOUT`, moving assets in parallel, and record it so
+        later reads and writes use it. Creates the assets directory if needed, so a new
+        document can be sharded before adding assets. An interrupted conversion is
+        finished by running it again. Returns the number of assets moved.
+        """
+        fs = self._write_fs()
+        try:
+            return convert_layout(fs, self.assets_dir, layout, workers=workers)
+        except (OSError, ValueError) as e:
+            raise SidematterError(f"Error converting asset layout: {self.assets_dir}: {e}") from e
+
     def asset_path(self, name: str | Path) -> Path:
         """
-        Path of an asset in the assets directory.
+        Path of an asset in a flat assets directory. This is only a path computation and
+        doesn't check the layout; see `resolve_asset_path()` for sharded layouts.
         """
         return self.assets_dir / name
 
-    def add_asset(self, src: str | Path, dest_name: str | None = None) -> Path:
+    def resolve_asset_path(self, name: str | Path) -> Path:
+        """
+        Path of an asset in the layout of the assets directory, which is read once. In a
+        sharded layout, this is in the subdirectory for the name.
+        """
+        return self._asset_path_in(self._layout_state(), name)
+
+    def _asset_path_in(self, state: LayoutState | None, name: str | Path) -> Path:
+        if state is None:
+            return self.asset_path(name)
+        fs = self._read_fs()
+        return self.assets_dir / asset_rel_path(
+            state, name, exists=lambda rel: fs.exists(self.assets_dir / rel)
+        )
+
+    def _asset_entries(
+        self, entries: list[AssetEntry], state: LayoutState | None
+    ) -> list[AssetEntry]:
+        """Entries of files in the assets directory, named by asset name."""
+        if state is None:
+            return entries
+        names = asset_names(state, (e.name for e in entries))
+        return [AssetEntry(names[e.name], e.size, e.mtime_ns) for e in entries if e.name in names]
+
+    def add_asset(
+        self, src: str | Path, dest_name: str | None = None, *, store: AssetStore | None = None
+    ) -> Path:
         """
         Convenience wrapper to copy a file into the asset directory and return its
-        new path. Uses atomic copy to ensure file integrity.
+        new path. Uses atomic copy to ensure file integrity. The source is always a
+        local file.
+
+        With `store`, the file is added to that content-addressed store and the asset
+        is a hardlink to the shared copy (only on the local filesystem).
         """
         src_path = Path(src)
-        target = self.asset_path(dest_name or src_path.name)
-        copyfile_atomic(src_path, target, make_parents=True)
+        target = self.resolve_asset_path(dest_name or src_path.name)
+        self._copy_asset(src_path, target, store)
         return target
 
-    def copy_assets_from(self, src_dir: str | Path, glob: str = "**/*") -> list[Path]:
+    def _copy_asset(self, src_path: Path, target: Path, store: AssetStore | None) -> None:
+        fs = self._write_fs()
+        if store is not None:
+            if not self._is_local:
+                raise SidematterError(
+                    f"Asset stores are only supported on the local filesystem: {self.fs}"
+                )
+            store.link(src_path, target)
+            if isinstance(self.fs, LocalFS) and self.fs.sidecar_cache is not None:
+                self.fs.sidecar_cache.invalidate(self.assets_dir.parent)
+        elif self._is_local:
+            fs.copy_file(src_path, target, make_parents=True)
+        else:
+            fs.write_bytes(target, src_path.read_bytes())
+
+    def iter_assets(self) -> Iterator[AssetEntry]:
+        """
+        Yield every file in the assets directory (recursively), with its path relative
+        to the assets directory, size, and modification time.
+        """
+        if not self._is_local:
+            entries = self._read_fs().iter_files(self.assets_dir)
+        else:
+            entries = iter_assets(self.assets_dir)
+        state = self._layout_state()
+        if state is None:
+            return entries
+        return iter(self._asset_entries(list(entries), state))
+
+    def read_asset(self, name: str | Path) -> bytes:
+        """
+        Read the contents of an asset.
+        """
+        return self._read_fs().read_bytes(self.resolve_asset_path(name))
+
+    @contextmanager
+    def open_asset(
+        self, name: str | Path, mode: Literal["mmap", "bytes"] = "mmap"
+    ) -> Generator[memoryview]:
+        """
+        Open an asset as a read-only `memoryview`, for use in a `with` block. In "mmap"
+        mode the file is memory-mapped, so slicing the view doesn't copy and only the
+        pages touched are read from disk. In "bytes" mode (and always for assets not on
+        the local filesystem) the contents are read into memory.
+        """
+        if mode not in ("mmap", "bytes"):
+            raise ValueError(f"mode must be 'mmap' or 'bytes': {mode!r}")
+        if mode == "mmap" and self._is_local:
+            with map_file(self.resolve_asset_path(name)) as view:
+                yield view
+        else:
+            yield memoryview(self.read_asset(name))
+
+    def read_asset_range(self, name: str | Path, start: int, end: int | None = None) -> bytes:
+        """
+        Read bytes `start` up to (not including) `end` of an asset, or to its end if
+        `end` is None. On the local filesystem only the requested range is read.
+        """
+        if self._is_local:
+            return read_range(self.resolve_asset_path(name), start, end)
+        return slice_range(self.read_asset(name), start, end)
+
+    def list_assets(self, *, cache: bool = False) -> list[AssetEntry]:
         """
-        Copy all files from a directory into the asset directory.
+        List every file in the assets directory (recursively), sorted by name. With
+        `cache`, the listing is persisted beside the assets directory (as
+        `basename.assets.listing.json`) and reused until a directory in the tree changes
+        (see `asset_listing.list_assets()`). The cache is only used on the local
+        filesystem.
         """
+        if not self._is_local:
+            entries = list(self._read_fs().iter_files(self.assets_dir))
+        else:
+            entries = list_assets(self.assets_dir, cache=cache)
+        return sorted(self._asset_entries(entries, self._layout_state()), key=lambda e: e.name)
+
+    def copy_assets_from(
+        self, src_dir: str | Path, glob: str = "**/*", *, store: AssetStore | None = None
+    ) -> list[Path]:
+        """
+        Copy all files from a directory into the asset directory. Files are copied by
+        name only, so nested paths are flattened. See `import_assets()` to keep the
+        directory structure and copy large trees quickly. With `store`, assets are
+        linked to a content-addressed store, as with `add_asset()`.
+        """
+        fs = self._write_fs()
         src_path = Path(src_dir)
         if not src_path.is_dir():
             raise ValueError(f"Asset source is not a directory: {src_path!r}")
 
-        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        fs.mkdir(self.assets_dir)
+        state = self._layout_state()
         copied: list[Path] = []
         for path in src_path.glob(glob):
             if path.is_file():
-                copied.append(self.add_asset(path))
+                target = self._asset_path_in(state, path.name)
+                self._copy_asset(path, target, store)
+                copied.append(target)
         return copied
 
+    def import_assets(
+        self,
+        src_dir: str | Path,
+        *,
+        glob: str = "**/*",
+        workers: int = DEFAULT_COPY_WORKERS,
+        skip_unchanged: bool = True,
+    ) -> ImportReport:
+        """
+        Copy a directory tree into the asset directory, keeping relative paths.
+        Files are copied atomically in parallel, and with `skip_unchanged`, files
+        already present with the same size and modification time are skipped.
+        Returns a report of copied, unchanged, and failed destination paths. Only
+        supported on the local filesystem.
+        """
+        if not self._is_local:
+            raise SidematterError(
+                f"Asset import is only supported on the local filesystem: {self.fs}"
+            )
+        if self._layout_state() is not None:
+            raise SidematterError(
+                f"Asset import is only supported for flat asset layouts: {self.assets_dir}"
+            )
+        report = import_assets(
+            src_dir, self.assets_dir, glob=glob, workers=workers, skip_unchanged=skip_unchanged
+        )
+        if isinstance(self.fs, LocalFS) and self.fs.sidecar_cache is not None:
+            self.fs.sidecar_cache.invalidate(self.assets_dir.parent)
+        return report
+
 
 @dataclass(frozen=True)
 class ResolvedSidematter:
@@ -271,10 +835,9 @@ class ResolvedSidematter:
         new_meta_path = None
         if self.meta_path is not None:
             # Preserve the metadata format from the original
-            if self.meta_path.name.endswith(JSON_SUFFIX):
-                new_meta_path = new_sm.meta_json_path
-            elif self.meta_path.name.endswith(YAML_SUFFIX):
-                new_meta_path = new_sm.meta_yaml_path
+            fmt = meta_format_for_path(self.meta_path)
+            if fmt is not None:
+                new_meta_path = new_sm.meta_path_for(fmt)
             else:
                 # Fallback: preserve whatever suffix the source has
                 new_meta_path = new_primary.with_suffix(self.meta_path.suffix)
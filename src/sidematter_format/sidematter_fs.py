@@ -0,0 +1,421 @@
+"""
+Filesystems that sidematter can be read from: the local filesystem, zip and tar
+archives read in place without extraction, or an in-memory filesystem (see
+`memory_fs`). The local and in-memory filesystems can also be written.
+
+Archive backends read the archive's index once (the central directory of a zip, or a
+single pass over the headers of a tar) and cache it, keyed by the archive's path,
+modification time, and size, so repeated lookups in the same archive are dictionary
+lookups. Members of zip and uncompressed tar archives are read by seeking directly to
+their data.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import IO, Protocol, TypeVar, runtime_checkable
+
+from strif import atomic_output_file, copyfile_atomic
+
+from sidematter_format.asset_listing import AssetEntry, iter_assets
+from sidematter_format.sidecar_cache import SidecarCache
+
+T = TypeVar("T")
+
+ARCHIVE_CACHE_SIZE = 32
+"""Maximum number of archive indexes kept open and cached."""
+
+
+@runtime_checkable
+class SidematterFS(Protocol):
+    """
+    The read operations sidematter needs from a filesystem. Paths are relative to the
+    root of the filesystem (for archives) or ordinary local paths.
+    """
+
+    def exists(self, path: Path) -> bool: ...
+
+    def is_dir(self, path: Path) -> bool: ...
+
+    def read_bytes(self, path: Path) -> bytes: ...
+
+    def open_read(self, path: Path) -> IO[bytes]: ...
+
+    def iter_files(self, path: Path) -> Iterator[AssetEntry]:
+        """Yield every file under the directory `path`, with names relative to it."""
+        ...
+
+
+@runtime_checkable
+class WritableFS(SidematterFS, Protocol):
+    """
+    The operations needed to write, copy, move, and remove sidematter.
+    """
+
+    def write_bytes(self, path: Path, data: bytes, *, make_parents: bool = True) -> None:
+        """Write a file atomically."""
+        ...
+
+    def append_bytes(self, path: Path, data: bytes) -> int:
+        """Append to a file, creating it if needed, and return its new size."""
+        ...
+
+    def mkdir(self, path: Path) -> None:
+        """Create a directory and its parents, if they don't exist."""
+        ...
+
+    def unlink(self, path: Path) -> None:
+        """Remove a file, if it exists."""
+        ...
+
+    def rmtree(self, path: Path) -> None:
+        """Remove a directory and everything in it, if it exists."""
+        ...
+
+    def rename(self, src: Path, dest: Path) -> None:
+        """Move a file or directory."""
+        ...
+
+    def copy_file(self, src: Path, dest: Path, *, make_parents: bool = True) -> None:
+        """Copy a file atomically."""
+        ...
+
+    def copy_tree(self, src: Path, dest: Path) -> None:
+        """Copy a directory recursively, merging into `dest` if it exists."""
+        ...
+
+
+class LocalFS:
+    """
+    The local filesystem. With a `SidecarCache`, checks for whether sidecars exist are
+    answered from per-directory listings instead of a `stat()` each.
+    """
+
+    def __init__(self, sidecar_cache: SidecarCache | None = None):
+        self.sidecar_cache: SidecarCache | None = sidecar_cache
+
+    def _changed(self, *paths: Path, tree: bool = False) -> None:
+        # Parent directories may have been created too, and with `tree`, directories
+        # within the paths were also changed.
+        if self.sidecar_cache is not None:
+            for path in paths:
+                for parent in path.parents:
+                    self.sidecar_cache.invalidate(parent)
+                if tree:
+                    self.sidecar_cache.invalidate(path, recursive=True)
+
+    def exists(self, path: Path) -> bool:
+        if self.sidecar_cache is not None:
+            found = self.sidecar_cache.lookup(path)
+            if found is not None:
+                return found
+        return path.exists()
+
+    def is_dir(self, path: Path) -> bool:
+        if self.sidecar_cache is not None:
+            found = self.sidecar_cache.lookup_dir(path)
+            if found is not None:
+                return found
+        return path.is_dir()
+
+    def read_bytes(self, path: Path) -> bytes:
+        return path.read_bytes()
+
+    def open_read(self, path: Path) -> IO[bytes]:
+        return open(path, "rb")
+
+    def iter_files(self, path: Path) -> Iterator[AssetEntry]:
+        return iter_assets(path)
+
+    def write_bytes(self, path: Path, data: bytes, *, make_parents: bool = True) -> None:
+        with atomic_output_file(path, make_parents=make_parents) as tmp_path:
+            tmp_path.write_bytes(data)
+        self._changed(path)
+
+    def append_bytes(self, path: Path, data: bytes) -> int:
+        # A single write to a file opened for appending, so concurrent appends of
+        # small entries aren't interleaved.
+        fd = os.open(
+            path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666
+        )
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        self._changed(path)
+        return size
+
+    def mkdir(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        self._changed(path)
+
+    def unlink(self, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        self._changed(path)
+
+    def rmtree(self, path: Path) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+        self._changed(path, tree=True)
+
+    def rename(self, src: Path, dest: Path) -> None:
+        shutil.move(src, dest)
+        self._changed(src, dest, tree=True)
+
+    def copy_file(self, src: Path, dest: Path, *, make_parents: bool = True) -> None:
+        copyfile_atomic(src, dest, make_parents=make_parents)
+        self._changed(dest)
+
+    def copy_tree(self, src: Path, dest: Path) -> None:
+        shutil.copytree(src, dest, dirs_exist_ok=True)
+        self._changed(dest, tree=True)
+
+
+LOCAL_FS = LocalFS()
+
+
+## Archive indexes
+
+
+def member_name(path: str | Path) -> str:
+    """
+    Normalize a path to the form of a member name in an archive, e.g. "docs/a.md".
+    """
+    name = PurePosixPath(path).as_posix().lstrip("/")
+    while name.startswith("./"):
+        name = name[2:]
+    return "" if name == "." else name.rstrip("/")
+
+
+@dataclass
+class ArchiveIndex:
+    """
+    Index of the files and directories in an archive, and an open handle for reading.
+    """
+
+    files: dict[str, AssetEntry]
+    """Files by member name. Entry names are full member names."""
+
+    dirs: set[str]
+    """All directories, including ones implied by file paths. The root is ""."""
+
+    read: Callable[[str], bytes]
+    open: Callable[[str], IO[bytes]]
+    close_handle: Callable[[], None]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    closed: bool = False
+
+    def close(self) -> None:
+        """
+        Close the archive handle, waiting for any read in progress. Streams already
+        opened from a zip stay readable.
+        """
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.close_handle()
+
+
+def _add_parents(dirs: set[str], name: str) -> None:
+    while name:
+        name = name.rpartition("/")[0]
+        if name in dirs:
+            return
+        dirs.add(name)
+
+
+def _index_zip(path: Path) -> ArchiveIndex:
+    zf = zipfile.ZipFile(path)
+    files: dict[str, AssetEntry] = {}
+    dirs: set[str] = {""}
+    infos: dict[str, zipfile.ZipInfo] = {}
+    for info in zf.infolist():
+        name = member_name(info.filename)
+        if info.is_dir():
+            dirs.add(name)
+        else:
+            mtime_ns = int(time.mktime((*info.date_time, 0, 0, -1))) * 1_000_000_000
+            files[name] = AssetEntry(name, info.file_size, mtime_ns)
+            infos[name] = info
+        _add_parents(dirs, name)
+
+    def open_member(name: str) -> IO[bytes]:
+        return zf.open(infos[name])
+
+    def read_member(name: str) -> bytes:
+        return zf.read(infos[name])
+
+    return ArchiveIndex(files, dirs, read_member, open_member, zf.close)
+
+
+def _index_tar(path: Path) -> ArchiveIndex:
+    tf = tarfile.open(path, "r:*")
+    files: dict[str, AssetEntry] = {}
+    dirs: set[str] = {""}
+    members: dict[str, tarfile.TarInfo] = {}
+    for info in tf.getmembers():
+        name = member_name(info.name)
+        if info.isdir():
+            dirs.add(name)
+        elif info.isfile():
+            files[name] = AssetEntry(name, info.size, int(info.mtime) * 1_000_000_000)
+            members[name] = info
+        else:
+            continue
+        _add_parents(dirs, name)
+
+    def read_member(name: str) -> bytes:
+        f = tf.extractfile(members[name])
+        assert f is not None
+        return f.read()
+
+    def open_member(name: str) -> IO[bytes]:
+        # A tar has one shared stream, so members are read fully rather than streamed.
+        return io.BytesIO(read_member(name))
+
+    return ArchiveIndex(files, dirs, read_member, open_member, tf.close)
+
+
+_archive_cache: OrderedDict[tuple[str, int, int], ArchiveIndex] = OrderedDict()
+_archive_cache_lock = threading.Lock()
+
+
+def archive_index(path: str | Path, indexer: Callable[[Path], ArchiveIndex]) -> ArchiveIndex:
+    """
+    The cached index of an archive, rebuilt if the archive's modification time or size
+    has changed. Indexes of older versions of the archive, and ones evicted from the
+    cache, are closed (after any read in progress), and readers of them switch to the
+    current index.
+    """
+    path = Path(path).absolute()
+    st = os.stat(path)
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _archive_cache_lock:
+        index = _archive_cache.get(key)
+        if index is not None:
+            _archive_cache.move_to_end(key)
+            return index
+    index = indexer(path)
+    stale: list[ArchiveIndex] = []
+    with _archive_cache_lock:
+        existing = _archive_cache.get(key)
+        if existing is not None:
+            # Indexed concurrently by another thread.
+            stale.append(index)
+            index = existing
+        else:
+            for old_key in [k for k in _archive_cache if k[0] == key[0]]:
+                stale.append(_archive_cache.pop(old_key))
+            _archive_cache[key] = index
+            while len(_archive_cache) > ARCHIVE_CACHE_SIZE:
+                stale.append(_archive_cache.popitem(last=False)[1])
+    for old in stale:
+        old.close()
+    return index
+
+
+def clear_archive_cache() -> None:
+    """
+    Forget and close all cached archive indexes.
+    """
+    with _archive_cache_lock:
+        indexes = list(_archive_cache.values())
+        _archive_cache.clear()
+    for index in indexes:
+        index.close()
+
+
+## Archive filesystems
+
+
+class ArchiveFS:
+    """
+    Read-only view of an archive. Use `ZipFS`, `TarFS`, or `archive_fs()`.
+    """
+
+    def __init__(self, archive_path: str | Path, indexer: Callable[[Path], ArchiveIndex]):
+        self.archive_path: Path = Path(archive_path)
+        self._indexer: Callable[[Path], ArchiveIndex] = indexer
+
+    def index(self) -> ArchiveIndex:
+        return archive_index(self.archive_path, self._indexer)
+
+    def exists(self, path: Path) -> bool:
+        name = member_name(path)
+        index = self.index()
+        return name in index.files or name in index.dirs
+
+    def is_dir(self, path: Path) -> bool:
+        return member_name(path) in self.index().dirs
+
+    def _with_member(self, path: Path, fn: Callable[[ArchiveIndex, str], T]) -> T:
+        name = member_name(path)
+        while True:
+            index = self.index()
+            if name not in index.files:
+                raise FileNotFoundError(f"Not found in archive {self.archive_path}: {name}")
+            with index.lock:
+                # Closed if the archive changed or the index was evicted meanwhile.
+                if not index.closed:
+                    return fn(index, name)
+
+    def read_bytes(self, path: Path) -> bytes:
+        return self._with_member(path, lambda index, name: index.read(name))
+
+    def open_read(self, path: Path) -> IO[bytes]:
+        return self._with_member(path, lambda index, name: index.open(name))
+
+    def iter_files(self, path: Path) -> Iterator[AssetEntry]:
+        prefix = member_name(path)
+        index = self.index()
+        if prefix not in index.dirs:
+            return
+        prefix = f"{prefix}/" if prefix else ""
+        for name, entry in index.files.items():
+            if name.startswith(prefix):
+                yield AssetEntry(name[len(prefix) :], entry.size, entry.mtime_ns)
+
+
+class ZipFS(ArchiveFS):
+    """
+    Read-only view of a zip archive, using its central directory for random access.
+    """
+
+    def __init__(self, archive_path: str | Path):
+        super().__init__(archive_path, _index_zip)
+
+
+class TarFS(ArchiveFS):
+    """
+    Read-only view of a tar archive (optionally compressed). The index is built in one
+    pass. Members of uncompressed tars are read by seeking. Compressed tars can't seek,
+    so every member read decompresses the archive again from the start up to that
+    member, and nothing decompressed is kept; for repeated random access, use a zip or
+    an uncompressed tar.
+    """
+
+    def __init__(self, archive_path: str | Path):
+        super().__init__(archive_path, _index_tar)
+
+
+def archive_fs(archive_path: str | Path) -> ArchiveFS:
+    """
+    A `ZipFS` or `TarFS` for an archive, depending on its contents.
+    """
+    if zipfile.is_zipfile(archive_path):
+        return ZipFS(archive_path)
+    if tarfile.is_tarfile(archive_path):
+        return TarFS(archive_path)
+    raise ValueError(f"Not a zip or tar archive: {archive_path}")
@@ -4,12 +4,31 @@ Utilities for handling files with sidematter (metadata and assets).
 
 from __future__ import annotations
 
-import shutil
 from pathlib import Path
 
-from strif import copyfile_atomic
-
+from sidematter_format.asset_listing import listing_cache_path
+from sidematter_format.compiled_marker import compiled_marker_path
+from sidematter_format.cross_device_move import is_cross_device, move_across_devices
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS
+from sidematter_format.meta_formats import meta_formats
 from sidematter_format.sidematter_format import ResolvedSidematter, Sidematter
+from sidematter_format.sidematter_fs import LOCAL_FS, LocalFS, SidematterFS, WritableFS
+
+
+def _meta_files(src: Path, dest: Path, fs: SidematterFS) -> list[tuple[Path, Path]]:
+    """
+    Every metadata file present for `src` (sidecars in all formats, such as a YAML
+    sidecar and the JSON compiled from it with its marker, the metadata log, and the
+    assets listing cache), each paired with its path for `dest`.
+    """
+    src_sm, dest_sm = Sidematter(src), Sidematter(dest)
+    pairs = [(src_sm.meta_path_for(fmt), dest_sm.meta_path_for(fmt)) for fmt in meta_formats()]
+    pairs.append((src_sm.meta_log_path, dest_sm.meta_log_path))
+    pairs.append(
+        (compiled_marker_path(src_sm.meta_json_path), compiled_marker_path(dest_sm.meta_json_path))
+    )
+    pairs.append((listing_cache_path(src_sm.assets_dir), listing_cache_path(dest_sm.assets_dir)))
+    return [(src_item, dest_item) for src_item, dest_item in pairs if fs.exists(src_item)]
 
 
 def copy_sidematter(
@@ -20,34 +39,46 @@ def copy_sidematter(
     copy_original: bool = True,
     copy_assets: bool = True,
     copy_metadata: bool = True,
+    fs: WritableFS | None = None,
 ) -> ResolvedSidematter:
     """
-    Copy a file with its sidematter files (metadata and assets).
+    Copy a file with its sidematter files (metadata in every format present, including
+    any metadata log, and assets).
 
     By default copies the file and all its sidematter. Use the boolean
-    flags to selectively copy only certain components.
+    flags to selectively copy only certain components. With `fs`, both paths
+    are on that filesystem (such as a `MemoryFS`) instead of the local one.
 
     Returns the resolved target Sidematter to indicate what was actually copied.
     """
     src = Path(src_path)
     dest = Path(dest_path)
 
-    src_paths = Sidematter(src).resolve(parse_meta=False)
+    wfs = LOCAL_FS if fs is None else fs
+
+    if copy_metadata:
+        # Pending write-behind metadata is copied too, and the copy replaces any pending
+        # at the destination.
+        Sidematter(src, fs=fs).flush_pending_meta()
+        Sidematter(dest, fs=fs).discard_pending_meta()
+
+    src_paths = Sidematter(src, fs=fs).resolve(parse_meta=False)
     dest_paths = src_paths.renamed_as(dest)
 
-    if copy_metadata and src_paths.meta_path is not None and dest_paths.meta_path is not None:
-        copyfile_atomic(src_paths.meta_path, dest_paths.meta_path, make_parents=make_parents)
+    if copy_metadata:
+        for src_item, dest_item in _meta_files(src, dest, wfs):
+            wfs.copy_file(src_item, dest_item, make_parents=make_parents)
 
     if copy_assets and src_paths.assets_dir is not None and dest_paths.assets_dir is not None:
         if make_parents:
-            dest_paths.assets_dir.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(src_paths.assets_dir, dest_paths.assets_dir, dirs_exist_ok=True)
+            wfs.mkdir(dest_paths.assets_dir.parent)
+        wfs.copy_tree(src_paths.assets_dir, dest_paths.assets_dir)
 
     if copy_original:
-        copyfile_atomic(src, dest, make_parents=make_parents)
+        wfs.copy_file(src, dest, make_parents=make_parents)
 
     # Return the resolved target Sidematter to show what was actually copied
-    return Sidematter(dest).resolve(parse_meta=False)
+    return Sidematter(dest, fs=fs).resolve(parse_meta=False)
 
 
 def move_sidematter(
@@ -58,48 +89,77 @@ def move_sidematter(
     move_original: bool = True,
     move_assets: bool = True,
     move_metadata: bool = True,
+    workers: int = DEFAULT_COPY_WORKERS,
+    fs: WritableFS | None = None,
 ) -> ResolvedSidematter:
     """
-    Move a file with its sidematter files (metadata and assets).
+    Move a file with its sidematter files (metadata in every format present, including
+    any metadata log, and assets).
 
     By default moves the file and all its sidematter. Use the boolean
     flags to selectively move only certain components.
 
+    Moves across filesystems are detected up front and done as one journaled unit:
+    everything is copied in parallel (on `workers` threads) and flushed to disk before
+    any source is deleted. See `recover_moves()` for recovering from an interrupted move.
+
+    With `fs`, both paths are on that filesystem (such as a `MemoryFS`). Other than on
+    the local filesystem, each item is simply renamed.
+
     Returns the resolved target Sidematter to indicate what was actually moved.
     """
     src = Path(src_path)
     dest = Path(dest_path)
 
-    src_paths = Sidematter(src).resolve(parse_meta=False)
+    wfs = LOCAL_FS if fs is None else fs
+
+    if move_metadata:
+        # Otherwise pending write-behind metadata would be written to the source later.
+        Sidematter(src, fs=fs).flush_pending_meta()
+        Sidematter(dest, fs=fs).discard_pending_meta()
+
+    src_paths = Sidematter(src, fs=fs).resolve(parse_meta=False)
     dest_paths = src_paths.renamed_as(dest)
 
     if make_parents:
-        dest.parent.mkdir(parents=True, exist_ok=True)
+        wfs.mkdir(dest.parent)
 
-    if move_metadata and src_paths.meta_path is not None and dest_paths.meta_path is not None:
-        shutil.move(src_paths.meta_path, dest_paths.meta_path)
+    pairs: list[tuple[Path, Path]] = []
+    if move_metadata:
+        pairs += _meta_files(src, dest, wfs)
 
     if move_assets and src_paths.assets_dir is not None and dest_paths.assets_dir is not None:
-        shutil.move(src_paths.assets_dir, dest_paths.assets_dir)
+        pairs.append((src_paths.assets_dir, dest_paths.assets_dir))
 
     if move_original:
-        shutil.move(src, dest)
+        pairs.append((src, dest))
+
+    if isinstance(wfs, LocalFS) and pairs and is_cross_device(src, dest):
+        move_across_devices(pairs, journal_dir=dest.parent, workers=workers)
+        if wfs.sidecar_cache is not None:
+            wfs.sidecar_cache.invalidate()
+    else:
+        for src_item, dest_item in pairs:
+            wfs.rename(src_item, dest_item)
 
     # Return the resolved target Sidematter to show what was actually moved
-    return Sidematter(dest).resolve(parse_meta=False)
+    return Sidematter(dest, fs=fs).resolve(parse_meta=False)
 
 
-def remove_sidematter(file_path: str | Path) -> None:
+def remove_sidematter(file_path: str | Path, *, fs: WritableFS | None = None) -> None:
     """
-    Remove a file with its sidematter files (metadata and assets).
+    Remove a file with its sidematter files (metadata in every format present, including
+    any metadata log, and assets), on the local filesystem or on `fs`.
     """
     path = Path(file_path)
-    sidematter = Sidematter(path).resolve(parse_meta=False)
+    Sidematter(path, fs=fs).discard_pending_meta()
+    sidematter = Sidematter(path, fs=fs).resolve(parse_meta=False)
 
-    if sidematter.meta_path is not None:
-        sidematter.meta_path.unlink(missing_ok=True)
+    wfs = LOCAL_FS if fs is None else fs
+    for meta_path, _ in _meta_files(path, path, wfs):
+        wfs.unlink(meta_path)
 
     if sidematter.assets_dir is not None:
-        shutil.rmtree(sidematter.assets_dir, ignore_errors=True)
+        wfs.rmtree(sidematter.assets_dir)
 
-    path.unlink(missing_ok=True)
+    wfs.unlink(path)
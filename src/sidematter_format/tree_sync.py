@@ -0,0 +1,235 @@
+"""
+Incremental sync of one tree of documents to another, keeping each document and its
+sidematter together.
+
+A unit is a primary document with every file of its sidematter: metadata in any
+format, the metadata log, and the files of its assets directory. Both trees are listed
+once (one `scandir` per directory), and a unit is copied only if the size or
+modification time of any of its files differs, or, with `checksum`, its contents.
+Within a unit only changed files are copied, atomically and with the primary last, as
+`copy_sidematter()` does, so a reader never sees a new primary with old sidematter.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+from strif import new_uid
+
+from sidematter_format.asset_listing import iter_assets
+from sidematter_format.asset_store import hash_file
+from sidematter_format.file_copy import DEFAULT_COPY_WORKERS, copy_file_fast
+from sidematter_format.orphans import sidecar_stem, sidecar_suffixes
+from sidematter_format.sidematter_format import ASSETS_SUFFIX
+
+FileSig = tuple[int, int]
+"""Size and modification time (in nanoseconds) of a file."""
+
+_Outcome = Literal["added", "changed", "unchanged"]
+
+
+@dataclass(frozen=True)
+class _Unit:
+    primary: str
+    """Path of the primary, relative to the root, with "/" separators."""
+
+    files: dict[str, FileSig]
+    """Every file of the unit, including the primary, by path relative to the root."""
+
+    @property
+    def dir(self) -> str:
+        return os.path.dirname(self.primary)
+
+    @property
+    def stem(self) -> str:
+        return Path(self.primary).stem
+
+    @property
+    def assets_dir(self) -> str:
+        return os.path.join(self.dir, f"{self.stem}.{ASSETS_SUFFIX}")
+
+
+@dataclass
+class SyncReport:
+    """
+    What `sync_tree()` did (or, for a dry run, would do), listing primary documents by
+    path relative to the roots.
+    """
+
+    added: list[Path] = field(default_factory=list)
+    changed: list[Path] = field(default_factory=list)
+    deleted: list[Path] = field(default_factory=list)
+    unchanged: int = 0
+    bytes_copied: int = 0
+    """Size of the files copied (or, for a dry run, to copy)."""
+
+    errors: dict[Path, str] = field(default_factory=dict)
+
+
+def _scan_units(root: Path) -> dict[str, _Unit]:
+    """
+    Every unit under `root`, walking directories (but not symlinks to them) and
+    listing each once. Sidecars with no primary aren't part of any unit.
+    """
+    file_suffixes = sidecar_suffixes()
+    units: dict[str, _Unit] = {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        primaries: dict[str, FileSig] = {}
+        sidecars: dict[str, dict[str, FileSig]] = {}
+        try:
+            with os.scandir(root / rel_dir) as it:
+                entries = list(it)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            stem = sidecar_stem(entry.name, is_dir, file_suffixes)
+            rel = prefix + entry.name
+            if is_dir and stem is not None:
+                files = sidecars.setdefault(stem, {})
+                for asset in iter_assets(root / rel):
+                    files[f"{rel}/{asset.name}"] = (asset.size, asset.mtime_ns)
+            elif is_dir:
+                stack.append(rel)
+            elif entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                if stem is not None:
+                    sidecars.setdefault(stem, {})[rel] = (st.st_size, st.st_mtime_ns)
+                else:
+                    primaries[rel] = (st.st_size, st.st_mtime_ns)
+        for rel, sig in primaries.items():
+            units[rel] = _Unit(rel, {rel: sig, **sidecars.get(Path(rel).stem, {})})
+    return units
+
+
+def _copy_atomic(src: Path, dest: Path) -> None:
+    """
+    Copy a file atomically, keeping its modification time.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{new_uid()}.partial")
+    try:
+        copy_file_fast(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _prune_empty_dirs(path: Path, stop: Path) -> None:
+    """
+    Remove `path` and its parents, up to but not including `stop`, while empty.
+    """
+    while path != stop and stop in path.parents:
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+def sync_tree(
+    src_root: str | Path,
+    dst_root: str | Path,
+    *,
+    workers: int = DEFAULT_COPY_WORKERS,
+    delete: bool = False,
+    dry_run: bool = False,
+    checksum: bool = False,
+) -> SyncReport:
+    """
+    Make the documents under the local directory `dst_root` match those under
+    `src_root`, copying only units (a primary with all its sidematter) that changed,
+    one unit per task on a pool of `workers` threads.
+
+    Files are compared by size and modification time, or with `checksum`, by size and
+    content hash. Sidematter files at the destination that no longer exist at the
+    source are removed. With `delete`, units only at the destination are removed too.
+    With `dry_run`, nothing is changed and the report lists what would be. Errors are
+    recorded per unit in the report.
+    """
+    src_root = Path(src_root)
+    dst_root = Path(dst_root)
+    if not src_root.is_dir():
+        raise ValueError(f"Sync source is not a directory: {src_root!r}")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        src_scan = pool.submit(_scan_units, src_root)
+        dst_units = _scan_units(dst_root)
+        src_units = src_scan.result()
+
+    def differs(rel: str, src_sig: FileSig, dst_sig: FileSig | None) -> bool:
+        if dst_sig is None or src_sig[0] != dst_sig[0]:
+            return True
+        if checksum:
+            return hash_file(src_root / rel) != hash_file(dst_root / rel)
+        return src_sig[1] != dst_sig[1]
+
+    def sync_unit(unit: _Unit) -> tuple[_Outcome, int]:
+        dst_unit = dst_units.get(unit.primary)
+        dst_files = dst_unit.files if dst_unit else {}
+        stale = [rel for rel in dst_files if rel not in unit.files]
+        # The primary goes last, so its sidematter is in place before it changes.
+        sidematter = [rel for rel in unit.files if rel != unit.primary]
+        copies = [
+            rel
+            for rel in [*sidematter, unit.primary]
+            if differs(rel, unit.files[rel], dst_files.get(rel))
+        ]
+        if not stale and not copies:
+            return "unchanged", 0
+        if not dry_run:
+            for rel in stale:
+                (dst_root / rel).unlink(missing_ok=True)
+                _prune_empty_dirs((dst_root / rel).parent, dst_root / unit.dir)
+            for rel in copies:
+                _copy_atomic(src_root / rel, dst_root / rel)
+        return ("changed" if dst_unit else "added"), sum(unit.files[rel][0] for rel in copies)
+
+    # Sidematter at the destination is shared by primaries with the same stem, so it is
+    # only removed with a primary if no primary at the source claims it.
+    claimed = {(unit.dir, unit.stem) for unit in src_units.values()}
+
+    def delete_unit(unit: _Unit) -> None:
+        if dry_run:
+            return
+        (dst_root / unit.primary).unlink(missing_ok=True)
+        if (unit.dir, unit.stem) in claimed:
+            return
+        assets_prefix = f"{unit.assets_dir}/"
+        for rel in unit.files:
+            if not rel.startswith(assets_prefix):
+                (dst_root / rel).unlink(missing_ok=True)
+        shutil.rmtree(dst_root / unit.assets_dir, ignore_errors=True)
+
+    report = SyncReport()
+    extra = [unit for rel, unit in dst_units.items() if delete and rel not in src_units]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        synced = {Path(rel): pool.submit(sync_unit, unit) for rel, unit in src_units.items()}
+        deleted = {Path(unit.primary): pool.submit(delete_unit, unit) for unit in extra}
+        for path, future in synced.items():
+            try:
+                outcome, size = future.result()
+            except OSError as e:
+                report.errors[path] = str(e)
+                continue
+            if outcome == "unchanged":
+                report.unchanged += 1
+            else:
+                (report.added if outcome == "added" else report.changed).append(path)
+                report.bytes_copied += size
+        for path, future in deleted.items():
+            try:
+                future.result()
+                report.deleted.append(path)
+            except OSError as e:
+                report.errors[path] = str(e)
+    return report
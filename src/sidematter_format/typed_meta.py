@@ -0,0 +1,483 @@
+"""
+Decoding metadata into typed models, such as (slotted) dataclasses, and encoding them
+back to metadata.
+
+Each model type is compiled once into a decoder that checks and converts each field
+by its annotation and constructs the model directly from the parsed metadata. Other
+model types (e.g. Pydantic models) can be supported with `register_model_type()`.
+Errors give the key path of the value that failed, e.g. `history[2].version`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import threading
+import types
+import typing
+from collections.abc import Callable, Mapping, MutableMapping, MutableSequence, Sequence
+from collections.abc import Set as AbstractSet
+from datetime import date, datetime, time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Literal, TypeVar, cast
+
+T = TypeVar("T")
+
+KeyPath = tuple[str | int, ...]
+
+Decoder = Callable[[Any, KeyPath], Any]
+"""Converts a parsed value at a key path to a typed value, or raises `MetaValidationError`."""
+
+
+class MetaValidationError(ValueError):
+    """
+    Raised when metadata doesn't match a model type. `key_path` is the path to the
+    failing value from the top of the metadata.
+    """
+
+    def __init__(self, key_path: KeyPath, message: str):
+        self.key_path: KeyPath = key_path
+        self.message: str = message
+        super().__init__(f"{format_key_path(key_path)}: {message}")
+
+
+def format_key_path(key_path: KeyPath) -> str:
+    """
+    Format a key path like `history[2].version`, or `<root>` for the top level.
+    """
+    out = ""
+    for key in key_path:
+        out += f"[{key}]" if isinstance(key, int) else (f".{key}" if out else key)
+    return out or "<root>"
+
+
+@dataclasses.dataclass(frozen=True)
+class _ModelType:
+    decode: Callable[[Any], Any]
+    encode: Callable[[Any], Any]
+
+
+_model_types: dict[type[Any], _ModelType] = {}
+
+_decoders: dict[Any, Decoder] = {}
+"""Compiled decoder for each type (or type annotation) seen so far."""
+
+_compiling: dict[Any, Decoder] = {}
+"""
+Decoders of the compilation in progress, including placeholders for unfinished ones,
+which decoders compiled meanwhile may refer to. Only used by the thread holding
+`_lock`, and published to `_decoders` once the outermost compilation completes.
+"""
+
+_field_names: dict[type[Any], tuple[str, ...]] = {}
+
+# Guards registration and compilation, so a decoder compiled before a registration is
+# never cached after it. Cached lookups don't lock.
+_lock = threading.RLock()
+
+_UNION_ORIGINS: tuple[Any, ...] = (typing.Union, types.UnionType)  # pyright: ignore[reportDeprecated]
+
+
+def register_model_type(
+    cls: type[T], *, decode: Callable[[Any], T], encode: Callable[[T], Any]
+) -> None:
+    """
+    Register a model type (and its subclasses) that isn't a dataclass, with functions
+    to build it from plain metadata and to convert it back. For example, for Pydantic:
+    `register_model_type(Model, decode=Model.model_validate, encode=Model.model_dump)`.
+    """
+    with _lock:
+        _model_types[cls] = _ModelType(decode, encode)
+        _decoders.clear()
+
+
+def _registered(cls: type[Any]) -> _ModelType | None:
+    for base in cls.__mro__:
+        model_type = _model_types.get(base)
+        if model_type is not None:
+            return model_type
+    return None
+
+
+def _type_name(value: Any) -> str:
+    return type(value).__name__
+
+
+## Decoding
+
+
+def _expect(expected: type[Any], name: str) -> Decoder:
+    # bool is an int subclass, but True isn't a valid int.
+    reject_bool = expected is not bool
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if isinstance(value, expected) and not (reject_bool and isinstance(value, bool)):
+            return value
+        raise MetaValidationError(key_path, f"expected {name}, got {_type_name(value)}")
+
+    return decode
+
+
+def _decode_float(value: Any, key_path: KeyPath) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    raise MetaValidationError(key_path, f"expected float, got {_type_name(value)}")
+
+
+def _decode_none(value: Any, key_path: KeyPath) -> None:
+    if value is not None:
+        raise MetaValidationError(key_path, f"expected null, got {_type_name(value)}")
+
+
+def _decode_any(value: Any, _key_path: KeyPath) -> Any:
+    return value
+
+
+def _from_iso(cls: type[Any], name: str) -> Decoder:
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        # YAML parses unquoted dates and timestamps itself.
+        if type(value) is cls or (cls is datetime and isinstance(value, datetime)):
+            return value
+        if isinstance(value, str):
+            # Python 3.10 doesn't accept a trailing Z.
+            text = value[:-1] + "+00:00" if value.endswith("Z") else value
+            try:
+                return cls.fromisoformat(text)
+            except ValueError:
+                pass
+        raise MetaValidationError(key_path, f"expected ISO {name}, got {value!r}")
+
+    return decode
+
+
+def _decode_path(value: Any, key_path: KeyPath) -> Path:
+    if isinstance(value, str):
+        return Path(value)
+    raise MetaValidationError(key_path, f"expected path string, got {_type_name(value)}")
+
+
+def _enum_decoder(cls: type[Enum]) -> Decoder:
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        try:
+            return cls(value)
+        except ValueError:
+            choices = ", ".join(repr(m.value) for m in cls)
+            raise MetaValidationError(
+                key_path, f"expected one of {choices}, got {value!r}"
+            ) from None
+
+    return decode
+
+
+def _literal_decoder(choices: tuple[Any, ...]) -> Decoder:
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        for choice in choices:
+            if value == choice and type(value) is type(choice):
+                return value
+        raise MetaValidationError(
+            key_path, f"expected one of {', '.join(map(repr, choices))}, got {value!r}"
+        )
+
+    return decode
+
+
+def _union_decoder(options: tuple[Any, ...]) -> Decoder:
+    optional = type(None) in options
+    decoders = [get_decoder(t) for t in options if t is not type(None)]
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if value is None and optional:
+            return None
+        errors: list[MetaValidationError] = []
+        for decoder in decoders:
+            try:
+                return decoder(value, key_path)
+            except MetaValidationError as e:
+                errors.append(e)
+        if not errors:
+            raise MetaValidationError(key_path, f"expected null, got {_type_name(value)}")
+        # Report the error from the option that got furthest into the value.
+        deepest = max(errors, key=lambda e: len(e.key_path))
+        if len(errors) == 1 or len(deepest.key_path) > len(key_path):
+            raise deepest
+        raise MetaValidationError(key_path, " or ".join(e.message for e in errors))
+
+    return decode
+
+
+def _list_decoder(item_type: Any, build: Callable[[list[Any]], Any], name: str) -> Decoder:
+    decode_item = get_decoder(item_type)
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if not isinstance(value, (list, tuple)):
+            raise MetaValidationError(key_path, f"expected {name}, got {_type_name(value)}")
+        items = cast(list[Any], value)
+        return build([decode_item(item, (*key_path, i)) for i, item in enumerate(items)])
+
+    return decode
+
+
+def _tuple_decoder(item_types: tuple[Any, ...]) -> Decoder:
+    decoders = [get_decoder(t) for t in item_types]
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if not isinstance(value, (list, tuple)) or len(cast(list[Any], value)) != len(decoders):
+            raise MetaValidationError(
+                key_path, f"expected a list of {len(decoders)} items, got {value!r}"
+            )
+        items = cast(list[Any], value)
+        return tuple(
+            d(item, (*key_path, i)) for i, (d, item) in enumerate(zip(decoders, items, strict=True))
+        )
+
+    return decode
+
+
+def _dict_decoder(key_type: Any, value_type: Any) -> Decoder:
+    decode_key = get_decoder(key_type)
+    decode_value = get_decoder(value_type)
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if not isinstance(value, Mapping):
+            raise MetaValidationError(key_path, f"expected mapping, got {_type_name(value)}")
+        mapping = cast(Mapping[Any, Any], value)
+        return {
+            decode_key(k, key_path): decode_value(v, (*key_path, str(k)))
+            for k, v in mapping.items()
+        }
+
+    return decode
+
+
+@dataclasses.dataclass(frozen=True)
+class _FieldSpec:
+    name: str
+    decode: Decoder
+    has_default: bool
+    accepts_none: bool
+
+
+def _accepts_none(tp: Any) -> bool:
+    """
+    Whether None is valid for a type. YAML sidecars leave out None values, so a missing
+    key for such a field without a default is read as None.
+    """
+    if tp is Any or tp is object or tp is None or tp is type(None):
+        return True
+    origin = typing.get_origin(tp)
+    return origin in _UNION_ORIGINS and type(None) in typing.get_args(tp)
+
+
+def _dataclass_decoder(cls: type[Any]) -> Decoder:
+    hints = typing.get_type_hints(cls)
+    specs: list[_FieldSpec] = []
+    for f in dataclasses.fields(cls):
+        if not f.init:
+            continue
+        tp = hints.get(f.name, Any)
+        has_default = (
+            f.default is not dataclasses.MISSING or f.default_factory is not dataclasses.MISSING
+        )
+        specs.append(_FieldSpec(f.name, get_decoder(tp), has_default, _accepts_none(tp)))
+
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        if not isinstance(value, Mapping):
+            raise MetaValidationError(
+                key_path, f"expected mapping for {cls.__name__}, got {_type_name(value)}"
+            )
+        mapping = cast(Mapping[str, Any], value)
+        kwargs: dict[str, Any] = {}
+        for spec in specs:
+            if spec.name in mapping:
+                kwargs[spec.name] = spec.decode(mapping[spec.name], (*key_path, spec.name))
+            elif not spec.has_default:
+                if not spec.accepts_none:
+                    raise MetaValidationError((*key_path, spec.name), "missing required key")
+                kwargs[spec.name] = None
+        try:
+            return cls(**kwargs)
+        except (TypeError, ValueError) as e:
+            raise MetaValidationError(key_path, f"invalid {cls.__name__}: {e}") from e
+
+    return decode
+
+
+def _registered_decoder(cls: type[Any], model_type: _ModelType) -> Decoder:
+    def decode(value: Any, key_path: KeyPath) -> Any:
+        try:
+            return model_type.decode(value)
+        except MetaValidationError:
+            raise
+        except Exception as e:
+            raise MetaValidationError(key_path, f"invalid {cls.__name__}: {e}") from e
+
+    return decode
+
+
+def _compile(tp: Any) -> Decoder:
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+
+    if tp is Any or tp is object:
+        return _decode_any
+    if tp is None or tp is type(None):
+        return _decode_none
+    if origin is Literal:
+        return _literal_decoder(args)
+    if origin in _UNION_ORIGINS:
+        return _union_decoder(args)
+    if origin in (list, Sequence, MutableSequence):
+        return _list_decoder(args[0] if args else Any, list, "list")
+    if origin in (set, frozenset, AbstractSet):
+        build = frozenset if origin is frozenset else set
+        return _list_decoder(args[0] if args else Any, build, "list")
+    if origin is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            return _list_decoder(args[0], tuple, "list")
+        return _tuple_decoder(args) if args else _list_decoder(Any, tuple, "list")
+    if origin in (dict, Mapping, MutableMapping):
+        return _dict_decoder(*(args or (Any, Any)))
+    if origin is not None:
+        raise TypeError(f"Unsupported metadata type: {tp!r}")
+
+    if not isinstance(tp, type):
+        raise TypeError(f"Unsupported metadata type: {tp!r}")
+    cls = cast(type[Any], tp)
+    model_type = _registered(cls)
+    if model_type is not None:
+        return _registered_decoder(cls, model_type)
+    if dataclasses.is_dataclass(cls):
+        return _dataclass_decoder(cls)
+    if issubclass(cls, Enum):
+        return _enum_decoder(cls)
+    if cls is bool:
+        return _expect(bool, "bool")
+    if cls is int:
+        return _expect(int, "int")
+    if cls is float:
+        return _decode_float
+    if cls is str:
+        return _expect(str, "str")
+    if cls is datetime:
+        return _from_iso(datetime, "datetime")
+    if cls is date:
+        return _from_iso(date, "date")
+    if cls is time:
+        return _from_iso(time, "time")
+    if issubclass(cls, Path):
+        return _decode_path
+    if cls in (list, tuple, set, frozenset):
+        return _list_decoder(Any, cls, "list")
+    if cls is dict:
+        return _dict_decoder(Any, Any)
+    raise TypeError(f"Unsupported metadata type: {cls.__name__}")
+
+
+class _Deferred:
+    """
+    Stands in for a decoder while it is compiled, so recursive types work. Never
+    published to `_decoders` (or in a published decoder) before it's filled in.
+    """
+
+    def __init__(self) -> None:
+        self.decoder: Decoder | None = None
+
+    def __call__(self, value: Any, key_path: KeyPath) -> Any:
+        assert self.decoder is not None
+        return self.decoder(value, key_path)
+
+
+def get_decoder(tp: Any) -> Decoder:
+    """
+    The compiled decoder for a type annotation, compiled on first use and then cached.
+
+    Raises:
+        TypeError: If the type isn't supported.
+    """
+    try:
+        return _decoders[tp]
+    except KeyError:
+        pass
+    with _lock:
+        decoder = _decoders.get(tp) or _compiling.get(tp)
+        if decoder is not None:
+            return decoder
+        outermost = not _compiling
+        deferred = _Deferred()
+        _compiling[tp] = deferred
+        try:
+            deferred.decoder = _compile(tp)
+        except BaseException:
+            # Other decoders compiled meanwhile may refer to the failed one.
+            _compiling.clear()
+            raise
+        _compiling[tp] = deferred.decoder
+        if outermost:
+            # Every placeholder is filled in now, so the decoders can be shared.
+            _decoders.update(_compiling)
+            _compiling.clear()
+        return deferred.decoder
+
+
+def decode_model(model_type: type[T], meta: Any) -> T:
+    """
+    Build a model (such as a dataclass) from parsed metadata.
+
+    Raises:
+        MetaValidationError: If the metadata doesn't match the model.
+        TypeError: If the model type or one of its field types isn't supported.
+    """
+    return get_decoder(model_type)(meta, ())
+
+
+## Encoding
+
+
+def _fields_of(cls: type[Any]) -> tuple[str, ...]:
+    names = _field_names.get(cls)
+    if names is None:
+        names = _field_names[cls] = tuple(f.name for f in dataclasses.fields(cls))
+    return names
+
+
+def _to_plain(value: Any) -> Any:
+    cls = cast(type[Any], type(value))
+    if cls in (str, int, float, bool) or value is None:
+        return value
+    if cls is dict:
+        return {k: _to_plain(v) for k, v in cast(dict[Any, Any], value).items()}
+    if cls is list:
+        return [_to_plain(v) for v in cast(list[Any], value)]
+    if cls is tuple:
+        return tuple(_to_plain(v) for v in cast(tuple[Any, ...], value))
+    model_type = _registered(cls) if _model_types else None
+    if model_type is not None:
+        return _to_plain(model_type.encode(value))
+    if dataclasses.is_dataclass(value):
+        return {name: _to_plain(getattr(value, name)) for name in _fields_of(cls)}
+    # Enums, dates, paths, and other values are left to the JSON encoder and YAML
+    # representers, so they are written just as they are in a dict.
+    return value
+
+
+def encode_model(model: Any) -> dict[str, Any]:
+    """
+    Convert a model (a dataclass or registered model type) to metadata, with nested
+    models converted too. Dataclasses become a dict of their fields, as with
+    `json_conventions.json_default()`, so JSON output is the same as writing the model
+    directly.
+    """
+    data = _to_plain(model)
+    if not isinstance(data, dict):
+        raise TypeError(f"Model does not encode to a dict: {_type_name(model)}")
+    return cast(dict[str, Any], data)
+
+
+def is_model(value: Any) -> bool:
+    """
+    True if `value` is a dataclass instance or an instance of a registered model type.
+    """
+    cls = cast(type[Any], type(value))
+    return (dataclasses.is_dataclass(value) and not isinstance(value, type)) or (
+        bool(_model_types) and _registered(cls) is not None
+    )
@@ -0,0 +1,212 @@
+"""
+Write-behind for metadata that is written many times a second, such as progress or
+counters.
+
+With a `WriteBehind`, `Sidematter.write_meta()` only records the latest metadata of
+each document in memory, and repeated writes to the same document are coalesced into
+one write when the pending writes are flushed: every `interval` seconds on a
+background thread, when `max_dirty` documents are pending, on `flush()`, and at
+interpreter exit. Until then, `read_meta()` in the same process returns the pending
+metadata, encoded and decoded as it will be written, so it reads the same before and
+after the flush (tuples come back as lists, for example). Other changes to a
+document's metadata (such as `patch_meta()` or `delete_meta()`) flush its pending
+write first. Other processes see a write only once it is flushed.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import threading
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+DEFAULT_INTERVAL = 1.0
+
+DEFAULT_MAX_DIRTY = 1000
+
+
+@dataclass(frozen=True)
+class _Pending:
+    data: dict[str, Any]
+    write: Callable[[dict[str, Any]], Any]
+    read: Callable[[dict[str, Any]], dict[str, Any]]
+
+
+class WriteBehind:
+    """
+    Pending metadata writes, by document, flushed every `interval` seconds (or only
+    explicitly, if `interval` is None) and whenever `max_dirty` documents are pending.
+    Use it with `Sidematter(path, write_behind=...)`. Call `close()` (or use it as a
+    context manager) to flush and stop it; otherwise it is flushed at exit.
+    """
+
+    def __init__(
+        self, *, interval: float | None = DEFAULT_INTERVAL, max_dirty: int = DEFAULT_MAX_DIRTY
+    ):
+        self.interval: float | None = interval
+        self.max_dirty: int = max_dirty
+        self._pending: dict[Hashable, _Pending] = {}
+        self._flushing: dict[Hashable, _Pending] = {}
+        self._lock: threading.Lock = threading.Lock()
+        # Held while writing, so writes of the same document are never reordered.
+        self._flush_lock: threading.RLock = threading.RLock()
+        self._closed: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+        with _active_lock:
+            _active.add(self)
+        atexit.register(self.close)
+
+    def __enter__(self) -> WriteBehind:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    @property
+    def dirty(self) -> int:
+        """Number of documents with a pending write."""
+        with self._lock:
+            return len(self._pending)
+
+    def put(
+        self,
+        key: Hashable,
+        data: dict[str, Any],
+        write: Callable[[dict[str, Any]], Any],
+        read: Callable[[dict[str, Any]], dict[str, Any]] = copy.deepcopy,
+    ) -> None:
+        """
+        Record `data` as the pending metadata of the document `key`, replacing any
+        earlier pending write. `write(data)` is called to write it when flushed, and
+        `read(data)` gives a new copy of it as it will read back once written. A copy
+        of `data` is kept, so changing it afterwards doesn't change what is written.
+        Once closed, `data` is written right away.
+        """
+        pending = _Pending(copy.deepcopy(data), write, read)
+        with self._lock:
+            closed = self._closed.is_set()
+            if not closed:
+                self._pending[key] = pending
+            dirty = len(self._pending)
+            if self._thread is None and self.interval is not None and not closed:
+                self._thread = threading.Thread(
+                    target=self._run, name="sidematter-write-behind", daemon=True
+                )
+                self._thread.start()
+        if closed:
+            write(data)
+        elif dirty >= self.max_dirty:
+            self.flush()
+
+    def get(self, key: Hashable) -> dict[str, Any] | None:
+        """
+        A copy of the pending (or currently being written) metadata of the document
+        `key`, as it will read back once written, or None if there is none.
+        """
+        with self._lock:
+            pending = self._pending.get(key) or self._flushing.get(key)
+        return None if pending is None else pending.read(pending.data)
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Drop any pending write of the document `key`, such as when it is overwritten.
+        """
+        with self._flush_lock, self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self, key: Hashable | None = None) -> None:
+        """
+        Write all pending metadata, or only that of the document `key`. Writes that
+        fail stay pending (unless written again meanwhile), and the first error is
+        raised once the others are written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if key is None:
+                    self._flushing = self._pending
+                    self._pending = {}
+                elif key in self._pending:
+                    self._flushing = {key: self._pending.pop(key)}
+                else:
+                    return
+            error: Exception | None = None
+            for k, pending in self._flushing.items():
+                try:
+                    pending.write(pending.data)
+                except Exception as e:
+                    with self._lock:
+                        self._pending.setdefault(k, pending)
+                    error = error or e
+            with self._lock:
+                self._flushing = {}
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """
+        Flush pending writes and stop flushing in the background.
+        """
+        with self._lock:
+            self._closed.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        atexit.unregister(self.close)
+        try:
+            self.flush()
+        finally:
+            with _active_lock:
+                _active.discard(self)
+
+    def _run(self) -> None:
+        assert self.interval is not None
+        while not self._closed.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # Failed writes stay pending and are retried next time.
+
+
+_active: set[WriteBehind] = set()
+_active_lock = threading.Lock()
+
+
+def _active_caches() -> list[WriteBehind]:
+    with _active_lock:
+        return list(_active)
+
+
+def write_behind_active() -> bool:
+    """
+    Whether any `WriteBehind` is open, so there may be pending writes.
+    """
+    return bool(_active)
+
+
+def pending_meta(key: Hashable) -> dict[str, Any] | None:
+    """
+    The pending metadata of a document in any `WriteBehind`, or None.
+    """
+    for cache in _active_caches():
+        data = cache.get(key)
+        if data is not None:
+            return data
+    return None
+
+
+def flush_pending(key: Hashable) -> None:
+    """
+    Write any pending metadata of a document, before changing its metadata otherwise.
+    """
+    for cache in _active_caches():
+        cache.flush(key)
+
+
+def discard_pending(key: Hashable) -> None:
+    """
+    Drop any pending metadata of a document, before overwriting it.
+    """
+    for cache in _active_caches():
+        cache.discard(key)
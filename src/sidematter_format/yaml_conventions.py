@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import re
+import threading
+from collections.abc import Callable
 from datetime import date, datetime, time
 from enum import Enum
-from functools import cache
-from typing import Any, cast
+from io import StringIO
+from typing import Any, Literal, cast
 
-from frontmatter_format.yaml_util import add_default_yaml_customizer
-from ruamel.yaml import Representer
+from frontmatter_format import yaml_util
+from frontmatter_format.yaml_util import add_default_yaml_customizer, new_yaml
+from ruamel.yaml import YAML, Representer
 from strif import format_iso_timestamp
 
+_registered_lock = threading.Lock()
+_registered = False
+
 
-@cache
 def register_default_yaml_representers() -> None:
     """
     Centralized YAML customization for consistent serialization of:
@@ -18,8 +24,18 @@ def register_default_yaml_representers() -> None:
     - datetime: ISO-8601 with trailing Z (via `strif.format_iso_timestamp`)
     - date/time: `.isoformat()`
 
-    Call once at startup to enable these representers everywhere.
+    Call once at startup to enable these representers everywhere. Later calls, including
+    concurrent ones from other threads, do nothing.
     """
+    global _registered
+    with _registered_lock:
+        if _registered:
+            return
+        _register_default_yaml_representers()
+        _registered = True
+
+
+def _register_default_yaml_representers() -> None:
 
     def represent_enum(dumper: Representer, data: Enum) -> Any:
         return cast(Any, dumper).represent_str(data.value)
@@ -51,6 +67,296 @@ def register_default_yaml_representers() -> None:
     add_default_yaml_customizer(_customize_time)
 
 
+KeySortFn = Callable[[str], Any]
+
+_POOL_MAX_SIZE = 16
+
+_pool = threading.local()
+
+# ruamel keeps representers in class-level tables, which `new_yaml()` updates for each
+# new instance, so instances are created one at a time.
+_new_yaml_lock = threading.Lock()
+
+
+def _customizer_count() -> int:
+    return len(yaml_util._default_yaml_customizers)  # pyright: ignore[reportPrivateUsage]
+
+
+def _new_isolated_yaml(key_sort: KeySortFn | None, typ: Literal["rt", "safe"]) -> YAML:
+    """
+    A new YAML instance from `new_yaml()`, with its own copy of the representer tables,
+    so instances created later with other settings (such as another key sort) don't
+    change how this one writes.
+    """
+    with _new_yaml_lock:
+        yaml = new_yaml(key_sort=key_sort, typ=typ)
+        representer: Any = yaml.representer
+        base = cast(Any, type(representer))
+        tables: dict[str, Any] = {
+            "yaml_representers": dict(base.yaml_representers),
+            "yaml_multi_representers": dict(base.yaml_multi_representers),
+        }
+        representer.__class__ = type(base.__name__, (base,), tables)
+    return yaml
+
+
+def _pooled(kind: str, key_sort: KeySortFn | None, typ: Literal["rt", "safe"]) -> YAML:
+    instances: dict[tuple[str, KeySortFn | None, int], YAML] | None = getattr(
+        _pool, "instances", None
+    )
+    if instances is None:
+        instances = _pool.instances = {}
+    pool_key = (kind, key_sort, _customizer_count())
+    yaml = instances.get(pool_key)
+    if yaml is None:
+        if len(instances) >= _POOL_MAX_SIZE:
+            instances.clear()
+        yaml = instances[pool_key] = _new_isolated_yaml(key_sort, typ)
+    return yaml
+
+
+def _discard_pooled(kind: str, key_sort: KeySortFn | None) -> None:
+    """
+    Drop a pooled instance after a failed dump or load. ruamel leaves an instance in a
+    half-finished state after an exception (a failed dump makes later dumps write
+    nothing), so it's rebuilt on next use rather than reused.
+    """
+    instances: dict[tuple[str, KeySortFn | None, int], YAML] | None = getattr(
+        _pool, "instances", None
+    )
+    if instances is not None:
+        instances.pop((kind, key_sort, _customizer_count()), None)
+
+
+def pooled_yaml(key_sort: KeySortFn | None = None) -> YAML:
+    """
+    A YAML dumper configured exactly as `frontmatter_format.to_yaml_string()` configures
+    one, but created once per thread and key sort and then reused, instead of being
+    set up (with all default customizers) on every call.
+
+    Instances are rebuilt if more default customizers are registered. Not shared across
+    threads, since ruamel dumpers are not thread safe. A dumper that raises is not
+    usable again, so use `yaml_dumps()`, which replaces it, rather than calling `dump()`
+    on the result directly.
+    """
+    return _pooled("dump", key_sort, "rt")
+
+
+def yaml_loads(text: str) -> Any:
+    """
+    Parse YAML with the same result as `frontmatter_format.from_yaml_string()`, using a
+    pooled per-thread loader rather than setting up a new one on every call.
+    """
+    try:
+        return cast(Any, _pooled("load", None, "safe")).load(text)
+    except Exception:
+        _discard_pooled("load", None)
+        raise
+
+
+## Fast emitter for plain data
+
+
+class _NotPlain(Exception):
+    """Value can't be emitted by the fast emitter, so ruamel must be used."""
+
+
+_MAX_LINE = 76
+_MAX_DEPTH = 64
+
+# Strings that are certain to be written as plain (unquoted) scalars by ruamel.
+# Anything that could resolve as another type (bool, null, number, date) or needs
+# quoting, escaping, or line folding falls back to ruamel.
+_PLAIN_STR_RE = re.compile(r"[A-Za-z][A-Za-z0-9_./-]*(?: [A-Za-z0-9_./-]+)*")
+_RESERVED_WORDS = frozenset(
+    {"true", "false", "null", "yes", "no", "on", "off", "y", "n"},
+)
+_PLAIN_FLOAT_RE = re.compile(r"-?[0-9]+\.[0-9]+")
+_BLOCK_LINE_RE = re.compile(r"\S(?:[^\n]*\S)?")
+
+
+def _plain_scalar(value: Any, column: int) -> str:
+    """
+    Text of a scalar written at `column`. Raises `_NotPlain` if unsure of ruamel's output.
+    """
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    cls = cast(type[Any], type(value))
+    if cls is int:
+        text = str(value)
+    elif cls is float:
+        text = repr(value)
+        if not _PLAIN_FLOAT_RE.fullmatch(text):
+            raise _NotPlain()
+    elif cls is str:
+        if value == "":
+            return "''"
+        if not _PLAIN_STR_RE.fullmatch(value) or value.lower() in _RESERVED_WORDS:
+            raise _NotPlain()
+        text = value
+    else:
+        raise _NotPlain()
+    if column + len(text) > _MAX_LINE:
+        raise _NotPlain()
+    return text
+
+
+def _block_lines(value: str) -> tuple[str, list[str]] | None:
+    """
+    For a multi-line string that ruamel writes as a literal block, the block indicator
+    and lines. None if it's a single-line string. Raises `_NotPlain` if unsure.
+    """
+    if "\n" not in value:
+        return None
+    if value.endswith("\n\n"):
+        raise _NotPlain()
+    indicator = "|" if value.endswith("\n") else "|-"
+    lines = value.removesuffix("\n").split("\n")
+    for i, line in enumerate(lines):
+        if line:
+            if not line.isprintable() or not _BLOCK_LINE_RE.fullmatch(line):
+                raise _NotPlain()
+        elif i == 0 or i == len(lines) - 1:
+            raise _NotPlain()
+    return indicator, lines
+
+
+def _emit_block(out: list[str], indicator: str, lines: list[str], indent: int) -> None:
+    out[-1] += indicator
+    pad = " " * indent
+    out.extend(pad + line if line else "" for line in lines)
+
+
+def _visible_items(data: dict[Any, Any], key_sort: KeySortFn | None) -> list[tuple[Any, Any]]:
+    if key_sort:
+        data = {k: data[k] for k in sorted(data.keys(), key=key_sort)}
+    # Same suppression of None and empty dict values as `new_yaml()`.
+    return [(k, v) for k, v in data.items() if not yaml_util.none_or_empty_dict(v)]
+
+
+def _emit_value(
+    out: list[str], value: Any, indent: int, key_sort: KeySortFn | None, depth: int
+) -> None:
+    """
+    Emit `value` as the continuation of the current last line, which ends with
+    a mapping key's colon or a sequence dash (`"key:"` or `"- "`).
+    """
+    if depth > _MAX_DEPTH:
+        raise _NotPlain()
+    cls = cast(type[Any], type(value))
+    after_dash = out[-1].endswith("- ")
+    if cls is dict:
+        items = _visible_items(value, key_sort)
+        if not items:
+            out[-1] += "{}" if after_dash else " {}"
+        elif after_dash:
+            _emit_mapping(out, items, indent + 2, key_sort, depth + 1, inline=True)
+        else:
+            _emit_mapping(out, items, indent + 2, key_sort, depth + 1)
+    elif cls is list:
+        if not value:
+            out[-1] += "[]" if after_dash else " []"
+        elif after_dash:
+            _emit_sequence(out, value, indent + 2, key_sort, depth + 1, inline=True)
+        else:
+            # Sequences in mappings are not indented relative to the key.
+            _emit_sequence(out, value, indent, key_sort, depth + 1)
+    elif cls is str and (block := _block_lines(value)):
+        if not after_dash:
+            out[-1] += " "
+        _emit_block(out, block[0], block[1], indent + 2)
+    else:
+        sep = "" if after_dash else " "
+        out[-1] += sep + _plain_scalar(value, len(out[-1]) + len(sep))
+
+
+def _emit_mapping(
+    out: list[str],
+    items: list[tuple[Any, Any]],
+    indent: int,
+    key_sort: KeySortFn | None,
+    depth: int,
+    inline: bool = False,
+) -> None:
+    pad = " " * indent
+    for i, (key, value) in enumerate(items):
+        if type(key) is not str:
+            raise _NotPlain()
+        prefix = "" if inline and i == 0 else pad
+        line_start = len(out[-1]) if inline and i == 0 else indent
+        key_text = _plain_scalar(key, line_start)
+        if inline and i == 0:
+            out[-1] += f"{key_text}:"
+        else:
+            out.append(f"{prefix}{key_text}:")
+        _emit_value(out, value, indent, key_sort, depth)
+
+
+def _emit_sequence(
+    out: list[str],
+    items: list[Any],
+    indent: int,
+    key_sort: KeySortFn | None,
+    depth: int,
+    inline: bool = False,
+) -> None:
+    pad = " " * indent
+    for i, item in enumerate(items):
+        if inline and i == 0:
+            out[-1] += "- "
+        else:
+            out.append(f"{pad}- ")
+        _emit_value(out, item, indent, key_sort, depth)
+
+
+def emit_plain_yaml(value: Any, *, key_sort: KeySortFn | None = None) -> str | None:
+    """
+    Fast YAML emitter for plain metadata: a dict of dicts, lists, strings, ints, floats,
+    bools, and None. Produces the same text as `frontmatter_format.to_yaml_string()`
+    (including `key_sort` and suppression of None and empty dict values), or returns
+    None if the value contains anything it can't be sure to write identically, such as
+    other types or strings that ruamel would quote or fold.
+
+    Assumes no YAML customizers override how these plain types are represented, as is
+    the case with `register_default_yaml_representers()`.
+    """
+    if type(value) is not dict:
+        return None
+    items = _visible_items(cast(dict[Any, Any], value), key_sort)
+    if not items:
+        return "{}\n"
+    out: list[str] = [""]
+    try:
+        _emit_mapping(out, items, 0, key_sort, 0, inline=True)
+    except _NotPlain:
+        return None
+    return "\n".join(out) + "\n"
+
+
+def yaml_dumps(value: Any, *, key_sort: KeySortFn | None = None, fast: bool = False) -> str:
+    """
+    Serialize a value to YAML, with the same output as
+    `frontmatter_format.to_yaml_string()`, using a pooled per-thread dumper. With
+    `fast`, plain data is written with `emit_plain_yaml()`, falling back to ruamel for
+    anything else.
+    """
+    if fast:
+        text = emit_plain_yaml(value, key_sort=key_sort)
+        if text is not None:
+            return text
+    stream = StringIO()
+    try:
+        cast(Any, pooled_yaml(key_sort)).dump(value, stream)
+    except Exception:
+        _discard_pooled("dump", key_sort)
+        raise
+    return stream.getvalue()
+
+
 # Maybe useful in the future?
 
 # from pydantic import BaseModel
@@ -0,0 +1,73 @@
+"""
+Tests for memory-mapped and range reads of assets.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import MemoryFS, Sidematter
+from sidematter_format.asset_access import map_file, read_range
+
+
+def test_open_asset_mmap():
+    """
+    Assets can be opened as memory-mapped views and sliced.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        data = bytes(range(256)) * 100
+        sm.asset_path("model.bin").parent.mkdir()
+        sm.asset_path("model.bin").write_bytes(data)
+        sm.asset_path("empty.bin").write_bytes(b"")
+
+        with sm.open_asset("model.bin") as view:
+            assert view.readonly
+            assert len(view) == len(data)
+            assert view[256:260].tobytes() == bytes([0, 1, 2, 3])
+            kept = view[:4]
+        # A slice kept after the block still works.
+        assert kept.tobytes() == bytes([0, 1, 2, 3])
+        kept.release()
+
+        with sm.open_asset("model.bin", mode="bytes") as view:
+            assert view.tobytes() == data
+        with sm.open_asset("empty.bin") as view:
+            assert len(view) == 0
+
+        with pytest.raises(ValueError):
+            with sm.open_asset("model.bin", mode="text"):  # pyright: ignore[reportArgumentType]
+                pass
+        with pytest.raises(FileNotFoundError):
+            with map_file(sm.asset_path("missing.bin")):
+                pass
+
+
+def test_read_asset_range():
+    """
+    Range reads return the same bytes as slicing, on disk and in memory.
+    """
+    data = b"0123456789" * 10
+    ranges: list[tuple[int, int | None]] = [(0, 10), (5, None), (95, 200), (100, None), (3, 3)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.asset_path("a.txt").parent.mkdir()
+        sm.asset_path("a.txt").write_bytes(data)
+
+        fs = MemoryFS()
+        mem = Sidematter(Path("doc.md"), fs=fs)
+        fs.write_bytes(mem.asset_path("a.txt"), data)
+
+        for start, end in ranges:
+            assert sm.read_asset_range("a.txt", start, end) == data[start:end]
+            assert mem.read_asset_range("a.txt", start, end) == data[start:end]
+            with mem.open_asset("a.txt") as view:
+                assert view[start:end].tobytes() == data[start:end]
+
+        with pytest.raises(ValueError):
+            read_range(sm.asset_path("a.txt"), 5, 2)
+        with pytest.raises(ValueError):
+            sm.read_asset_range("a.txt", -1)
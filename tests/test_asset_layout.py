@@ -0,0 +1,124 @@
+"""
+Tests for sharded asset layouts.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import (
+    FLAT_LAYOUT,
+    SHARDED_LAYOUT,
+    AssetLayout,
+    MemoryFS,
+    Sidematter,
+    SidematterError,
+)
+from sidematter_format.asset_layout import LAYOUT_FILE_NAME
+
+
+def test_shard_and_unshard():
+    """
+    Converting between layouts keeps asset names, and reads and writes follow the
+    recorded layout.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.assets_dir.mkdir()
+        (sm.assets_dir / "figs").mkdir()
+        for i in range(50):
+            (sm.assets_dir / f"img{i}.png").write_text(f"img {i}")
+        (sm.assets_dir / "figs" / "a.png").write_text("a")
+        names = [e.name for e in sm.list_assets()]
+        assert sm.asset_layout == FLAT_LAYOUT
+
+        assert sm.set_asset_layout(SHARDED_LAYOUT, workers=4) == 51
+        assert sm.asset_layout == SHARDED_LAYOUT
+        assert [e.name for e in sm.list_assets()] == names
+        assert sorted(e.name for e in sm.iter_assets()) == names
+        assert sm.list_assets(cache=True) == sm.list_assets()
+        assert not (sm.assets_dir / "img0.png").exists()
+        assert sm.resolve_asset_path("figs/a.png").parent.parent.parent == sm.assets_dir
+        assert sm.read_asset("img7.png") == b"img 7"
+        assert sm.read_asset("figs/a.png") == b"a"
+
+        new = sm.add_asset(sm.resolve_asset_path("img7.png"), dest_name="copy.png")
+        assert new.parent.parent == sm.assets_dir
+        assert sm.set_asset_layout(SHARDED_LAYOUT) == 0
+
+        assert sm.set_asset_layout(FLAT_LAYOUT) == 52
+        entries = sorted(p.name for p in sm.assets_dir.iterdir() if not p.name.startswith("."))
+        assert len(entries) == 52
+        assert entries[:3] == ["copy.png", "figs", "img0.png"]
+        assert not (sm.assets_dir / LAYOUT_FILE_NAME).exists()
+        assert sm.read_asset("figs/a.png") == b"a"
+
+
+def test_interrupted_conversion():
+    """
+    Assets are found in either place during a conversion, and running it again
+    finishes it.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        for i in range(5):
+            sm.asset_path(f"a{i}.txt").parent.mkdir(parents=True, exist_ok=True)
+            sm.asset_path(f"a{i}.txt").write_text(str(i))
+        sm.set_asset_layout(AssetLayout(levels=2, width=1))
+        assert len(sm.resolve_asset_path("a0.txt").relative_to(sm.assets_dir).parts) == 3
+
+        # Put one asset back in the flat place, as if a conversion stopped midway.
+        sm.resolve_asset_path("a3.txt").rename(sm.assets_dir / "a3.txt")
+        layout_file = sm.assets_dir / LAYOUT_FILE_NAME
+        layout = json.loads(layout_file.read_text())
+        layout["converting_from"] = {"levels": 0, "width": 2}
+        layout_file.write_text(json.dumps(layout))
+
+        assert sm.read_asset("a3.txt") == b"3"
+        assert [e.name for e in sm.list_assets()] == [f"a{i}.txt" for i in range(5)]
+        assert sm.set_asset_layout(AssetLayout(levels=2, width=1)) == 1
+        assert sm.resolve_asset_path("a3.txt").read_text() == "3"
+
+
+def test_sharded_in_memory():
+    """
+    Layouts work the same on a `MemoryFS`.
+    """
+    fs = MemoryFS()
+    sm = Sidematter(Path("doc.md"), fs=fs)
+    sm.set_asset_layout(SHARDED_LAYOUT)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "chart.png"
+        src.write_bytes(b"png")
+        path = sm.add_asset(src)
+    assert path.parent.parent == sm.assets_dir
+    assert sm.read_asset("chart.png") == b"png"
+    assert [e.name for e in sm.list_assets()] == ["chart.png"]
+
+
+def test_asset_path_reads_nothing():
+    """
+    `asset_path()` is only a path computation, while `resolve_asset_path()` and reads
+    follow the recorded layout.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.set_asset_layout(SHARDED_LAYOUT)
+        assert sm.asset_path("a.png") == sm.assets_dir / "a.png"
+        assert sm.resolve_asset_path("a.png").parent.parent == sm.assets_dir
+
+        src_dir = Path(tmpdir) / "src"
+        src_dir.mkdir()
+        (src_dir / "a.png").write_text("a")
+        assert sm.copy_assets_from(src_dir) == [sm.resolve_asset_path("a.png")]
+
+        (sm.assets_dir / LAYOUT_FILE_NAME).write_text("{not json")
+        assert sm.asset_path("a.png") == sm.assets_dir / "a.png"
+        with pytest.raises(SidematterError, match="asset layout"):
+            sm.resolve_asset_path("a.png")
+        with pytest.raises(SidematterError, match="asset layout"):
+            sm.list_assets()
@@ -0,0 +1,122 @@
+"""
+Tests for recursive asset listing and the listing cache.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from sidematter_format import Sidematter, copy_sidematter, move_sidematter, remove_sidematter
+from sidematter_format.asset_listing import listing_cache_path
+
+
+def _age_dirs(root: Path, seconds: int = 60) -> None:
+    """
+    Set directory times to the past, so a listing of them isn't considered racy.
+    """
+    past = time.time_ns() - seconds * 1_000_000_000
+    for dirpath, _dirnames, _filenames in os.walk(root):
+        os.utime(dirpath, ns=(past, past))
+
+
+def test_list_assets():
+    """
+    Assets are listed recursively with relative names, sizes, and times.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        assert sm.list_assets() == []
+
+        sm.asset_path("a.txt").parent.mkdir()
+        sm.asset_path("a.txt").write_text("aa")
+        (sm.assets_dir / "sub" / "deeper").mkdir(parents=True)
+        sm.asset_path("sub/b.txt").write_text("bbb")
+        sm.asset_path("sub/deeper/c.txt").write_text("")
+
+        entries = sm.list_assets()
+        assert [(e.name, e.size) for e in entries] == [
+            ("a.txt", 2),
+            ("sub/b.txt", 3),
+            ("sub/deeper/c.txt", 0),
+        ]
+        assert entries[0].mtime_ns == sm.asset_path("a.txt").stat().st_mtime_ns
+        assert sorted(e.name for e in sm.iter_assets()) == [e.name for e in entries]
+
+
+def test_list_assets_cache():
+    """
+    A cached listing is reused while no directory changes, and rebuilt when one does.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        (sm.assets_dir / "sub").mkdir(parents=True)
+        sm.asset_path("a.txt").write_text("a")
+        sm.asset_path("sub/b.txt").write_text("b")
+
+        # Recently modified directories aren't trusted, so this listing isn't reused.
+        first = sm.list_assets(cache=True)
+        assert [e.name for e in first] == ["a.txt", "sub/b.txt"]
+        assert listing_cache_path(sm.assets_dir) == Path(tmpdir) / "doc.assets.listing.json"
+        assert listing_cache_path(sm.assets_dir).exists()
+
+        _age_dirs(sm.assets_dir)
+        assert sm.list_assets(cache=True) == first
+
+        # An in-place rewrite doesn't change any directory, so the cache is reused.
+        sm.asset_path("sub/b.txt").write_text("bbbb")
+        assert sm.list_assets(cache=True) == first
+        assert sm.list_assets()[1].size == 4
+
+        # Adding a file in a subdirectory is detected.
+        sm.asset_path("sub/c.txt").write_text("c")
+        assert [e.name for e in sm.list_assets(cache=True)] == ["a.txt", "sub/b.txt", "sub/c.txt"]
+
+        # A corrupt cache is ignored.
+        listing_cache_path(sm.assets_dir).write_text("{not json")
+        _age_dirs(sm.assets_dir)
+        assert len(sm.list_assets(cache=True)) == 3
+
+
+def test_listing_cache_follows_document():
+    """
+    The listing cache is kept beside the assets directory, moves and is removed with
+    the document, and a copy of it doesn't describe the copied assets.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        sm = Sidematter(root / "doc.md")
+        sm.primary.write_text("# Doc\n")
+        sm.asset_path("a.txt").parent.mkdir()
+        sm.asset_path("a.txt").write_text("a")
+        _age_dirs(sm.assets_dir)
+        sm.list_assets(cache=True)
+        assert [e.name for e in sm.list_assets(cache=True)] == ["a.txt"]
+        assert sorted(p.name for p in sm.assets_dir.iterdir()) == ["a.txt"]
+
+        # A cache copied with the document doesn't validate for the copy, even when the
+        # copy's directory times match.
+        copied = copy_sidematter(sm.primary, root / "copy.md")
+        assert copied.assets_dir is not None
+        (copied.assets_dir / "b.txt").write_text("b")
+        mtime_ns = sm.assets_dir.stat().st_mtime_ns
+        os.utime(copied.assets_dir, ns=(mtime_ns, mtime_ns))
+        shutil.copyfile(listing_cache_path(sm.assets_dir), listing_cache_path(copied.assets_dir))
+        names = [e.name for e in Sidematter(root / "copy.md").list_assets(cache=True)]
+        assert names == ["a.txt", "b.txt"]
+
+        moved = move_sidematter(sm.primary, root / "moved.md")
+        assert moved.assets_dir is not None
+        assert not listing_cache_path(sm.assets_dir).exists()
+        assert listing_cache_path(moved.assets_dir).exists()
+
+        remove_sidematter(root / "moved.md")
+        assert not listing_cache_path(moved.assets_dir).exists()
+        assert sorted(p.name for p in root.iterdir()) == [
+            "copy.assets",
+            "copy.assets.listing.json",
+            "copy.md",
+        ]
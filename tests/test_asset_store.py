@@ -0,0 +1,99 @@
+"""
+Tests for the content-addressed asset store.
+"""
+
+from __future__ import annotations
+
+import stat
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import (
+    AssetStore,
+    MemoryFS,
+    Sidematter,
+    SidematterError,
+    dedupe_assets,
+    remove_sidematter,
+)
+
+
+def test_add_asset_to_store():
+    """
+    Assets added with a store are links to one shared blob, which is collected once
+    nothing links to it.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        store = AssetStore(root / "store")
+        logo = root / "logo.png"
+        logo.write_bytes(b"logo" * 100)
+        (root / "src").mkdir()
+        (root / "src" / "logo.png").write_bytes(b"logo" * 100)
+        (root / "src" / "style.css").write_text("body {}")
+
+        docs = [Sidematter(root / f"doc{i}.md") for i in range(2)]
+        a = docs[0].add_asset(logo, store=store)
+        b = docs[1].copy_assets_from(root / "src", store=store)
+        assert len(b) == 2
+
+        blob = store.add(logo)
+        assert blob.stat().st_ino == a.stat().st_ino == (b[0].parent / "logo.png").stat().st_ino
+        assert blob.stat().st_nlink == 3
+        assert store.is_linked(a)
+        assert not store.is_linked(logo)
+        assert docs[0].read_asset("logo.png") == b"logo" * 100
+        assert store.gc() == []
+
+        # Replacing an asset only unlinks it from the blob.
+        docs[0].add_asset(root / "src" / "style.css", dest_name="logo.png")
+        assert docs[1].read_asset("logo.png") == b"logo" * 100
+
+        for doc in docs:
+            remove_sidematter(doc.primary)
+        assert sorted(store.gc(dry_run=True)) == sorted(store.gc())
+        assert store.gc() == []
+        assert not blob.exists()
+
+
+def test_dedupe_assets():
+    """
+    Duplicate assets in an existing tree are converted to links in place.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        store = AssetStore(root / "store")
+        for i in range(3):
+            sm = Sidematter(root / "docs" / f"doc{i}.md")
+            sm.asset_path("fig.svg").parent.mkdir(parents=True)
+            sm.asset_path("fig.svg").write_text("<svg/>" * 10)
+            sm.asset_path(f"own{i}.txt").write_text(f"own {i}")
+        # Files outside assets directories are left alone.
+        (root / "docs" / "fig.svg").write_text("<svg/>" * 10)
+
+        report = dedupe_assets(root, store, workers=4)
+        assert len(report.linked) == 6
+        assert report.errors == {}
+        assert report.bytes_saved == 2 * 60
+        assert Path(root / "docs" / "doc2.assets" / "fig.svg").stat().st_nlink == 4
+        assert (root / "docs" / "fig.svg").stat().st_nlink == 1
+        assert Sidematter(root / "docs" / "doc1.md").read_asset("fig.svg") == b"<svg/>" * 10
+
+        report = dedupe_assets(root, store)
+        assert report.linked == []
+        assert report.unchanged == 6
+        # Blobs are read-only, so linked assets aren't changed in place by accident.
+        assert stat.S_IMODE(store.add(root / "docs" / "fig.svg").stat().st_mode) == 0o444
+
+
+def test_store_requires_local_fs():
+    """
+    Stores can't be used with other filesystems.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "a.txt"
+        src.write_text("a")
+        with pytest.raises(SidematterError):
+            Sidematter(Path("doc.md"), fs=MemoryFS()).add_asset(src, store=AssetStore(tmpdir))
@@ -0,0 +1,52 @@
+"""
+Tests for reading metadata of many documents on a process pool.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import Sidematter, read_meta_many
+
+
+def _make_docs(root: Path) -> list[Path]:
+    paths: list[Path] = []
+    for d in ("b", "a", "c"):
+        for i in range(4):
+            sm = Sidematter(root / d / f"doc{i}.md")
+            sm.write_meta({"dir": d, "index": i})
+            paths.append(sm.primary)
+    return paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_read_meta_many(workers: int):
+    """
+    Results are in input order with errors per document, in-process or on a pool.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        paths = _make_docs(root)
+        bad = Sidematter(root / "a/bad.md")
+        bad.meta_yaml_path.write_text("key: [unclosed\n")
+        # Interleave directories, so batches don't follow input order.
+        paths = paths[::2] + [bad.primary, root / "missing.md"] + paths[1::2]
+
+        results = read_meta_many(paths, workers=workers, chunksize=3, min_parallel=0)
+
+        assert [r.path for r in results] == paths
+        for r in results:
+            if r.path == bad.primary:
+                assert r.meta is None and r.error is not None
+            elif r.path.name == "missing.md":
+                assert r.meta == {} and r.error is None
+            else:
+                assert r.error is None
+                assert r.meta == Sidematter(r.path).read_meta()
+
+        assert read_meta_many([]) == []
+        with pytest.raises(ValueError):
+            read_meta_many(paths, chunksize=0)
@@ -0,0 +1,118 @@
+"""
+Tests for planned bulk renames.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import MemoryFS, Sidematter, SidematterError, apply_plan, plan_renames
+
+
+def _make_doc(path: Path, name: str) -> None:
+    sm = Sidematter(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"# {name}\n")
+    sm.write_meta({"name": name})
+    sm.asset_path("img.png").parent.mkdir(exist_ok=True)
+    sm.asset_path("img.png").write_text(name)
+
+
+def _name_of(path: Path) -> tuple[str, str, str]:
+    sm = Sidematter(path)
+    return (path.read_text(), sm.read_meta()["name"], sm.asset_path("img.png").read_text())
+
+
+def test_chains_and_cycles():
+    """
+    Chains of renames run in order, and swaps go through a temporary name.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for name in ("a", "b", "x", "y", "z"):
+            _make_doc(root / f"{name}.md", name)
+        Sidematter(root / "a.md").append_meta("history", 1)
+
+        plan = plan_renames(
+            {
+                root / "a.md": root / "b.md",
+                root / "b.md": root / "sub/c.md",
+                # A three-way cycle.
+                root / "x.md": root / "y.md",
+                root / "y.md": root / "z.md",
+                root / "z.md": root / "x.md",
+            }
+        )
+        assert plan.conflicts == {}
+        assert plan.make_dirs == [root / "sub"]
+        assert plan.documents[root / "a.md"].meta_path == root / "b.meta.yml"
+        # Each document has a primary, metadata, and assets, plus one log, and the
+        # cycle of each of the three items adds a move through a temporary name.
+        assert len(plan.moves) == 5 * 3 + 1 + 3
+
+        apply_plan(plan, workers=4)
+
+        assert _name_of(root / "b.md") == ("# a\n", "a", "a")
+        assert Sidematter(root / "b.md").read_meta()["history"] == [1]
+        assert _name_of(root / "sub/c.md") == ("# b\n", "b", "b")
+        assert _name_of(root / "y.md") == ("# x\n", "x", "x")
+        assert _name_of(root / "z.md") == ("# y\n", "y", "y")
+        assert _name_of(root / "x.md") == ("# z\n", "z", "z")
+        assert not (root / "a.md").exists()
+        assert sorted(p.name for p in root.iterdir() if "renaming" in p.name) == []
+
+
+def test_conflicts():
+    """
+    Collisions are found before anything is renamed.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for name in ("a", "b", "c", "d"):
+            _make_doc(root / f"{name}.md", name)
+        # A stale sidecar that would be found for the renamed document.
+        (root / "e.meta.json").write_text("{}")
+
+        plan = plan_renames(
+            [
+                (root / "a.md", root / "b.md"),
+                (root / "c.md", root / "f.md"),
+                (root / "d.md", root / "f.md"),
+                (root / "missing.md", root / "g.md"),
+                (root / "c.md", root / "e.md"),
+            ]
+        )
+        assert set(plan.conflicts) == {
+            root / "b.md",
+            root / "b.meta.yml",
+            root / "b.assets",
+            root / "f.md",
+            root / "f.meta.yml",
+            root / "f.assets",
+            root / "missing.md",
+            root / "c.md",
+        }
+        with pytest.raises(SidematterError):
+            apply_plan(plan)
+        assert _name_of(root / "a.md") == ("# a\n", "a", "a")
+
+        plan = plan_renames({root / "d.md": root / "e.md"})
+        assert set(plan.conflicts) == {root / "e.meta.json"}
+
+
+def test_rename_in_memory():
+    """
+    Changing only the extension keeps the sidecars in place, also on a `MemoryFS`.
+    """
+    fs = MemoryFS()
+    sm = Sidematter(Path("doc.md"), fs=fs)
+    fs.write_bytes(sm.primary, b"# Doc\n")
+    sm.write_meta({"title": "Doc"})
+
+    plan = plan_renames({"doc.md": "doc.markdown"}, fs=fs)
+    assert plan.moves == [(Path("doc.md"), Path("doc.markdown"))]
+    apply_plan(plan, fs=fs)
+    assert Sidematter(Path("doc.markdown"), fs=fs).read_meta() == {"title": "Doc"}
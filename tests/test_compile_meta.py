@@ -0,0 +1,166 @@
+"""
+Tests for compiling YAML sidecars to JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from sidematter_format import (
+    Sidematter,
+    SidematterDir,
+    compile_meta,
+    copy_sidematter,
+    find_orphans,
+    move_sidematter,
+    read_compiled_meta,
+    remove_sidematter,
+)
+from sidematter_format.compile_meta import is_stale
+
+
+def _make_docs(root: Path, n: int) -> list[Sidematter]:
+    docs: list[Sidematter] = []
+    for i in range(n):
+        sm = Sidematter(root / f"sub{i % 2}" / f"doc{i}.md")
+        sm.write_meta({"title": f"Doc {i}", "created": "2024-01-15", "tags": ["a", "b"]})
+        docs.append(sm)
+    return docs
+
+
+def test_compile_meta():
+    """Test compiling YAML sidecars to JSON, in parallel and only when stale."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        docs = _make_docs(root, 6)
+        bad = Sidematter(root / "bad.md")
+        bad.meta_yaml_path.write_text("title: [unclosed")
+
+        report = compile_meta(root, workers=2)
+        assert len(report.compiled) == 6
+        assert list(report.errors) == [bad.meta_yaml_path]
+        for i, sm in enumerate(docs):
+            assert sm.resolve_meta() == sm.meta_json_path
+            assert json.loads(sm.meta_json_path.read_text())["title"] == f"Doc {i}"
+            assert sm.read_meta() == {
+                "title": f"Doc {i}",
+                "created": "2024-01-15",
+                "tags": ["a", "b"],
+            }
+            assert not is_stale(sm.meta_yaml_path)
+
+        # Nothing to do the second time
+        report = compile_meta(root, workers=2)
+        assert report.compiled == []
+        assert len(report.up_to_date) == 6
+
+        # A YAML file edited by hand is recompiled
+        docs[0].meta_yaml_path.write_text("title: Edited\n")
+        report = compile_meta(root, workers=1)
+        assert report.compiled == [docs[0].meta_yaml_path]
+        assert docs[0].read_meta() == {"title": "Edited"}
+
+
+def test_read_compiled_meta_rebuilds_stale():
+    """Test that stale compiled JSON is rebuilt rather than served."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"title": "Old"})
+        compile_meta(tmpdir, workers=1)
+
+        sm.meta_yaml_path.write_text("title: New\n")
+        assert sm.read_meta() == {"title": "Old"}  # Plain precedence serves stale JSON
+        assert is_stale(sm.meta_yaml_path)
+
+        assert read_compiled_meta(sm.primary) == {"title": "New"}
+        assert not is_stale(sm.meta_yaml_path)
+
+        # Restoring an older YAML also makes the JSON stale.
+        st = sm.meta_yaml_path.stat()
+        sm.meta_yaml_path.write_text("title: Restored\n")
+        os.utime(sm.meta_yaml_path, ns=(st.st_atime_ns, st.st_mtime_ns - 60_000_000_000))
+        assert is_stale(sm.meta_yaml_path)
+        assert read_compiled_meta(sm.primary) == {"title": "Restored"}
+
+        # Documents without YAML sidecars read as usual
+        assert read_compiled_meta(Path(tmpdir) / "other.md") == {}
+
+
+def test_written_json_is_kept():
+    """Test that JSON that wasn't compiled is never overwritten by compiling."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"a": 1})
+        compile_meta(tmpdir, workers=1)
+
+        sm.write_meta({"a": 2}, formats="json")
+        assert not is_stale(sm.meta_yaml_path)
+        report = compile_meta(tmpdir, workers=1, force=True)
+        assert report.skipped == [sm.meta_yaml_path]
+        assert sm.read_meta() == {"a": 2}
+        assert read_compiled_meta(sm.primary) == {"a": 2}
+
+        # Also when the YAML is restored to an older one.
+        os.utime(sm.meta_yaml_path, ns=(0, 0))
+        assert compile_meta(tmpdir, workers=1).compiled == []
+        assert sm.read_meta() == {"a": 2}
+
+        # Without a compiled JSON, it is compiled as usual.
+        sm.delete_meta(formats="json")
+        assert compile_meta(tmpdir, workers=1).compiled == [sm.meta_yaml_path]
+        assert sm.read_meta() == {"a": 1}
+
+
+def test_yaml_writes_replace_compiled_json():
+    """Test that writing the YAML removes JSON compiled from an older YAML."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"title": "Old"})
+        compile_meta(tmpdir, workers=1)
+
+        sm.write_meta({"title": "New"})
+        assert sm.read_meta() == {"title": "New"}
+        assert sm.resolve_meta() == sm.meta_yaml_path
+        assert sorted(p.name for p in Path(tmpdir).iterdir()) == ["doc.meta.yml"]
+
+        with SidematterDir(tmpdir) as sd:
+            compile_meta(tmpdir, workers=1)
+            sd.write_meta("doc.md", {"title": "Newer"})
+            assert sd.read_meta("doc.md") == {"title": "Newer"}
+            assert sd.resolve_meta("doc.md") == sm.meta_yaml_path
+
+
+def test_compiled_sidecars_move_together():
+    """Test that copying, moving, and removing a document handle both sidecars."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        a = Sidematter(root / "a.md")
+        a.primary.write_text("A")
+        a.write_meta({"title": "A"})
+        compile_meta(root, workers=1)
+
+        copy_sidematter(a.primary, root / "c.md")
+        move_sidematter(a.primary, root / "b.md")
+        assert sorted(p.name for p in root.iterdir()) == [
+            "b.md",
+            "b.meta.json",
+            "b.meta.json.compiled",
+            "b.meta.yml",
+            "c.md",
+            "c.meta.json",
+            "c.meta.json.compiled",
+            "c.meta.yml",
+        ]
+        assert compile_meta(root, workers=1).skipped == []
+        assert find_orphans(root) == []
+
+        remove_sidematter(root / "c.md")
+        assert sorted(p.name for p in root.iterdir()) == [
+            "b.md",
+            "b.meta.json",
+            "b.meta.json.compiled",
+            "b.meta.yml",
+        ]
@@ -0,0 +1,157 @@
+"""
+Tests for the WSGI app, calling it directly with no server or network.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from wsgiref.util import FileWrapper, setup_testing_defaults
+
+import pytest
+
+from sidematter_format import Sidematter
+from sidematter_format.http_app import SidematterApp, parse_range
+
+
+def _get(
+    app: SidematterApp, path: str, headers: dict[str, str] | None = None, method: str = "GET"
+) -> tuple[int, dict[str, str], bytes]:
+    environ: dict[str, Any] = {"REQUEST_METHOD": method, "PATH_INFO": path}
+    for name, value in (headers or {}).items():
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    setup_testing_defaults(environ)
+    environ["wsgi.file_wrapper"] = FileWrapper
+
+    response: dict[str, Any] = {}
+
+    def write(_data: bytes) -> None:
+        raise AssertionError("write() should not be used")
+
+    def start_response(
+        status: str, response_headers: list[tuple[str, str]], _exc_info: Any = None
+    ) -> Callable[[bytes], None]:
+        response["status"] = int(status.split()[0])
+        response["headers"] = dict(response_headers)
+        return write
+
+    body_iter = app(environ, start_response)
+    body = b"".join(body_iter)
+    close = getattr(body_iter, "close", None)
+    if close is not None:
+        close()
+    return response["status"], response["headers"], body
+
+
+def _make_doc(root: Path) -> Sidematter:
+    sm = Sidematter(root / "docs" / "report.md")
+    sm.primary.parent.mkdir()
+    sm.primary.write_text("# Report\n")
+    sm.write_meta({"title": "Report"})
+    sm.asset_path("data.bin").parent.mkdir()
+    sm.asset_path("data.bin").write_bytes(bytes(range(100)))
+    return sm
+
+
+def test_serve_files_and_ranges():
+    """
+    Files are served with stat-based validators, 304s, and byte ranges.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _make_doc(Path(tmpdir))
+        app = SidematterApp(tmpdir)
+
+        status, headers, body = _get(app, "/docs/report.md")
+        assert status == 200
+        assert body == b"# Report\n"
+        assert headers["Content-Type"] == "text/markdown"
+        etag = headers["ETag"]
+
+        assert _get(app, "/docs/report.md", {"If-None-Match": etag})[0] == 304
+        assert _get(app, "/docs/report.md", {"If-None-Match": f'"x", W/{etag}'})[0] == 304
+        assert _get(app, "/docs/report.md", {"If-None-Match": '"other"'})[0] == 200
+        last_modified = headers["Last-Modified"]
+        assert _get(app, "/docs/report.md", {"If-Modified-Since": last_modified})[0] == 304
+
+        status, headers, body = _get(app, "/docs/report.assets/data.bin", {"Range": "bytes=10-19"})
+        assert status == 206
+        assert body == bytes(range(10, 20))
+        assert headers["Content-Range"] == "bytes 10-19/100"
+        assert headers["Content-Length"] == "10"
+
+        status, _headers, body = _get(app, "/docs/report.assets/data.bin", {"Range": "bytes=-5"})
+        assert (status, body) == (206, bytes(range(95, 100)))
+
+        status, headers, _body = _get(app, "/docs/report.assets/data.bin", {"Range": "bytes=200-"})
+        assert status == 416
+        assert headers["Content-Range"] == "bytes */100"
+
+        # A stale If-Range gets the whole file.
+        status, _headers, body = _get(
+            app, "/docs/report.assets/data.bin", {"Range": "bytes=0-0", "If-Range": '"stale"'}
+        )
+        assert (status, len(body)) == (200, 100)
+
+        status, headers, body = _get(app, "/docs/report.md", method="HEAD")
+        assert (status, body, headers["Content-Length"]) == (200, b"", "9")
+
+        assert _get(app, "/docs/missing.md")[0] == 404
+        assert _get(app, "/docs")[0] == 404
+        assert _get(app, "/docs/../../etc/passwd")[0] == 404
+        assert _get(app, "/docs/report.md", method="POST")[0] == 405
+
+
+def test_serve_meta():
+    """
+    Metadata is served as JSON from either sidecar format and cached by stat.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = _make_doc(Path(tmpdir))
+        app = SidematterApp(tmpdir)
+
+        status, headers, body = _get(app, "/meta/docs/report.md")
+        assert status == 200
+        assert headers["Content-Type"] == "application/json; charset=utf-8"
+        assert json.loads(body) == {"title": "Report"}
+        assert _get(app, "/meta/docs/report.md", {"If-None-Match": headers["ETag"]})[0] == 304
+
+        # A changed sidecar is picked up, even with the same size.
+        sm.write_meta({"title": "Repor2"})
+        st = sm.meta_yaml_path.stat()
+        os.utime(sm.meta_yaml_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert json.loads(_get(app, "/meta/docs/report.md")[2]) == {"title": "Repor2"}
+
+        # JSON takes precedence once written.
+        sm.write_meta({"title": "JSON"}, formats="json")
+        status, headers, body = _get(app, "/meta/docs/report.md")
+        assert json.loads(body) == {"title": "JSON"}
+
+        # Changes in the metadata log are picked up and change the ETag.
+        sm.patch_meta({"draft": True})
+        status, patched_headers, body = _get(
+            app, "/meta/docs/report.md", {"If-None-Match": headers["ETag"]}
+        )
+        assert status == 200
+        assert json.loads(body) == {"title": "JSON", "draft": True}
+        assert patched_headers["ETag"] != headers["ETag"]
+
+        assert _get(app, "/meta/docs/missing.md")[0] == 404
+
+
+def test_parse_range():
+    """
+    Single ranges are parsed, unsupported ones ignored, and unsatisfiable ones rejected.
+    """
+    assert parse_range("bytes=0-9", 100) == (0, 10)
+    assert parse_range("bytes=90-", 100) == (90, 100)
+    assert parse_range("bytes=90-500", 100) == (90, 100)
+    assert parse_range("bytes=-500", 100) == (0, 100)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=5-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
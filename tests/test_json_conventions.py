@@ -0,0 +1,104 @@
+"""
+Tests for JSON serialization conventions.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sidematter_format import register_json_encoder, to_json_string, unregister_json_encoder
+
+
+class Color(Enum):
+    RED = "red"
+
+
+@dataclass
+class Inner:
+    when: datetime
+    color: Color
+
+
+@dataclass
+class Outer:
+    name: str
+    inner: Inner
+    items: list[Inner] = field(default_factory=list)
+    by_key: dict[str, Inner] = field(default_factory=dict)
+
+
+class HasAsDict:
+    def as_dict(self) -> dict[str, Any]:
+        return {"as": "dict"}
+
+
+class Point:
+    def __init__(self, x: int, y: int):
+        self.x: int = x
+        self.y: int = y
+
+
+def test_default_policy():
+    """Test the default encodings for non-native types."""
+    dt = datetime(2024, 1, 15, 10, 30, tzinfo=timezone.utc)
+    value = {
+        "dt": dt,
+        "d": date(2024, 1, 15),
+        "t": time(10, 30),
+        "enum": Color.RED,
+        "path": Path("a/b.txt"),
+        "set": {1},
+        "as_dict": HasAsDict(),
+    }
+    assert json.loads(to_json_string(value)) == {
+        "dt": "2024-01-15T10:30:00.000000Z",
+        "d": "2024-01-15",
+        "t": "10:30:00",
+        "enum": "red",
+        "path": "a/b.txt",
+        "set": [1],
+        "as_dict": {"as": "dict"},
+    }
+
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        to_json_string({"obj": object()})
+
+
+def test_dataclass_matches_asdict():
+    """Test nested dataclasses encode the same as with a recursive `asdict()` copy."""
+    inner = Inner(datetime(2024, 1, 15, tzinfo=timezone.utc), Color.RED)
+    outer = Outer("x", inner, items=[inner, inner], by_key={"k": inner})
+
+    # Round-trip through asdict() for the reference output
+    assert to_json_string(outer) == to_json_string(asdict(outer))
+
+
+def test_register_json_encoder():
+    """Test registering an encoder for a user type and overriding defaults."""
+    with pytest.raises(TypeError):
+        to_json_string(Point(1, 2))
+
+    register_json_encoder(Point, lambda p: [p.x, p.y])
+    try:
+        assert to_json_string({"p": Point(1, 2)}, indent=None) == '{"p": [1, 2]}'
+    finally:
+        unregister_json_encoder(Point)
+
+    with pytest.raises(TypeError):
+        to_json_string(Point(1, 2))
+
+
+def test_instance_as_dict():
+    """An `as_dict` set on an instance is used, as for one defined on its class."""
+    point = Point(1, 2)
+    with pytest.raises(TypeError):
+        to_json_string(point)
+    point.as_dict = lambda: {"x": 1}  # pyright: ignore[reportAttributeAccessIssue]
+    assert to_json_string(point, indent=None) == '{"x": 1}'
@@ -0,0 +1,108 @@
+"""
+Tests for the in-memory filesystem.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import (
+    MemoryFS,
+    Sidematter,
+    copy_sidematter,
+    move_sidematter,
+    remove_sidematter,
+)
+
+
+def _stage_doc(fs: MemoryFS, primary: Path) -> Sidematter:
+    sm = Sidematter(primary, fs=fs)
+    fs.write_bytes(primary, b"# Doc\n")
+    sm.write_meta({"title": "Doc"})
+    fs.write_bytes(sm.asset_path("img/a.png"), b"png")
+    return sm
+
+
+def test_sidematter_on_memory_fs():
+    """
+    Sidematter reads and writes metadata and assets in memory.
+    """
+    fs = MemoryFS()
+    sm = _stage_doc(fs, Path("docs/doc.md"))
+
+    resolved = sm.resolve()
+    assert resolved.meta == {"title": "Doc"}
+    assert resolved.meta_path == Path("docs/doc.meta.yml")
+    assert resolved.assets_dir == Path("docs/doc.assets")
+    assert [e.name for e in sm.list_assets()] == ["img/a.png"]
+    assert sm.read_asset("img/a.png") == b"png"
+
+    sm.write_meta({"title": "JSON"}, formats="json")
+    assert sm.read_meta() == {"title": "JSON"}
+    sm.delete_meta()
+    assert sm.resolve_meta() is None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "chart.png"
+        src.write_bytes(b"chart")
+        assert sm.add_asset(src) == Path("docs/doc.assets/chart.png")
+        assert sm.read_asset("chart.png") == b"chart"
+    assert not Path("docs/doc.assets").exists()
+
+    with pytest.raises(FileNotFoundError):
+        fs.read_bytes(Path("docs/missing.md"))
+    with pytest.raises(FileNotFoundError):
+        fs.write_bytes(Path("new/dir/file.txt"), b"", make_parents=False)
+
+
+def test_copy_move_remove_on_memory_fs():
+    """
+    copy_sidematter, move_sidematter, and remove_sidematter work in memory.
+    """
+    fs = MemoryFS()
+    _stage_doc(fs, Path("doc.md"))
+
+    copied = copy_sidematter("doc.md", "out/copy.md", fs=fs)
+    assert copied.meta_path == Path("out/copy.meta.yml")
+    assert fs.read_bytes(Path("out/copy.assets/img/a.png")) == b"png"
+    assert fs.exists(Path("doc.assets/img/a.png"))
+
+    moved = move_sidematter("out/copy.md", "moved/doc.md", fs=fs)
+    assert moved.meta_path == Path("moved/doc.meta.yml")
+    assert moved.assets_dir == Path("moved/doc.assets")
+    assert fs.read_bytes(Path("moved/doc.assets/img/a.png")) == b"png"
+    assert not fs.exists(Path("out/copy.md"))
+    assert not fs.exists(Path("out/copy.assets"))
+    assert not fs.exists(Path("out/copy.assets/img"))
+
+    remove_sidematter("doc.md", fs=fs)
+    assert not fs.exists(Path("doc.md"))
+    assert not fs.exists(Path("doc.meta.yml"))
+    assert not fs.exists(Path("doc.assets"))
+
+
+def test_commit_to():
+    """
+    Staged files are written to disk in one commit, keeping modification times.
+    """
+    fs = MemoryFS()
+    _stage_doc(fs, Path("a/doc.md"))
+    fs.mkdir(Path("empty"))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        written = fs.commit_to(tmpdir, workers=4)
+        assert sorted(p.relative_to(tmpdir).as_posix() for p in written) == [
+            "a/doc.assets/img/a.png",
+            "a/doc.md",
+            "a/doc.meta.yml",
+        ]
+        assert (Path(tmpdir) / "empty").is_dir()
+
+        on_disk = Sidematter(Path(tmpdir) / "a/doc.md")
+        assert on_disk.read_meta() == {"title": "Doc"}
+        assert [(e.name, e.mtime_ns) for e in on_disk.list_assets()] == [
+            (e.name, e.mtime_ns) for e in Sidematter(Path("a/doc.md"), fs=fs).list_assets()
+        ]
@@ -0,0 +1,135 @@
+"""
+Tests for the shared metadata cache server and client.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import (
+    MetaCacheClient,
+    MetaCacheServer,
+    Sidematter,
+    SidematterError,
+    use_shared_meta_cache,
+)
+
+
+def _age(*paths: Path) -> None:
+    """Backdate files, so the server doesn't consider them too recent to cache."""
+    old = time.time() - 60
+    for path in paths:
+        os.utime(path, (old, old))
+
+
+def test_cached_lookups():
+    """
+    Lookups are served from the cache until a sidecar changes.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"title": "One", "tags": ["a"]})
+        _age(sm.meta_yaml_path)
+        with MetaCacheServer(Path(tmpdir) / "cache.sock").start() as server:
+            client = MetaCacheClient(server.socket_path)
+            for _ in range(3):
+                assert client.read_meta(sm.primary) == {"title": "One", "tags": ["a"]}
+            assert (server.hits, server.misses) == (2, 1)
+
+            # Recently modified files are read but not cached.
+            sm.write_meta({"title": "Two"})
+            assert client.read_meta(sm.primary) == {"title": "Two"}
+            assert client.read_meta(sm.primary) == {"title": "Two"}
+            assert server.misses == 3
+
+            # Adding a sidecar earlier in precedence, or a log entry, is seen.
+            sm.write_meta({"title": "Three"}, formats="json")
+            assert client.read_meta(sm.primary) == {"title": "Three"}
+            sm.patch_meta({"done": True})
+            assert client.read_meta(sm.primary) == {"title": "Three", "done": True}
+
+            other = Sidematter(Path(tmpdir) / "other.md")
+            other.primary.write_text("---\ntitle: Front\n---\nBody\n")
+            assert client.read_meta(other.primary) == {"title": "Front"}
+            assert client.read_meta(other.primary, use_frontmatter=False) == {}
+            client.close()
+
+
+def test_read_meta_uses_shared_cache():
+    """
+    `read_meta()` uses the shared cache when configured, and reads directly when the
+    server is gone or can't read the metadata.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"n": 1})
+        _age(sm.meta_yaml_path)
+        bad = Sidematter(Path(tmpdir) / "bad.md")
+        bad.meta_yaml_path.write_text("a: [unclosed\n")
+        socket_path = Path(tmpdir) / "cache.sock"
+        try:
+            with MetaCacheServer(socket_path).start() as server:
+                use_shared_meta_cache(socket_path, retry_interval=60)
+                assert sm.read_meta() == {"n": 1}
+                assert sm.read_meta() == {"n": 1}
+                assert server.hits == 1
+                with pytest.raises(SidematterError):
+                    bad.read_meta()
+
+            # The server is gone, so reads are direct.
+            assert not socket_path.exists()
+            start = time.perf_counter()
+            for _ in range(100):
+                assert sm.read_meta() == {"n": 1}
+            assert time.perf_counter() - start < 1.0
+        finally:
+            use_shared_meta_cache(None)
+
+
+def test_server_socket():
+    """
+    A socket left by a server that exited is replaced, but a live one or a file that
+    isn't a socket isn't.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = Path(tmpdir) / "cache.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(socket_path))
+        stale.close()
+        with MetaCacheServer(socket_path).start() as server:
+            assert socket_path.stat().st_mode & 0o777 == 0o600
+            with pytest.raises(FileExistsError):
+                MetaCacheServer(socket_path)
+            assert MetaCacheClient(server.socket_path).read_meta(Path(tmpdir) / "x.md") == {}
+        assert not socket_path.exists()
+        assert MetaCacheClient(socket_path).read_meta(Path(tmpdir) / "x.md") is None
+
+        # Anything other than a socket is left alone.
+        not_socket = Path(tmpdir) / "important.txt"
+        not_socket.write_text("data")
+        with pytest.raises(FileExistsError):
+            MetaCacheServer(not_socket)
+        assert not_socket.read_text() == "data"
+
+
+def test_client_checks_server_user(monkeypatch: pytest.MonkeyPatch):
+    """
+    Replies are only trusted from a server running as the same user, by the
+    credentials of the connection rather than the owner of the socket file.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"n": 1})
+        with MetaCacheServer(Path(tmpdir) / "cache.sock").start() as server:
+            assert MetaCacheClient(server.socket_path).read_meta(sm.primary) == {"n": 1}
+            uid = os.getuid()
+            monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+            client = MetaCacheClient(server.socket_path)
+            assert client.read_meta(sm.primary) is None
+            assert server.misses == 1
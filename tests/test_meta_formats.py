@@ -0,0 +1,154 @@
+"""
+Tests for the metadata format registry and the MessagePack sidecar format.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sidematter_format import MetaFormat, Sidematter, register_meta_format
+from sidematter_format.meta_formats import (
+    MetaEncodeOptions,
+    meta_format_for_path,
+    unregister_meta_format,
+)
+from sidematter_format.msgpack_codec import (
+    MsgpackError,
+    msgpack,
+    msgpack_dumps,
+    msgpack_loads,
+    py_msgpack_dumps,
+    py_msgpack_loads,
+)
+
+
+def test_msgpack_sidecar_roundtrip():
+    """
+    Metadata written as MessagePack reads back, and JSON/YAML still take precedence.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        primary = Path(tmpdir) / "doc.md"
+        primary.write_text("content")
+        sm = Sidematter(primary)
+
+        data = {"title": "Doc", "tags": ["a", "b"], "count": 3, "ratio": 0.5, "none": None}
+        path = sm.write_meta(data, formats="msgpack")
+        assert path == Path(tmpdir) / "doc.meta.msgpack"
+        assert sm.resolve_meta() == path
+        assert sm.read_meta() == data
+
+        sm.write_meta({"title": "YAML"})
+        assert sm.read_meta() == {"title": "YAML"}
+
+        # Renaming preserves the binary format.
+        sm.delete_meta(formats="yaml")
+        resolved = sm.resolve()
+        renamed = resolved.renamed_as(Path(tmpdir) / "other.md")
+        assert renamed.meta_path == Path(tmpdir) / "other.meta.msgpack"
+
+        # "all" deletes every registered format.
+        sm.delete_meta()
+        assert sm.resolve_meta() is None
+
+        with pytest.raises(ValueError):
+            sm.write_meta("title: raw", formats="msgpack")
+
+
+def test_write_several_formats():
+    """
+    Writing to several formats returns the path that takes precedence on read.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        path = sm.write_meta({"a": 1}, formats=["msgpack", "yaml"])
+        assert path == sm.meta_yaml_path
+        assert sm.meta_path_for("msgpack").exists()
+
+        assert sm.write_meta({"a": 1}, formats="all") == sm.meta_json_path
+
+        with pytest.raises(ValueError):
+            sm.write_meta({"a": 1}, formats="xml")
+
+
+CODEC_VALUES: list[Any] = [
+    None,
+    True,
+    0,
+    -1,
+    -33,
+    255,
+    65536,
+    2**63,
+    -(2**63),
+    1.5,
+    "",
+    "x" * 40,
+    "é" * 300,
+    b"\x00\x01",
+    list(range(20)),
+    {str(i): i for i in range(20)},
+    {"nested": [{"a": [1, {"b": None}]}]},
+]
+
+
+def test_pure_python_codec():
+    """
+    The pure-Python codec round-trips values and rejects invalid data.
+    """
+    for value in CODEC_VALUES:
+        assert py_msgpack_loads(py_msgpack_dumps(value)) == value
+
+    # Non-native values follow the JSON conventions.
+    assert py_msgpack_loads(py_msgpack_dumps({"d": date(2024, 1, 2)})) == {"d": "2024-01-02"}
+
+    with pytest.raises(MsgpackError):
+        py_msgpack_loads(py_msgpack_dumps("hello")[:-1])
+    with pytest.raises(MsgpackError):
+        py_msgpack_loads(py_msgpack_dumps(1) + b"\x00")
+
+
+@pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+def test_pure_python_codec_matches_msgpack():
+    """
+    The pure-Python codec writes the same bytes as the `msgpack` package and reads
+    what it writes.
+    """
+    for value in CODEC_VALUES:
+        encoded = msgpack_dumps(value)
+        assert py_msgpack_dumps(value) == encoded
+        assert py_msgpack_loads(encoded) == msgpack_loads(encoded)
+
+
+def test_register_custom_format():
+    """
+    Registered formats are resolved, read, and written like the built-in ones.
+    """
+
+    def encode(data: Any, _options: MetaEncodeOptions) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    fmt = MetaFormat("compact", ".meta.cjson", 15, encode, json.loads)
+    register_meta_format(fmt)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sm = Sidematter(Path(tmpdir) / "doc.md")
+            path = sm.write_meta({"a": [1, 2]}, formats="compact")
+            assert path.read_text() == '{"a":[1,2]}'
+            assert meta_format_for_path(path) == fmt
+
+            # Precedence 15 is between JSON and YAML.
+            sm.write_meta({"a": "yaml"})
+            assert sm.read_meta() == {"a": [1, 2]}
+            sm.write_meta({"a": "json"}, formats="json")
+            assert sm.read_meta() == {"a": "json"}
+    finally:
+        unregister_meta_format("compact")
+
+    with pytest.raises(ValueError):
+        register_meta_format(MetaFormat("all", ".meta.all", 50, encode, json.loads))
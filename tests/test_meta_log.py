@@ -0,0 +1,162 @@
+"""
+Tests for the append-only metadata log.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import MemoryFS, Sidematter, SidematterError, move_sidematter
+from sidematter_format.meta_log import (
+    apply_log,
+    compact_tmp_path,
+    encode_log_entry,
+    log_old_path,
+    merge_patch,
+    parse_log,
+)
+
+
+def test_merge_patch_and_apply_log():
+    """
+    Patches follow RFC 7386 and appends extend lists, without modifying the input.
+    """
+    target = {"a": "b", "c": {"d": "e", "f": "g"}, "h": [1]}
+    assert merge_patch(target, {"a": "z", "c": {"f": None}}) == {
+        "a": "z",
+        "c": {"d": "e"},
+        "h": [1],
+    }
+    assert merge_patch(target, {"c": [1, 2]})["c"] == [1, 2]
+    assert merge_patch({"a": [{"b": "c"}]}, {"a": [1]}) == {"a": [1]}
+
+    entries = parse_log(
+        encode_log_entry("append", {"h": 2})
+        + encode_log_entry("patch", {"a": None})
+        + encode_log_entry("append", {"h": 3, "new": "x"})
+    )
+    assert apply_log(target, entries) == {"c": {"d": "e", "f": "g"}, "h": [1, 2, 3], "new": ["x"]}
+    assert target == {"a": "b", "c": {"d": "e", "f": "g"}, "h": [1]}
+
+    with pytest.raises(ValueError):
+        apply_log({"a": "b"}, parse_log(encode_log_entry("append", {"a": 1})))
+    with pytest.raises(ValueError):
+        parse_log(b'{"patch": {}}\nnot json\n')
+    with pytest.raises(ValueError):
+        encode_log_entry("delete", {})
+
+    # An interrupted final append is ignored.
+    assert parse_log(b'{"patch": {"a": 1}}\n{"patch": {"a"') == [{"patch": {"a": 1}}]
+
+
+def test_patch_and_append_meta():
+    """
+    Changes are appended to the log without rewriting the sidecar, and read on top of it.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"title": "Doc", "history": []})
+        base = sm.meta_yaml_path.read_bytes()
+
+        sm.patch_meta({"title": "Doc v2", "author": "Ann"})
+        for i in range(3):
+            sm.append_meta("history", {"version": i})
+
+        assert sm.meta_yaml_path.read_bytes() == base
+        assert len(sm.meta_log_path.read_text().splitlines()) == 4
+        assert sm.read_meta() == {
+            "title": "Doc v2",
+            "author": "Ann",
+            "history": [{"version": 0}, {"version": 1}, {"version": 2}],
+        }
+        assert sm.resolve().meta == sm.read_meta()
+
+        # Writing metadata replaces it, log included.
+        sm.write_meta({"title": "New"})
+        assert not sm.meta_log_path.exists()
+        assert sm.read_meta() == {"title": "New"}
+
+        sm.meta_log_path.write_text("{}\n")
+        with pytest.raises(SidematterError):
+            sm.read_meta()
+        sm.delete_meta()
+        assert not sm.meta_log_path.exists()
+
+
+def test_compaction():
+    """
+    The log is merged into the sidecars once it passes the size threshold.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        sm.write_meta({"title": "Doc"}, formats="all")
+
+        for i in range(20):
+            sm.append_meta("history", i, compact_bytes=100)
+            assert not sm.meta_log_path.exists() or sm.meta_log_path.stat().st_size <= 100
+        assert sm.read_meta() == {"title": "Doc", "history": list(range(20))}
+
+        sm.patch_meta({"title": "Done"}, compact_bytes=None)
+        assert sm.compact_meta() == sm.meta_json_path
+        assert sm.compact_meta() is None
+        assert not sm.meta_log_path.exists()
+        for meta_path in (sm.meta_json_path, sm.meta_yaml_path):
+            assert Sidematter(sm.primary).read_meta() == {
+                "title": "Done",
+                "history": list(range(20)),
+            }
+            meta_path.unlink()
+
+        # Frontmatter is kept when there is no sidecar.
+        sm.primary.write_text("---\ntitle: Front\n---\nBody\n")
+        sm.patch_meta({"draft": True})
+        assert sm.compact_meta() == sm.meta_yaml_path
+        assert sm.read_meta() == {"title": "Front", "draft": True}
+
+
+def test_interrupted_compaction():
+    """
+    Reads are unaffected by an interrupted compaction, and the next write completes or
+    undoes it.
+    """
+    fs = MemoryFS()
+    sm = Sidematter(Path("doc.md"), fs=fs)
+    sm.write_meta({"title": "Doc"})
+    sm.append_meta("history", 1)
+    tmp = compact_tmp_path(sm.meta_yaml_path)
+    old = log_old_path(sm.meta_log_path)
+
+    # Interrupted before the log was copied aside: the temporary file is ignored.
+    fs.write_bytes(tmp, b"title: Partial\n")
+    assert sm.read_meta() == {"title": "Doc", "history": [1]}
+    sm.compact_meta()
+    assert not fs.exists(tmp)
+    assert sm.read_meta() == {"title": "Doc", "history": [1]}
+
+    # Interrupted after the log was copied aside: the new sidecar is used and the log
+    # isn't applied again.
+    sm.append_meta("history", 2)
+    fs.write_bytes(tmp, b"title: Doc\nhistory: [1, 2]\n")
+    fs.copy_file(sm.meta_log_path, old)
+    assert sm.read_meta() == {"title": "Doc", "history": [1, 2]}
+    sm.append_meta("history", 3)
+    assert not fs.exists(tmp)
+    assert not fs.exists(old)
+    assert sm.read_meta() == {"title": "Doc", "history": [1, 2, 3]}
+
+    # Interrupted after the log was removed but not its copy: the copy is ignored by
+    # reads and removed by the next write.
+    sm.compact_meta()
+    fs.write_bytes(old, b"")
+    assert sm.read_meta() == {"title": "Doc", "history": [1, 2, 3]}
+    sm.append_meta("history", 4)
+    assert not fs.exists(old)
+    assert sm.read_meta() == {"title": "Doc", "history": [1, 2, 3, 4]}
+
+    # Moving the document moves the log with it.
+    fs.write_bytes(sm.primary, b"# Doc\n")
+    moved = move_sidematter("doc.md", "out/doc.md", fs=fs)
+    assert Sidematter(moved.primary, fs=fs).read_meta() == {"title": "Doc", "history": [1, 2, 3, 4]}
@@ -0,0 +1,80 @@
+"""
+Tests for finding and removing orphaned sidecars.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from sidematter_format import Orphan, Sidematter, collect_orphans, find_orphans
+
+
+def _make_tree(root: Path) -> None:
+    # Documents with sidecars, including one without a suffix and one with two.
+    for name in ("report.md", "notes", "data.tar.gz"):
+        sm = Sidematter(root / name)
+        sm.primary.write_text("x")
+        sm.write_meta({"name": name})
+        sm.asset_path("a.txt").parent.mkdir()
+        sm.asset_path("a.txt").write_text("asset")
+    # Orphans of a deleted document.
+    Sidematter(root / "gone.md").write_meta({"title": "Gone"}, formats=["yaml", "json"])
+    Sidematter(root / "gone.md").append_meta("history", 1)
+    (root / "gone.assets").mkdir()
+    (root / "gone.assets" / "img.png").write_bytes(b"12345")
+    # A file named like an assets directory is a document, not a sidecar.
+    (root / "file.assets").write_text("x")
+    # Nested directories are walked, but not assets directories.
+    sub = root / "sub"
+    sub.mkdir()
+    (sub / "lost.meta.json").write_text("{}")
+    (root / "report.assets" / "inner.meta.yml").write_text("a: 1\n")
+
+
+def test_find_orphans():
+    """
+    Sidecars with no primary of the same stem are found, and nothing else is.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _make_tree(root)
+
+        orphans = sorted(find_orphans(root), key=lambda o: o.path)
+        assert orphans == [
+            Orphan(root / "gone.assets", True),
+            Orphan(root / "gone.meta.json", False),
+            Orphan(root / "gone.meta.log.jsonl", False),
+            Orphan(root / "gone.meta.yml", False),
+            Orphan(root / "sub" / "lost.meta.json", False),
+        ]
+
+        # A primary with any suffix claims the sidecars.
+        (root / "gone.txt").write_text("back")
+        assert [o.path for o in find_orphans(root)] == [root / "sub" / "lost.meta.json"]
+
+
+def test_collect_orphans():
+    """
+    Orphans are removed, and a dry run only reports them.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _make_tree(root)
+
+        report = collect_orphans(root, dry_run=True)
+        assert len(report.orphans) == 5
+        assert report.removed == []
+        assert report.total_bytes > 5
+        assert (root / "gone.assets").is_dir()
+
+        report = collect_orphans(root, workers=4)
+        assert sorted(report.removed) == sorted(o.path for o in report.orphans)
+        assert report.errors == {}
+        assert not (root / "gone.assets").exists()
+        assert not (root / "gone.meta.yml").exists()
+        assert Sidematter(root / "report.md").read_meta() == {"name": "report.md"}
+        assert Sidematter(root / "notes").read_meta() == {"name": "notes"}
+        assert (root / "report.assets" / "inner.meta.yml").exists()
+        assert (root / "file.assets").exists()
+        assert find_orphans(root) == []
@@ -0,0 +1,95 @@
+"""
+Tests for packed sidematter snapshots.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import SHARDED_LAYOUT, PackFS, Sidematter, build_pack
+
+
+def _make_tree(root: Path) -> list[Path]:
+    docs: list[Path] = []
+    for i in range(30):
+        sm = Sidematter(root / f"dir{i % 3}" / f"doc{i}.md")
+        sm.primary.parent.mkdir(parents=True, exist_ok=True)
+        sm.primary.write_text(f"# Doc {i}\n")
+        sm.write_meta({"i": i, "title": f"Doc {i}"}, formats="json" if i % 2 else "yaml")
+        docs.append(Path(f"dir{i % 3}") / f"doc{i}.md")
+    logged = Sidematter(root / "dir0" / "doc0.md")
+    logged.append_meta("history", "v1")
+    logged.add_asset(root / "dir1" / "doc1.md", dest_name="small.txt")
+    logged.asset_path("big.bin").write_bytes(b"x" * 10_000)
+    sharded = Sidematter(root / "dir1" / "doc4.md")
+    sharded.set_asset_layout(SHARDED_LAYOUT)
+    sharded.add_asset(root / "dir1" / "doc1.md", dest_name="page.txt")
+    return docs
+
+
+def test_pack_read_meta():
+    """
+    Metadata read through a pack matches metadata read from the tree.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "tree"
+        docs = _make_tree(root)
+        pack_path = Path(tmpdir) / "tree.smpack"
+
+        count = build_pack(root, pack_path, max_asset_size=1000, workers=4)
+        # Metadata, one log, two small assets, and one layout file.
+        assert count == 30 + 1 + 2 + 1
+
+        with PackFS(pack_path) as pack:
+            for doc in docs:
+                expected = Sidematter(root / doc).read_meta()
+                assert Sidematter(doc, fs=pack).read_meta() == expected
+            assert Sidematter(Path("dir0/doc0.md"), fs=pack).read_meta()["history"] == ["v1"]
+            assert Sidematter(Path("dir0/missing.md"), fs=pack).read_meta() == {}
+
+            sm = Sidematter(Path("dir0/doc0.md"), fs=pack)
+            resolved = sm.resolve()
+            assert resolved.meta_path == Path("dir0/doc0.meta.yml")
+            assert resolved.assets_dir == Path("dir0/doc0.assets")
+            assert sm.read_asset("small.txt") == b"# Doc 1\n"
+            assert [e.name for e in sm.list_assets()] == ["small.txt"]
+            sharded = Sidematter(Path("dir1/doc4.md"), fs=pack)
+            assert sharded.read_asset("page.txt") == b"# Doc 1\n"
+
+            assert pack.is_dir(Path("dir2"))
+            assert pack.is_dir(Path("dir1/doc4.assets"))
+            assert [e.name for e in pack.iter_files(Path("dir1/doc4.assets"))] == [
+                ".sidematter-layout.json",
+                SHARDED_LAYOUT.shard_path("page.txt"),
+            ]
+            assert list(pack.iter_files(Path("dir0/doc0.meta.yml"))) == []
+            assert len(list(pack.iter_files(Path("")))) == count
+            assert not pack.is_dir(Path("dir"))
+            assert not pack.exists(Path("dir0/doc0.assets/big.bin"))
+            with pytest.raises(FileNotFoundError):
+                pack.read_bytes(Path("dir0/doc0.md"))
+            with pytest.raises(IsADirectoryError):
+                pack.read_bytes(Path("dir0"))
+
+
+def test_pack_edge_cases():
+    """
+    Empty trees pack, and other files aren't mistaken for packs.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "empty"
+        root.mkdir()
+        pack_path = Path(tmpdir) / "empty.smpack"
+        assert build_pack(root, pack_path) == 0
+        with PackFS(pack_path) as pack:
+            assert pack.is_dir(Path(""))
+            assert not pack.exists(Path("a.meta.yml"))
+            assert list(pack.iter_files(Path(""))) == []
+
+        other = Path(tmpdir) / "other.txt"
+        other.write_text("not a pack, but long enough to have a header")
+        with pytest.raises(ValueError):
+            PackFS(other)
@@ -0,0 +1,162 @@
+"""
+Tests for the per-directory sidecar cache.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sidematter_format import LocalFS, SidecarCache, Sidematter
+
+
+def _age_dir(path: Path) -> None:
+    """
+    Set a directory's modification time in the past, so its listing isn't racy.
+    """
+    old_ns = time.time_ns() - 10_000_000_000
+    os.utime(path, ns=(old_ns, old_ns))
+
+
+def _record_stats(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    checked: list[Path] = []
+    exists, is_dir = Path.exists, Path.is_dir
+
+    def recording_exists(self: Path, *args: bool, **kwargs: bool) -> bool:
+        checked.append(self)
+        return exists(self, *args, **kwargs)
+
+    def recording_is_dir(self: Path, *args: bool, **kwargs: bool) -> bool:
+        checked.append(self)
+        return is_dir(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "exists", recording_exists)
+    monkeypatch.setattr(Path, "is_dir", recording_is_dir)
+    return checked
+
+
+def test_lookups_without_sidecars(monkeypatch: pytest.MonkeyPatch):
+    """
+    Documents without sidecars are resolved from the directory listing, with no
+    check of each possible sidecar path.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for i in range(5):
+            (root / f"doc{i}.md").write_text(f"# Doc {i}\n")
+        with_meta = Sidematter(root / "doc0.md")
+        with_meta.write_meta({"title": "Zero"})
+        with_meta.asset_path("a.png").parent.mkdir()
+        _age_dir(root)
+
+        cache = SidecarCache()
+        fs = LocalFS(sidecar_cache=cache)
+        checked = _record_stats(monkeypatch)
+
+        for i in range(1, 5):
+            sm = Sidematter(root / f"doc{i}.md", fs=fs)
+            assert sm.resolve_meta() is None
+            assert sm.resolve_assets() is None
+        resolved = Sidematter(root / "doc0.md", fs=fs).resolve(parse_meta=False)
+        assert resolved.meta_path == root / "doc0.meta.yml"
+        assert resolved.assets_dir == root / "doc0.assets"
+        assert checked == []
+
+        # Other paths are still checked on disk.
+        assert fs.exists(root / "doc1.md")
+        assert checked == [root / "doc1.md"]
+
+
+def test_cache_sees_changes():
+    """
+    New sidecars are seen after the directory changes, whether written through the
+    cached filesystem or not.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / "doc.md").write_text("# Doc\n")
+        _age_dir(root)
+
+        fs = LocalFS(sidecar_cache=SidecarCache())
+        sm = Sidematter(root / "doc.md", fs=fs)
+        assert sm.resolve_meta() is None
+
+        # Written elsewhere: the directory's modification time changes.
+        Sidematter(root / "doc.md").write_meta({"title": "Doc"})
+        assert sm.resolve_meta() == root / "doc.meta.yml"
+
+        sm.delete_meta()
+        assert sm.resolve_meta() is None
+
+        # Nested directories created by a write are seen too.
+        fs.write_bytes(root / "sub/doc.assets/a.png", b"png")
+        assert Sidematter(root / "sub/doc.md", fs=fs).resolve_assets() == root / "sub/doc.assets"
+
+
+def test_ttl():
+    """
+    With a ttl, changes made outside the cached filesystem can be missed until the ttl
+    expires, but changes made through it are seen at once.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / "doc.md").write_text("# Doc\n")
+        _age_dir(root)
+
+        cache = SidecarCache(ttl=3600)
+        fs = LocalFS(sidecar_cache=cache)
+        sm = Sidematter(root / "doc.md", fs=fs)
+        assert sm.resolve_meta() is None
+
+        (root / "doc.meta.json").write_text("{}")
+        assert sm.resolve_meta() is None
+        cache.invalidate(root)
+        assert sm.resolve_meta() == root / "doc.meta.json"
+
+        _age_dir(root)
+        assert sm.resolve_meta() == root / "doc.meta.json"
+        sm.delete_meta()
+        assert sm.resolve_meta() is None
+        sm.write_meta({"title": "Doc"})
+        assert sm.resolve_meta() == root / "doc.meta.yml"
+
+
+def test_recently_changed_directory(monkeypatch: pytest.MonkeyPatch):
+    """
+    A directory changed too recently to list reliably isn't listed again on every
+    lookup: single paths are checked instead until it settles.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for i in range(5):
+            (root / f"doc{i}.md").write_text(f"# Doc {i}\n")
+
+        scans: list[str] = []
+        scandir = os.scandir
+
+        def recording_scandir(path: str) -> Any:
+            scans.append(path)
+            return scandir(path)
+
+        monkeypatch.setattr(os, "scandir", recording_scandir)
+        fs = LocalFS(sidecar_cache=SidecarCache())
+        for i in range(5):
+            sm = Sidematter(root / f"doc{i}.md", fs=fs)
+            assert sm.resolve_meta() is None
+            sm.write_meta({"i": i})
+            assert sm.resolve_meta() == sm.meta_yaml_path
+        assert len(scans) == 1
+
+        # Once settled, the directory is listed again and lookups use the listing.
+        _age_dir(root)
+        later_ns = time.time_ns() + 10_000_000_000
+        monkeypatch.setattr(time, "time_ns", lambda: later_ns)
+        checked = _record_stats(monkeypatch)
+        assert Sidematter(root / "doc3.md", fs=fs).resolve_meta() == root / "doc3.meta.yml"
+        assert len(scans) == 2
+        assert checked == []
@@ -0,0 +1,125 @@
+"""
+Tests for directory-fd-relative sidematter operations.
+"""
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import Sidematter, SidematterDir, SidematterError
+from sidematter_format.meta_log import compact_tmp_path, log_old_path
+
+
+def test_dir_read_and_resolve():
+    """Test resolving and reading metadata relative to an open directory."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        doc = tmpdir / "doc.md"
+        doc.write_text("# Doc")
+        sm = Sidematter(doc)
+        sm.write_meta({"title": "YAML"}, formats="yaml")
+        sm.assets_dir.mkdir()
+
+        with SidematterDir(tmpdir) as sd:
+            assert sd.resolve_meta("doc.md") == sm.meta_yaml_path
+            assert sd.read_meta("doc.md") == {"title": "YAML"}
+
+            # JSON takes precedence, as with path-based resolution
+            sm.write_meta({"title": "JSON"}, formats="json")
+            resolved = sd.resolve("doc.md")
+            assert resolved == sm.resolve()
+            assert resolved.meta == {"title": "JSON"}
+            assert resolved.assets_dir == sm.assets_dir
+
+            assert sd.resolve_meta("missing.md") is None
+            assert sd.read_meta("missing.md") == {}
+
+        assert sd.dir_fd is None
+
+
+def test_dir_write_delete_and_errors():
+    """Test writing and deleting metadata relative to an open directory."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        sm = Sidematter(tmpdir / "doc.md")
+
+        with SidematterDir(tmpdir) as sd:
+            assert sd.write_meta("doc.md", {"a": 1}, formats="all") == sm.meta_json_path
+            assert sm.read_meta() == {"a": 1}
+            assert sm.meta_yaml_path.read_text() == "a: 1\n"
+            assert sorted(p.name for p in tmpdir.iterdir()) == ["doc.meta.json", "doc.meta.yml"]
+
+            sd.delete_meta("doc.md", formats="json")
+            assert sd.resolve_meta("doc.md") == sm.meta_yaml_path
+            sd.delete_meta("doc.md")
+            assert sd.resolve_meta("doc.md") is None
+
+            sm.meta_json_path.write_text("{ invalid")
+            with pytest.raises(SidematterError, match="Error loading metadata"):
+                sd.read_meta("doc.md")
+
+            with pytest.raises(ValueError, match="plain filename"):
+                sd.read_meta("sub/doc.md")
+
+
+def test_dir_metadata_log():
+    """Test the metadata log is applied on read and replaced by writes."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        sm = Sidematter(tmpdir / "doc.md")
+        sm.write_meta({"t": 1, "tags": ["a"]})
+        sm.patch_meta({"t": 2})
+        sm.append_meta("tags", "b")
+
+        with SidematterDir(tmpdir) as sd:
+            assert sd.read_meta("doc.md") == {"t": 2, "tags": ["a", "b"]}
+
+            sd.write_meta("doc.md", {"t": 3})
+            assert not sm.meta_log_path.exists()
+            assert sm.read_meta() == sd.read_meta("doc.md") == {"t": 3}
+
+            sm.patch_meta({"t": 4})
+            sd.delete_meta("doc.md")
+            assert not sm.meta_log_path.exists()
+            assert sm.read_meta() == {}
+
+            sm.write_meta({"t": 5})
+            sm.patch_meta({"t": 6})
+            sd.rename_sidematter("doc.md", "new.md")
+            assert sd.read_meta("new.md") == {"t": 6}
+            assert not sm.meta_log_path.exists()
+
+            # A committed but unfinished compaction is read like `Sidematter` reads it.
+            new = Sidematter(tmpdir / "new.md")
+            new.patch_meta({"t": 7})
+            compact_tmp_path(new.meta_yaml_path).write_text("t: 7\ncompacted: true\n")
+            shutil.copy(new.meta_log_path, log_old_path(new.meta_log_path))
+            assert sd.read_meta("new.md") == new.read_meta() == {"t": 7, "compacted": True}
+
+
+def test_dir_rename_sidematter():
+    """Test renaming a primary with its sidematter within one directory."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        src = Sidematter(tmpdir / "a.md")
+        src.primary.write_text("A")
+        src.write_meta({"title": "A"})
+        src.assets_dir.mkdir()
+        (src.assets_dir / "x.png").write_text("x")
+
+        with SidematterDir(tmpdir) as sd:
+            result = sd.rename_sidematter("a.md", "b.md")
+
+        dest = Sidematter(tmpdir / "b.md")
+        assert result.primary == dest.primary
+        assert result.meta_path == dest.meta_yaml_path
+        assert result.assets_dir == dest.assets_dir
+        assert dest.read_meta() == {"title": "A"}
+        assert (dest.assets_dir / "x.png").read_text() == "x"
+        assert not src.primary.exists()
+        assert src.resolve_meta() is None
+        assert src.resolve_assets() is None
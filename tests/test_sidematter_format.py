@@ -426,6 +426,45 @@ def test_copy_assets_from():
             sm.copy_assets_from(Path(tmpdir) / "nonexistent")
 
 
+def test_import_assets():
+    """Test import_assets keeps structure and skips unchanged files."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "test.md")
+
+        src_dir = Path(tmpdir) / "src"
+        (src_dir / "a").mkdir(parents=True)
+        (src_dir / "b").mkdir()
+        (src_dir / "a" / "same.txt").write_text("from a")
+        (src_dir / "b" / "same.txt").write_text("from b")
+        (src_dir / "top.png").write_text("top")
+
+        report = sm.import_assets(src_dir, workers=4)
+        assert sorted(p.relative_to(sm.assets_dir).as_posix() for p in report.copied) == [
+            "a/same.txt",
+            "b/same.txt",
+            "top.png",
+        ]
+        assert report.unchanged == [] and report.errors == {}
+        assert sm.asset_path("a/same.txt").read_text() == "from a"
+        assert sm.asset_path("b/same.txt").read_text() == "from b"
+        assert (
+            sm.asset_path("top.png").stat().st_mtime_ns == (src_dir / "top.png").stat().st_mtime_ns
+        )
+
+        # Only changed files are copied again.
+        (src_dir / "top.png").write_text("changed")
+        report = sm.import_assets(src_dir)
+        assert report.copied == [sm.asset_path("top.png")]
+        assert len(report.unchanged) == 2
+        assert sm.asset_path("top.png").read_text() == "changed"
+
+        report = sm.import_assets(src_dir, glob="a/*", skip_unchanged=False)
+        assert report.copied == [sm.asset_path("a/same.txt")]
+
+        with pytest.raises(ValueError, match="is not a directory"):
+            sm.import_assets(Path(tmpdir) / "nonexistent")
+
+
 ## Convenience Function Tests
 
 
@@ -0,0 +1,118 @@
+"""
+Tests for reading sidematter from zip and tar archives.
+"""
+
+from __future__ import annotations
+
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from sidematter_format import Sidematter, SidematterError, TarFS, ZipFS, archive_fs
+from sidematter_format.sidematter_fs import ArchiveFS, clear_archive_cache
+
+
+def _make_tree(root: Path) -> None:
+    sm = Sidematter(root / "docs" / "report.md")
+    sm.primary.parent.mkdir(parents=True)
+    sm.primary.write_text("# Report\n")
+    sm.write_meta({"title": "Report", "tags": ["a", "b"]})
+    (sm.assets_dir / "img").mkdir(parents=True)
+    sm.asset_path("img/chart.png").write_bytes(b"\x89PNG chart")
+    sm.asset_path("notes.txt").write_text("notes")
+
+    (root / "docs" / "plain.md").write_text("---\ntitle: From Frontmatter\n---\nBody\n")
+
+
+def _make_archives(tmp: Path) -> list[ArchiveFS]:
+    src = tmp / "src"
+    _make_tree(src)
+    files = sorted(p for p in src.rglob("*") if p.is_file())
+
+    # Zip without directory entries, so directories are only implied by file paths.
+    zip_path = tmp / "docs.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for p in files:
+            zf.write(p, p.relative_to(src).as_posix())
+
+    tar_path = tmp / "docs.tar"
+    with tarfile.open(tar_path, "w") as tf:
+        tf.add(src / "docs", "./docs")
+
+    tgz_path = tmp / "docs.tar.gz"
+    with tarfile.open(tgz_path, "w:gz") as tf:
+        tf.add(src / "docs", "docs")
+
+    tgz_fs = archive_fs(tgz_path)
+    assert isinstance(tgz_fs, TarFS)
+    return [ZipFS(zip_path), TarFS(tar_path), tgz_fs]
+
+
+def test_read_from_archives():
+    """
+    Metadata, frontmatter, and assets are read from archives without extraction.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fs in _make_archives(Path(tmpdir)):
+            sm = Sidematter(Path("docs/report.md"), fs=fs)
+            resolved = sm.resolve()
+            assert resolved.meta == {"title": "Report", "tags": ["a", "b"]}
+            assert resolved.meta_path == Path("docs/report.meta.yml")
+            assert resolved.assets_dir == Path("docs/report.assets")
+
+            assert [(e.name, e.size) for e in sm.list_assets()] == [
+                ("img/chart.png", 10),
+                ("notes.txt", 5),
+            ]
+            assert sm.read_asset("img/chart.png") == b"\x89PNG chart"
+            with fs.open_read(sm.asset_path("notes.txt")) as f:
+                assert f.read() == b"notes"
+            with pytest.raises(FileNotFoundError):
+                sm.read_asset("missing.png")
+
+            plain = Sidematter(Path("docs/plain.md"), fs=fs)
+            assert plain.resolve_meta() is None
+            assert plain.read_meta() == {"title": "From Frontmatter"}
+            assert plain.resolve_assets() is None
+
+            with pytest.raises(SidematterError):
+                sm.write_meta({"title": "New"})
+
+
+def test_archive_index_cache():
+    """
+    Archive indexes are reused across lookups and rebuilt when the archive changes, and
+    replaced or cleared indexes are closed.
+    """
+    clear_archive_cache()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        zip_path = Path(tmpdir) / "a.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("a.md", "a")
+            zf.writestr("a.meta.json", '{"v": 1}')
+
+        fs = ZipFS(zip_path)
+        index = fs.index()
+        assert ZipFS(zip_path).index() is index
+        assert Sidematter(Path("a.md"), fs=fs).read_meta() == {"v": 1}
+
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("a.md", "a")
+            zf.writestr("a.meta.json", '{"v": 22}')
+
+        new_index = fs.index()
+        assert new_index is not index
+        assert index.closed and not new_index.closed
+        assert Sidematter(Path("a.md"), fs=fs).read_meta() == {"v": 22}
+
+        clear_archive_cache()
+        assert new_index.closed
+        assert Sidematter(Path("a.md"), fs=fs).read_meta() == {"v": 22}
+
+        not_archive = Path(tmpdir) / "a.md"
+        not_archive.write_text("a")
+        with pytest.raises(ValueError):
+            archive_fs(not_archive)
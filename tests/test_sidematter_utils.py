@@ -14,8 +14,11 @@ from sidematter_format import (
     Sidematter,
     copy_sidematter,
     move_sidematter,
+    recover_moves,
     remove_sidematter,
+    sidematter_utils,
 )
+from sidematter_format.cross_device_move import JOURNAL_SUFFIX, MoveItem, MoveJournal
 
 
 def create_test_file_with_sidematter(base_path: Path) -> None:
@@ -213,6 +216,75 @@ def test_move_make_parents():
         assert result.primary == dest
 
 
+def test_move_cross_device(monkeypatch: pytest.MonkeyPatch):
+    """Test a journaled cross-device move leaves only the destination behind."""
+
+    def always_cross_device(_src: str | Path, _dest: str | Path) -> bool:
+        return True
+
+    monkeypatch.setattr(sidematter_utils, "is_cross_device", always_cross_device)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        src = tmpdir / "source.md"
+        dest = tmpdir / "other" / "dest.md"
+
+        create_test_file_with_sidematter(src)
+        (Sidematter(src).assets_dir / "sub").mkdir()
+        (Sidematter(src).assets_dir / "sub" / "nested.txt").write_text("nested")
+
+        result = move_sidematter(src, dest, workers=4)
+
+        src_sp = Sidematter(src)
+        assert not src.exists()
+        assert not src_sp.meta_json_path.exists()
+        assert not src_sp.assets_dir.exists()
+
+        dest_sp = Sidematter(dest)
+        assert dest.read_text() == "# Test Document\n\nThis is a test document."
+        assert dest_sp.read_meta() == {"title": "Test", "author": "Test User"}
+        assert (dest_sp.assets_dir / "image.png").read_text() == "fake png data"
+        assert (dest_sp.assets_dir / "sub" / "nested.txt").read_text() == "nested"
+        assert result.meta_path == dest_sp.meta_json_path
+        assert result.assets_dir == dest_sp.assets_dir
+
+        # No journal or temporary files are left behind
+        assert sorted(p.name for p in dest.parent.iterdir()) == [
+            "dest.assets",
+            "dest.md",
+            "dest.meta.json",
+        ]
+
+
+def test_recover_moves():
+    """Test interrupted cross-device moves are rolled back or forward."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir).absolute()
+        src = tmpdir / "a.md"
+        dest = tmpdir / "b.md"
+        tmp = tmpdir / "b.md.x.partial"
+
+        # Interrupted while copying: the partial copy is discarded and the source kept.
+        src.write_text("content")
+        tmp.write_text("cont")
+        item = MoveItem(src=str(src), dest=str(dest), tmp=str(tmp), is_dir=False)
+        MoveJournal(tmpdir / f".x{JOURNAL_SUFFIX}", "copying", [item]).save()
+
+        assert len(recover_moves(tmpdir)) == 1
+        assert src.read_text() == "content"
+        assert not tmp.exists()
+        assert not dest.exists()
+
+        # Interrupted after copying: the move is completed.
+        tmp.write_text("content")
+        MoveJournal(tmpdir / f".x{JOURNAL_SUFFIX}", "copied", [item]).save()
+
+        assert len(recover_moves(tmpdir)) == 1
+        assert dest.read_text() == "content"
+        assert not src.exists()
+        assert not tmp.exists()
+        assert recover_moves(tmpdir) == []
+
+
 ## Remove Tests
 
 
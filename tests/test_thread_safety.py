@@ -0,0 +1,182 @@
+"""
+Stress tests for using sidematter from many threads at once. These also run on
+free-threaded Python builds, where there is no GIL to serialize them.
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, make_dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from frontmatter_format import yaml_util
+
+from sidematter_format import (
+    Sidematter,
+    register_default_yaml_representers,
+    register_json_encoder,
+    to_json_string,
+)
+from sidematter_format.meta_formats import (
+    get_meta_format,
+    meta_formats,
+    register_meta_format,
+    unregister_meta_format,
+)
+from sidematter_format.typed_meta import decode_model
+from sidematter_format.yaml_conventions import yaml_dumps
+
+THREADS = 8
+
+
+def _run_together(fn: Callable[[int], Any], threads: int = THREADS) -> list[Any]:
+    """
+    Run `fn(i)` on `threads` threads, released at the same moment.
+    """
+    barrier = threading.Barrier(threads)
+
+    def run(i: int) -> Any:
+        barrier.wait()
+        return fn(i)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(run, range(threads)))
+
+
+def test_register_default_yaml_representers():
+    """
+    Concurrent registration adds the representers once.
+    """
+    before = len(yaml_util._default_yaml_customizers)  # pyright: ignore[reportPrivateUsage]
+    _run_together(lambda _i: register_default_yaml_representers())
+    register_default_yaml_representers()
+    after = len(yaml_util._default_yaml_customizers)  # pyright: ignore[reportPrivateUsage]
+    assert after - before in (0, 4)
+
+
+class Color(Enum):
+    RED = "red"
+
+
+def test_yaml_dumps_key_sorts():
+    """
+    Dumpers with different key sorts don't affect each other, in any thread.
+    """
+    register_default_yaml_representers()
+    data = {"b": 1, "a": 2, "c": Color.RED}
+
+    def by_name(k: str) -> str:
+        return k
+
+    def dump(i: int) -> list[str]:
+        return [yaml_dumps(data, key_sort=by_name if (i + j) % 2 else None) for j in range(50)]
+
+    for i, outputs in enumerate(_run_together(dump)):
+        for j, text in enumerate(outputs):
+            if (i + j) % 2:
+                assert text == "a: 2\nb: 1\nc: red\n"
+            else:
+                assert text == "b: 1\na: 2\nc: red\n"
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+def test_json_encoders():
+    """
+    Encoding while encoders are registered never uses a stale cached encoder.
+    """
+
+    def encode(i: int) -> None:
+        for _ in range(200):
+            if i == 0:
+                register_json_encoder(Point, lambda p: [p.x, p.y])
+            else:
+                assert to_json_string(Point(1, 2), indent=None) in ('{"x": 1, "y": 2}', "[1, 2]")
+
+    _run_together(encode)
+    assert to_json_string(Point(1, 2), indent=None) == "[1, 2]"
+
+
+def test_meta_format_registry():
+    """
+    Registering formats concurrently loses none of them, and readers always see the
+    built-in formats.
+    """
+    json_format = get_meta_format("json")
+    names = [f"fmt{i}" for i in range(THREADS)]
+
+    def register(i: int) -> None:
+        fmt = json_format.__class__(
+            names[i], f".meta.x{i}", 100 + i, json_format.encode, json_format.decode
+        )
+        for _ in range(20):
+            register_meta_format(fmt)
+            assert {"json", "yaml"} <= {f.name for f in meta_formats()}
+
+    try:
+        _run_together(register)
+        assert {f.name for f in meta_formats()} >= set(names)
+    finally:
+        for name in names:
+            unregister_meta_format(name)
+
+
+def test_concurrent_read_meta():
+    """
+    Many threads resolving and reading metadata (YAML, JSON, and frontmatter) get the
+    same results as a single thread.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        paths: list[Path] = []
+        for i in range(30):
+            sm = Sidematter(root / f"doc{i}.md")
+            if i % 3 == 0:
+                sm.write_meta({"i": i, "tags": ["a", "b"]})
+            elif i % 3 == 1:
+                sm.write_meta({"i": i, "nested": {"k": "v"}}, formats="json")
+            else:
+                sm.primary.write_text(f"---\ni: {i}\n---\nBody\n")
+            paths.append(sm.primary)
+        expected = [Sidematter(p).resolve() for p in paths]
+
+        def read(_i: int) -> list[Any]:
+            return [Sidematter(p).resolve() for _ in range(5) for p in paths]
+
+        for results in _run_together(read):
+            assert results == expected * 5
+
+
+def test_concurrent_decoder_compilation():
+    """
+    Threads decoding recursive types while others compile them never see an unfinished
+    decoder.
+    """
+    types: list[type[Any]] = []
+    for i in range(100):
+        node = make_dataclass(f"Node{i}", [("value", int), ("children", "list[Any]")])
+        node.__annotations__["children"] = list[node]  # pyright: ignore[reportIndexIssue]
+        types.append(node)
+    meta = {"value": 1, "children": [{"value": 2, "children": []}]}
+
+    def decode(i: int) -> None:
+        for tp in types[i % 2 :] + types[: i % 2]:
+            decoded = decode_model(tp, meta)
+            assert decoded.children[0].value == 2
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        _run_together(decode)
+    finally:
+        sys.setswitchinterval(interval)
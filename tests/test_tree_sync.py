@@ -0,0 +1,95 @@
+"""
+Tests for syncing trees of documents.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+from sidematter_format import Sidematter, sync_tree
+
+
+def _make_doc(path: Path, title: str) -> Sidematter:
+    sm = Sidematter(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"# {title}\n")
+    sm.write_meta({"title": title})
+    sm.asset_path("img.png").parent.mkdir(exist_ok=True)
+    sm.asset_path("img.png").write_text(title)
+    return sm
+
+
+def _files(root: Path) -> dict[str, str]:
+    return {
+        p.relative_to(root).as_posix(): p.read_text()
+        for p in sorted(root.rglob("*"))
+        if p.is_file()
+    }
+
+
+def test_sync_tree():
+    """
+    Only changed units are copied, and sidematter removed at the source is removed at
+    the destination.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "src"
+        dst = Path(tmpdir) / "dst"
+        _make_doc(src / "a.md", "A")
+        b = _make_doc(src / "sub" / "b.md", "B")
+        (b.assets_dir / "nested").mkdir()
+        (b.assets_dir / "nested" / "data.csv").write_text("1,2")
+
+        report = sync_tree(src, dst, workers=4)
+        assert sorted(report.added) == [Path("a.md"), Path("sub/b.md")]
+        assert report.errors == {}
+        assert _files(dst) == _files(src)
+
+        report = sync_tree(src, dst)
+        assert (report.added, report.changed, report.unchanged) == ([], [], 2)
+
+        # Change metadata format and remove an asset.
+        b.delete_meta()
+        b.write_meta({"title": "B2"}, formats="json")
+        (b.assets_dir / "nested" / "data.csv").unlink()
+        (b.assets_dir / "nested").rmdir()
+
+        report = sync_tree(src, dst, dry_run=True)
+        assert report.changed == [Path("sub/b.md")]
+        assert report.bytes_copied == b.meta_json_path.stat().st_size
+        assert (dst / "sub" / "b.meta.yml").exists()
+
+        sync_tree(src, dst)
+        assert _files(dst) == _files(src)
+        assert not (dst / "sub" / "b.assets" / "nested").exists()
+        assert Sidematter(dst / "sub" / "b.md").read_meta() == {"title": "B2"}
+
+
+def test_sync_checksum_and_delete():
+    """
+    With `checksum`, contents are compared instead of modification times, and with
+    `delete`, units only at the destination are removed.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "src"
+        dst = Path(tmpdir) / "dst"
+        a = _make_doc(src / "a.md", "A")
+        sync_tree(src, dst)
+        _make_doc(dst / "extra.md", "Extra")
+        # A document sharing its stem (and so its sidematter) with one at the source.
+        (dst / "a.txt").write_text("a")
+
+        os.utime(a.primary, ns=(0, 0))
+        report = sync_tree(src, dst, checksum=True)
+        assert report.unchanged == 1
+        report = sync_tree(src, dst)
+        assert report.changed == [Path("a.md")]
+
+        report = sync_tree(src, dst, delete=True, dry_run=True)
+        assert sorted(report.deleted) == [Path("a.txt"), Path("extra.md")]
+        assert (dst / "extra.md").exists()
+
+        sync_tree(src, dst, delete=True)
+        assert _files(dst) == _files(src)
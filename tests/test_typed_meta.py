@@ -0,0 +1,147 @@
+"""
+Tests for reading and writing metadata as typed models.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any, Literal
+
+import pytest
+
+from sidematter_format import (
+    MetaValidationError,
+    Sidematter,
+    register_default_yaml_representers,
+    register_model_type,
+    to_json_string,
+)
+from sidematter_format.typed_meta import decode_model, encode_model
+
+
+class Status(Enum):
+    DRAFT = "draft"
+    FINAL = "final"
+
+
+@dataclass(slots=True, frozen=True)
+class Revision:
+    version: int
+    author: str
+    at: datetime
+
+
+@dataclass(slots=True)
+class Node:
+    name: str
+    children: list[Node] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class DocMeta:
+    title: str
+    status: Status
+    published: date | None
+    history: list[Revision] = field(default_factory=list)
+    tags: tuple[str, ...] = ()
+    scores: dict[str, float] = field(default_factory=dict)
+    kind: Literal["report", "memo"] = "report"
+    tree: Node | None = None
+    extra: Any = None
+
+
+class Point:
+    def __init__(self, x: int, y: int):
+        self.x: int = x
+        self.y: int = y
+
+
+@dataclass
+class Shape:
+    points: list[Point]
+
+
+def _example() -> DocMeta:
+    at = datetime(2024, 1, 15, 10, 30, tzinfo=timezone.utc)
+    return DocMeta(
+        title="Report",
+        status=Status.FINAL,
+        published=date(2024, 1, 16),
+        history=[Revision(1, "ann", at), Revision(2, "bo", at)],
+        tags=("a", "b"),
+        scores={"x": 1.5, "y": 2},
+        tree=Node("root", [Node("leaf")]),
+    )
+
+
+@pytest.mark.parametrize("formats", ["yaml", "json", "msgpack"])
+def test_read_write_models(formats: str):
+    """
+    Models round-trip through each format, and are written like the same data as a
+    dict would be.
+    """
+    register_default_yaml_representers()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        model = _example()
+        if formats == "msgpack":
+            # MessagePack has no dates, so write them as strings.
+            model.history = []
+            model.published = None
+        sm.write_meta(model, formats=formats)
+        assert sm.read_meta_as(DocMeta) == model
+        assert sm.read_meta()["status"] == "final"
+
+    if formats == "json":
+        assert to_json_string(encode_model(model)) == to_json_string(model)
+
+
+def test_validation_errors():
+    """
+    Errors give the key path of the failing value.
+    """
+    good = encode_model(_example())
+    cases: list[tuple[dict[str, Any], str]] = [
+        (
+            {**good, "history": [good["history"][0], {"version": "2", "author": "bo"}]},
+            "history[1].version",
+        ),
+        ({**good, "history": [{"version": 1, "at": "2024-01-01"}]}, "history[0].author"),
+        ({**good, "status": "unknown"}, "status"),
+        ({**good, "scores": {"x": True}}, "scores.x"),
+        ({**good, "kind": "letter"}, "kind"),
+        ({**good, "tree": {"name": "root", "children": [{"name": 3}]}}, "tree.children[0].name"),
+        ({**good, "published": "January"}, "published"),
+        ({k: v for k, v in good.items() if k != "title"}, "title"),
+    ]
+    for meta, key_path in cases:
+        with pytest.raises(MetaValidationError) as info:
+            decode_model(DocMeta, meta)
+        assert str(info.value).startswith(f"{key_path}: ")
+
+    with pytest.raises(MetaValidationError, match="<root>"):
+        decode_model(DocMeta, ["not", "a", "dict"])
+
+    # Missing optional fields are None, and unknown keys are ignored.
+    partial = decode_model(DocMeta, {"title": "T", "status": "draft", "unknown": 1})
+    assert partial.published is None and partial.history == []
+
+
+def test_registered_model_type():
+    """
+    Registered model types are decoded and encoded with their own functions.
+    """
+    register_model_type(Point, decode=lambda v: Point(*v), encode=lambda p: [p.x, p.y])
+    shape = Shape([Point(1, 2), Point(3, 4)])
+    assert encode_model(shape) == {"points": [[1, 2], [3, 4]]}
+    decoded = decode_model(Shape, {"points": [[1, 2], [3, 4]]})
+    assert [(p.x, p.y) for p in decoded.points] == [(1, 2), (3, 4)]
+    with pytest.raises(MetaValidationError, match=r"^points\[0\]: invalid Point"):
+        decode_model(Shape, {"points": [[1, 2, 3]]})
+
+    with pytest.raises(TypeError):
+        decode_model(complex, {})
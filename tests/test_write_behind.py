@@ -0,0 +1,135 @@
+"""
+Tests for write-behind of metadata.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from sidematter_format import (
+    MemoryFS,
+    Sidematter,
+    SidematterDir,
+    WriteBehind,
+    apply_plan,
+    copy_sidematter,
+    move_sidematter,
+    plan_renames,
+    remove_sidematter,
+)
+
+
+def test_coalesced_writes():
+    """
+    Repeated writes are kept in memory, seen by reads, and written once on flush.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir, WriteBehind(interval=None) as wb:
+        path = Path(tmpdir) / "doc.md"
+        sm = Sidematter(path, write_behind=wb)
+        meta = {"progress": 0}
+        for i in range(100):
+            meta["progress"] = i
+            assert sm.write_meta(meta) == sm.meta_yaml_path
+        meta["progress"] = -1
+
+        assert not sm.meta_yaml_path.exists()
+        assert wb.dirty == 1
+        # Other `Sidematter` objects for the same document see the pending write.
+        assert Sidematter(path).read_meta() == {"progress": 99}
+
+        wb.flush()
+        assert wb.dirty == 0
+        assert sm.meta_yaml_path.read_text() == "progress: 99\n"
+
+        # Other changes flush first, and direct writes replace pending ones.
+        sm.write_meta({"progress": 100})
+        sm.patch_meta({"done": False})
+        assert Sidematter(path).read_meta() == {"progress": 100, "done": False}
+        sm.write_meta({"progress": 101})
+        Sidematter(path).write_meta({"progress": 102})
+        wb.flush()
+        assert sm.read_meta() == {"progress": 102}
+
+
+def test_pending_reads_match_written():
+    """
+    Pending metadata reads the same as it will once written, in the format written.
+    """
+    fs = MemoryFS()
+    meta = {"when": date(2024, 1, 2), "pair": (1, 2), "tags": {"b"}}
+    with WriteBehind(interval=None) as wb:
+        for formats in ["yaml", "json"]:
+            sm = Sidematter(Path(f"{formats}.md"), fs=fs, write_behind=wb)
+            sm.write_meta(meta, formats=formats)
+            pending = sm.read_meta()
+            assert pending["pair"] == [1, 2]
+            wb.flush()
+            assert sm.read_meta() == pending
+            assert Sidematter(sm.primary, fs=fs).read_meta() == pending
+
+
+def test_flush_triggers():
+    """
+    Pending writes are flushed on the dirty threshold, on the interval, and on close.
+    """
+    fs = MemoryFS()
+    wb = WriteBehind(interval=None, max_dirty=3)
+    docs = [Sidematter(Path(f"doc{i}.md"), fs=fs, write_behind=wb) for i in range(3)]
+    for doc in docs[:2]:
+        doc.write_meta({"n": 1})
+    assert not fs.exists(docs[0].meta_yaml_path)
+    docs[2].write_meta({"n": 1})
+    assert all(fs.exists(doc.meta_yaml_path) for doc in docs)
+
+    docs[0].write_meta({"n": 2})
+    wb.close()
+    assert Sidematter(Path("doc0.md"), fs=fs).read_meta() == {"n": 2}
+    # Once closed, writes go straight through.
+    docs[0].write_meta({"n": 3})
+    assert fs.read_bytes(docs[0].meta_yaml_path) == b"n: 3\n"
+
+    with WriteBehind(interval=0.01) as wb:
+        doc = Sidematter(Path("timed.md"), fs=fs, write_behind=wb)
+        doc.write_meta({"n": 1})
+        deadline = time.monotonic() + 5
+        while not fs.exists(doc.meta_yaml_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert fs.exists(doc.meta_yaml_path)
+
+
+def test_pending_writes_follow_documents():
+    """
+    Copies, moves, and renames include pending metadata, and removals drop it, so it is
+    never written to the old path later.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir, WriteBehind(interval=None) as wb:
+        root = Path(tmpdir)
+        for name in ["a", "c", "d", "e"]:
+            (root / f"{name}.md").write_text(f"# {name}\n")
+            Sidematter(root / f"{name}.md", write_behind=wb).write_meta({"name": name})
+
+        copy_sidematter(root / "a.md", root / "copy.md")
+        move_sidematter(root / "a.md", root / "b.md")
+        remove_sidematter(root / "c.md")
+        with SidematterDir(root) as sd:
+            sd.rename_sidematter("d.md", "d2.md")
+        apply_plan(plan_renames({root / "e.md": root / "e2.md"}))
+        wb.close()
+
+        assert Sidematter(root / "copy.md").read_meta() == {"name": "a"}
+        assert Sidematter(root / "b.md").read_meta() == {"name": "a"}
+        assert Sidematter(root / "d2.md").read_meta() == {"name": "d"}
+        assert Sidematter(root / "e2.md").read_meta() == {"name": "e"}
+        assert sorted(p.name for p in root.iterdir()) == [
+            "b.md",
+            "b.meta.yml",
+            "copy.md",
+            "copy.meta.yml",
+            "d2.md",
+            "d2.meta.yml",
+            "e2.md",
+            "e2.meta.yml",
+        ]
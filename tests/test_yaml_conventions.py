@@ -0,0 +1,92 @@
+"""
+Tests for YAML serialization conventions.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import pytest
+from frontmatter_format import to_yaml_string
+
+from sidematter_format import Sidematter, SidematterError, register_default_yaml_representers
+from sidematter_format.yaml_conventions import emit_plain_yaml, pooled_yaml, yaml_dumps
+
+
+class Color(Enum):
+    RED = "red"
+
+
+PLAIN_META: dict[str, Any] = {
+    "title": "Q3 Financial Analysis",
+    "count": 3,
+    "ratio": 0.25,
+    "draft": False,
+    "empty_list": [],
+    "skipped_none": None,
+    "skipped_empty": {},
+    "description": "First line\nSecond line\n",
+    "summary": "No trailing newline\nhere",
+    "tags": ["finance", "quarterly", ["nested", "list"], {}],
+    "history": [
+        {"step": "extract", "tool": "extractor-v2.1", "notes": "line one\nline two"},
+        {"step": "analysis", "inputs": [1, 2], "config": {"mode": "fast"}},
+    ],
+    "quoted": ["yes", "123", "a: b", "", " lead", "2024-01-15"],
+}
+
+
+def test_pooled_yaml_matches_to_yaml_string():
+    """Test pooled dumpers give the same output as a fresh dumper every time."""
+    register_default_yaml_representers()
+    value = {**PLAIN_META, "when": datetime(2024, 1, 15, tzinfo=timezone.utc), "c": Color.RED}
+    for key_sort in (None, str):
+        for _ in range(3):
+            assert yaml_dumps(value, key_sort=key_sort) == to_yaml_string(value, key_sort=key_sort)
+    assert pooled_yaml() is pooled_yaml()
+    assert pooled_yaml(str) is not pooled_yaml()
+
+
+def test_emit_plain_yaml():
+    """Test the fast emitter matches ruamel output and declines anything else."""
+    plain = {k: v for k, v in PLAIN_META.items() if k != "quoted"}
+    for key_sort in (None, str):
+        assert emit_plain_yaml(plain, key_sort=key_sort) == to_yaml_string(plain, key_sort=key_sort)
+    assert emit_plain_yaml({"a": None}) == to_yaml_string({"a": None}) == "{}\n"
+
+    # Values that need quoting or other types fall back to ruamel
+    assert emit_plain_yaml(PLAIN_META) is None
+    assert emit_plain_yaml({"c": Color.RED}) is None
+    assert emit_plain_yaml({"long": "word " * 30 + "end"}) is None
+    assert emit_plain_yaml(["not", "a", "dict"]) is None
+
+    register_default_yaml_representers()
+    value = {**PLAIN_META, "c": Color.RED}
+    assert yaml_dumps(value, fast=True) == to_yaml_string(value)
+
+
+def test_write_meta_fast_yaml():
+    """Test write_meta with the fast YAML emitter writes identical files."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = Sidematter(Path(tmpdir) / "a.md")
+        b = Sidematter(Path(tmpdir) / "b.md")
+        a.write_meta(PLAIN_META, key_sort=str)
+        b.write_meta(PLAIN_META, key_sort=str, fast_yaml=True)
+        assert a.meta_yaml_path.read_text() == b.meta_yaml_path.read_text()
+        assert b.read_meta()["title"] == "Q3 Financial Analysis"
+
+
+def test_failed_dump_does_not_break_pooled_yaml():
+    """Test a failed dump doesn't leave later dumps on the same thread writing nothing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sm = Sidematter(Path(tmpdir) / "doc.md")
+        for key_sort in (None, str):
+            with pytest.raises(SidematterError):
+                sm.write_meta({"x": object()}, key_sort=key_sort)
+            assert yaml_dumps({"a": 1}, key_sort=key_sort) == "a: 1\n"
+            sm.write_meta({"title": "Kept"}, key_sort=key_sort)
+            assert sm.read_meta() == {"title": "Kept"}